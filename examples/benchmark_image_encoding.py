@@ -0,0 +1,132 @@
+"""Compare image encoding settings by encode time, payload size and answers.
+
+Usage:
+    python examples/benchmark_image_encoding.py [image ...]
+
+Without arguments the bundled sample image is used. Encode time and payload
+size are always reported. Set MOONDREAM_API_KEY to also run one query and one
+detect call per image and setting, and report how often each setting agrees
+with the JPEG q95 baseline (exact answer match, and detections matching in
+count with every box within IOU_THRESHOLD).
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPT_DIR.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import moondream as md
+from moondream.image import EncodeOptions, image_bytes
+
+SAMPLE_IMAGE = REPO_ROOT / "moondream" / "assets" / "how-to-be-a-people-person-1662995088.jpg"
+
+QUESTION = "Describe the scene in one sentence."
+DETECT_OBJECT = "person"
+REPEATS = 5
+IOU_THRESHOLD = 0.8
+
+SETTINGS = {
+    "jpeg-q95": EncodeOptions(),
+    "jpeg-q80": EncodeOptions(quality=80),
+    "jpeg-q60": EncodeOptions(quality=60),
+    "webp-q80": EncodeOptions(format="WEBP", quality=80),
+    "webp-q60": EncodeOptions(format="WEBP", quality=60),
+    "png": EncodeOptions(format="PNG"),
+    "jpeg-50kb": EncodeOptions(target_bytes=50_000),
+    "webp-1024-30kb": EncodeOptions(format="WEBP", max_side=1024, target_bytes=30_000),
+}
+BASELINE = "jpeg-q95"
+
+
+def load_images(paths):
+    images = []
+    for path in paths or [SAMPLE_IMAGE]:
+        with Image.open(path) as image:
+            # Decode up front so every setting pays for a full encode rather
+            # than passing the source file through.
+            images.append(image.convert("RGB"))
+    return images
+
+
+def measure_encoding(images, options):
+    elapsed, size = 0.0, 0
+    for image in images:
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            data, _ = image_bytes(image, options)
+            elapsed += time.perf_counter() - start
+        size += len(data)
+    return elapsed / (REPEATS * len(images)), size / len(images)
+
+
+def iou(a, b):
+    x_min, y_min = max(a["x_min"], b["x_min"]), max(a["y_min"], b["y_min"])
+    x_max, y_max = min(a["x_max"], b["x_max"]), min(a["y_max"], b["y_max"])
+    inter = max(0.0, x_max - x_min) * max(0.0, y_max - y_min)
+    area = lambda box: (box["x_max"] - box["x_min"]) * (box["y_max"] - box["y_min"])
+    union = area(a) + area(b) - inter
+    return inter / union if union else 0.0
+
+
+def detections_agree(objects, baseline):
+    if len(objects) != len(baseline):
+        return False
+    remaining = list(baseline)
+    for box in objects:
+        match = max(remaining, key=lambda other: iou(box, other))
+        if iou(box, match) < IOU_THRESHOLD:
+            return False
+        remaining.remove(match)
+    return True
+
+
+def run_skills(api_key, images, options):
+    model = md.vl(api_key=api_key, encode_options=options)
+    settings = {"temperature": 0.0}
+    answers = model.batch_query(images, QUESTION, settings=settings)
+    detections = model.batch_detect(images, DETECT_OBJECT, settings=settings)
+    return answers, detections
+
+
+def main():
+    images = load_images(sys.argv[1:])
+    api_key = os.environ.get("MOONDREAM_API_KEY")
+
+    outputs = {}
+    print(f"{'setting':<16} {'encode ms':>10} {'payload KB':>11} {'query':>7} {'detect':>7}")
+    for name, options in SETTINGS.items():
+        seconds, size = measure_encoding(images, options)
+        query_agreement = detect_agreement = "-"
+        if api_key:
+            outputs[name] = run_skills(api_key, images, options)
+            if name != BASELINE:
+                answers, detections = outputs[name]
+                base_answers, base_detections = outputs[BASELINE]
+                query_agreement = sum(
+                    isinstance(a, dict) and isinstance(b, dict)
+                    and a["answer"].strip() == b["answer"].strip()
+                    for a, b in zip(answers, base_answers)
+                ) / len(images)
+                detect_agreement = sum(
+                    isinstance(a, dict) and isinstance(b, dict)
+                    and detections_agree(a["objects"], b["objects"])
+                    for a, b in zip(detections, base_detections)
+                ) / len(images)
+                query_agreement = f"{query_agreement:.0%}"
+                detect_agreement = f"{detect_agreement:.0%}"
+        print(
+            f"{name:<16} {seconds * 1000:>10.1f} {size / 1024:>11.1f} "
+            f"{query_agreement:>7} {detect_agreement:>7}",
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
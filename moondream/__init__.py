@@ -1,9 +1,13 @@
 from importlib.metadata import version as _pkg_version
-from typing import Optional
+from typing import Optional, Sequence, Union
 
 from . import types
+from .async_cloud_vl import AsyncCloudVL
+from .balancer import EndpointBalancer
 from .cloud_vl import CloudVL
 from .finetune import ft
+from .result_cache import CachedVL, ResultCache
+from .single_flight import SingleFlightVL
 
 __version__ = _pkg_version("moondream")
 
@@ -12,8 +16,11 @@ DEFAULT_ENDPOINT = "https://api.moondream.ai/v1"
 
 def vl(
     api_key: Optional[str] = None,
-    endpoint: Optional[str] = DEFAULT_ENDPOINT,
+    endpoint: Optional[Union[str, Sequence[str], EndpointBalancer]] = DEFAULT_ENDPOINT,
     local: bool = False,
+    async_: bool = False,
+    result_cache: Optional[ResultCache] = None,
+    single_flight: bool = False,
     **kwargs,
 ):
     """
@@ -22,18 +29,54 @@ def vl(
     Args:
         api_key (str): Your API key for the remote (cloud) API.
         endpoint (str): The endpoint which you would like to call. Local is http://localhost:2020/v1 by default.
+            A list of endpoints (or an EndpointBalancer) spreads requests across
+            equivalent servers.
         local (bool): If True, use local GPU inference via Photon instead of the cloud API.
+        async_ (bool): If True, return an asyncio client (AsyncCloudVL). Same as md.avl(...).
+        result_cache (Optional[ResultCache]): If given, wrap the client in a CachedVL so
+            deterministic calls are answered from this on-disk cache.
+        single_flight (bool): If True, wrap the client in a SingleFlightVL so
+            identical concurrent calls share one request.
         **kwargs: Additional arguments forwarded to the backend (e.g. model, max_batch_size,
             kv_cache_pages, device for local mode).
 
     Returns:
-        An instance of CloudVL or PhotonVL.
+        An instance of CloudVL, AsyncCloudVL, PhotonVL, SingleFlightVL or CachedVL.
     """
+    if async_:
+        if local:
+            raise ValueError("async_ is not supported with local=True")
+        if result_cache is not None:
+            raise ValueError("result_cache is not supported with async_=True")
+        if single_flight:
+            raise ValueError("single_flight is not supported with async_=True")
+        return avl(api_key=api_key, endpoint=endpoint, **kwargs)
     if local:
         from .photon_vl import PhotonVL
-        return PhotonVL(api_key=api_key, **kwargs)
+        client = PhotonVL(api_key=api_key, **kwargs)
+    else:
+        model = kwargs.pop("model", None)
+        client = CloudVL(api_key=api_key, endpoint=endpoint, model=model, **kwargs)
+    if single_flight:
+        client = SingleFlightVL(client)
+    if result_cache is not None:
+        return CachedVL(client, result_cache)
+    return client
+
+
+def avl(
+    api_key: Optional[str] = None,
+    endpoint: Optional[Union[str, Sequence[str], EndpointBalancer]] = DEFAULT_ENDPOINT,
+    **kwargs,
+) -> AsyncCloudVL:
+    """
+    Factory function for creating an asyncio cloud client.
+
+    Takes the same arguments as vl() for the cloud API. Every skill is a
+    coroutine, and streamed outputs are async iterators.
+    """
     model = kwargs.pop("model", None)
-    return CloudVL(api_key=api_key, endpoint=endpoint, model=model, **kwargs)
+    return AsyncCloudVL(api_key=api_key, endpoint=endpoint, model=model, **kwargs)
 
 
-__all__ = ["ft", "vl", "__version__"]
+__all__ = ["avl", "ft", "vl", "__version__"]
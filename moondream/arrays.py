@@ -0,0 +1,237 @@
+"""Array-backed ``detect`` and ``point`` results for bulk workloads.
+
+A ``DetectOutput`` holds one dict with four floats per box. Kept for millions
+of images, those dicts dominate memory and garbage collection time.
+``DetectResult`` and ``PointResult`` hold the same data as one float32 array
+each, and ``DetectColumns`` / ``PointColumns`` accumulate many results into
+contiguous columns for batch post-processing and Arrow or Parquet export.
+
+pyarrow is optional; it is imported only by ``to_arrow`` and ``to_parquet``.
+"""
+
+from typing import Any, Hashable, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from .types import DetectOutput, Point, PointOutput, Region
+
+_BOX_KEYS = ("x_min", "y_min", "x_max", "y_max")
+
+
+class DetectResult:
+    """Boxes from one ``detect`` call.
+
+    Attributes:
+        boxes: (N, 4) float32 array of ``x_min, y_min, x_max, y_max``,
+            normalized to [0, 1] unless converted with ``to_pixels``.
+    """
+
+    __slots__ = ("boxes",)
+
+    def __init__(self, boxes: np.ndarray):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+    @classmethod
+    def from_output(
+        cls, output: Union[DetectOutput, Sequence[Region]]
+    ) -> "DetectResult":
+        """Build from a DetectOutput dict or a list of Region dicts."""
+        regions = output["objects"] if isinstance(output, Mapping) else output
+        flat = [region[key] for region in regions for key in _BOX_KEYS]
+        return cls(np.array(flat, dtype=np.float32))
+
+    def to_output(self) -> DetectOutput:
+        """The equivalent DetectOutput dict."""
+        return {
+            "objects": [
+                {"x_min": x0, "y_min": y0, "x_max": x1, "y_max": y1}
+                for x0, y0, x1, y1 in self.boxes.tolist()
+            ]
+        }
+
+    def to_pixels(
+        self, width: int, height: int, inplace: bool = False
+    ) -> "DetectResult":
+        """Scale normalized boxes to a ``width`` x ``height`` image.
+
+        With ``inplace`` the existing array is scaled without allocating a new
+        one, and this result is returned.
+        """
+        scale = np.array([width, height, width, height], dtype=np.float32)
+        if inplace:
+            self.boxes *= scale
+            return self
+        return DetectResult(self.boxes * scale)
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def __repr__(self) -> str:
+        return f"DetectResult(boxes={self.boxes!r})"
+
+
+class PointResult:
+    """Points from one ``point`` call.
+
+    Attributes:
+        points: (N, 2) float32 array of ``x, y``, normalized to [0, 1] unless
+            converted with ``to_pixels``.
+    """
+
+    __slots__ = ("points",)
+
+    def __init__(self, points: np.ndarray):
+        self.points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+
+    @classmethod
+    def from_output(
+        cls, output: Union[PointOutput, Sequence[Point]]
+    ) -> "PointResult":
+        """Build from a PointOutput dict or a list of Point dicts."""
+        points = output["points"] if isinstance(output, Mapping) else output
+        flat = [value for point in points for value in (point["x"], point["y"])]
+        return cls(np.array(flat, dtype=np.float32))
+
+    def to_output(self) -> PointOutput:
+        """The equivalent PointOutput dict."""
+        return {"points": [{"x": x, "y": y} for x, y in self.points.tolist()]}
+
+    def to_pixels(
+        self, width: int, height: int, inplace: bool = False
+    ) -> "PointResult":
+        """Scale normalized points to a ``width`` x ``height`` image.
+
+        With ``inplace`` the existing array is scaled without allocating a new
+        one, and this result is returned.
+        """
+        scale = np.array([width, height], dtype=np.float32)
+        if inplace:
+            self.points *= scale
+            return self
+        return PointResult(self.points * scale)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __repr__(self) -> str:
+        return f"PointResult(points={self.points!r})"
+
+
+def _pyarrow() -> Any:
+    try:
+        import pyarrow
+    except ImportError as exc:
+        raise ImportError(
+            "Arrow and Parquet export need pyarrow. Install it with "
+            "`pip install pyarrow` or `pip install moondream[arrow]`."
+        ) from exc
+    return pyarrow
+
+
+class _Columns:
+    """Accumulates rows from many results under per-image keys."""
+
+    _columns: Sequence[str] = ()
+
+    def __init__(self):
+        self.keys: List[Hashable] = []
+        self._chunks: List[np.ndarray] = []
+        self._counts: List[int] = []
+        self._values: Optional[np.ndarray] = None
+
+    def _append(self, key: Hashable, rows: np.ndarray) -> None:
+        self.keys.append(key)
+        # Copy so a later to_pixels(inplace=True) on the result can't reach in.
+        self._chunks.append(rows.copy())
+        self._counts.append(len(rows))
+        self._values = None
+
+    def _concatenated(self) -> np.ndarray:
+        if self._values is None:
+            width = len(self._columns)
+            self._values = (
+                np.concatenate(self._chunks)
+                if self._chunks
+                else np.empty((0, width), dtype=np.float32)
+            )
+            # Later appends rebuild from one chunk instead of all of them.
+            self._chunks = [self._values]
+        return self._values
+
+    @property
+    def image_index(self) -> np.ndarray:
+        """(M,) int32: the position in ``keys`` of the image each row came from."""
+        return np.repeat(
+            np.arange(len(self._counts), dtype=np.int32),
+            np.asarray(self._counts, dtype=np.intp),
+        )
+
+    @property
+    def counts(self) -> np.ndarray:
+        """(len(keys),) int32: rows per image."""
+        return np.asarray(self._counts, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return sum(self._counts)
+
+    def to_arrow(self) -> Any:
+        """A ``pyarrow.Table`` with a ``key`` column and one column per coordinate.
+
+        Keys are dictionary-encoded, so each key is stored once however many
+        rows it has. Images with no rows do not appear.
+        """
+        pa = _pyarrow()
+        values = self._concatenated()
+        keys = pa.DictionaryArray.from_arrays(
+            pa.array(self.image_index), pa.array(self.keys)
+        )
+        columns = [keys] + [pa.array(values[:, i]) for i in range(values.shape[1])]
+        return pa.Table.from_arrays(columns, names=["key", *self._columns])
+
+    def to_parquet(self, path: str, **kwargs) -> None:
+        """Write ``to_arrow()`` to a Parquet file.
+
+        kwargs are passed to ``pyarrow.parquet.write_table``.
+        """
+        _pyarrow()
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), path, **kwargs)
+
+
+class DetectColumns(_Columns):
+    """Boxes from many ``detect`` results, concatenated.
+
+    ``add`` each result with a key for its image, such as its path. ``boxes``
+    then holds every box and ``image_index`` the key each one belongs to.
+    """
+
+    _columns = _BOX_KEYS
+
+    def add(self, key: Hashable, result: Union[DetectResult, DetectOutput]) -> None:
+        """Append the boxes of ``result``, which came from the image ``key``."""
+        if not isinstance(result, DetectResult):
+            result = DetectResult.from_output(result)
+        self._append(key, result.boxes)
+
+    @property
+    def boxes(self) -> np.ndarray:
+        """(M, 4) float32 array of every box, in the order added."""
+        return self._concatenated()
+
+
+class PointColumns(_Columns):
+    """Points from many ``point`` results, concatenated. See DetectColumns."""
+
+    _columns = ("x", "y")
+
+    def add(self, key: Hashable, result: Union[PointResult, PointOutput]) -> None:
+        """Append the points of ``result``, which came from the image ``key``."""
+        if not isinstance(result, PointResult):
+            result = PointResult.from_output(result)
+        self._append(key, result.points)
+
+    @property
+    def points(self) -> np.ndarray:
+        """(M, 2) float32 array of every point, in the order added."""
+        return self._concatenated()
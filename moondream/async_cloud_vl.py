@@ -0,0 +1,393 @@
+"""Asyncio client for the Moondream cloud API."""
+
+import asyncio
+import json
+import urllib.error
+import urllib.request
+from typing import (
+    AsyncIterator,
+    Callable,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from PIL import Image
+
+from .arrays import DetectResult, PointResult
+from .balancer import EndpointBalancer
+from .cloud_vl import (
+    DEFAULT_RETRY_POLICY,
+    DEFAULT_TIMEOUT,
+    CaptionLength,
+    Upload,
+    _CloudRequests,
+    _SegmentGeometry,
+    _Slot,
+    _segment_update,
+    _sse_data,
+)
+from .image import EncodeCache, EncodeOptions, _resolve_options
+from .streaming import Stop, StopWhen, _stops_early, stop_early_async
+from .transport import (
+    AsyncConnectionPool,
+    AsyncPooledResponse,
+    Compression,
+    RetryBudget,
+    RetryPolicy,
+    TransferStats,
+    default_async_pool,
+    with_retries_async,
+)
+from .types import (
+    AnalyzeOutput,
+    AsyncCaptionOutput,
+    AsyncQueryOutput,
+    AsyncSegmentStreamOutput,
+    AsyncVLM,
+    DetectOutput,
+    EncodedImage,
+    PointOutput,
+    SamplingSettings,
+    SegmentOutput,
+    SegmentStreamChunk,
+    SpatialRef,
+)
+
+
+class AsyncCloudVL(_CloudRequests, AsyncVLM):
+    """CloudVL for asyncio: every skill is a coroutine on a keep-alive pool.
+
+    A single event loop can drive many concurrent calls without a thread per
+    in-flight request.
+    """
+
+    def __init__(
+        self,
+        *,
+        endpoint: Union[
+            str, Sequence[str], EndpointBalancer
+        ] = "https://api.moondream.ai/v1",
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        pool: Optional[AsyncConnectionPool] = None,
+        retry: Optional[RetryPolicy] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+        max_image_side: Optional[int] = None,
+        max_pixels: Optional[int] = None,
+        encode_options: Optional[EncodeOptions] = None,
+        image_cache: Optional[EncodeCache] = None,
+        compression: Optional[Compression] = None,
+        on_transfer: Optional[Callable[[TransferStats], None]] = None,
+        upload: Upload = "json",
+    ):
+        self.api_key = api_key
+        self._init_endpoint(endpoint)
+        self.model = model
+        self.pool = default_async_pool() if pool is None else pool
+        self.retry = DEFAULT_RETRY_POLICY if retry is None else retry
+        self.retry_budget = RetryBudget() if retry_budget is None else retry_budget
+        self.timeout = timeout
+        self.encode_options = _resolve_options(
+            encode_options, max_image_side, max_pixels
+        )
+        self.image_cache = image_cache
+        self.compression = compression
+        self.on_transfer = on_transfer
+        self._init_upload(upload)
+
+    async def _build(
+        self,
+        path: str,
+        payload: dict,
+        image: Optional[Union[Image.Image, EncodedImage]] = None,
+    ) -> urllib.request.Request:
+        """Build a request on a worker thread, so encoding an image doesn't
+        block the event loop."""
+        if image is None:
+            return self._request(path, payload)
+        return await asyncio.to_thread(self._request, path, payload, image)
+
+    async def _fallback(
+        self, req: urllib.request.Request, exc: urllib.error.HTTPError
+    ) -> urllib.request.Request:
+        """_json_fallback on a worker thread; it re-encodes the image as base64."""
+        return await asyncio.to_thread(self._json_fallback, req, exc)
+
+    async def _open(
+        self, req: urllib.request.Request, timeout: Optional[float] = None
+    ) -> Tuple[AsyncPooledResponse, _Slot]:
+        """Open ``req``, returning the response and the slot to release with it."""
+
+        async def attempt() -> Tuple[AsyncPooledResponse, _Slot]:
+            slot = self._slot(req)
+            try:
+                response = await self.pool.urlopen(
+                    slot.request,
+                    timeout=self._timeout(timeout),
+                    compression=self.compression,
+                )
+            except BaseException as exc:
+                slot.release(exc)
+                raise
+            slot.responded()
+            return response, slot
+
+        try:
+            return await with_retries_async(attempt, self.retry, self.retry_budget)
+        except urllib.error.HTTPError as exc:
+            return await self._open(await self._fallback(req, exc), timeout)
+
+    async def _request_json(
+        self, req: urllib.request.Request, timeout: Optional[float] = None
+    ) -> dict:
+        async def attempt() -> dict:
+            with self._slot(req) as slot:
+                async with await self.pool.urlopen(
+                    slot.request,
+                    timeout=self._timeout(timeout),
+                    compression=self.compression,
+                ) as response:
+                    slot.responded()
+                    body = await response.read()
+            self._report_transfer(response)
+            return json.loads(body.decode("utf-8"))
+
+        try:
+            return await with_retries_async(attempt, self.retry, self.retry_budget)
+        except urllib.error.HTTPError as exc:
+            return await self._request_json(await self._fallback(req, exc), timeout)
+
+    async def _stream_response(
+        self, req: urllib.request.Request, timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """Stream text chunks from an SSE response."""
+        response, slot = await self._open(req, timeout)
+        try:
+            async for line in response:
+                data = _sse_data(line)
+                if data is None:
+                    continue
+                if "chunk" in data:
+                    yield data["chunk"]
+                if data.get("completed"):
+                    break
+        finally:
+            await response.aclose()
+            slot.release()
+            self._report_transfer(response)
+
+    async def _stream_segment_response(
+        self,
+        req: urllib.request.Request,
+        timeout: Optional[float] = None,
+        geometry: bool = False,
+    ) -> AsyncIterator[SegmentStreamChunk]:
+        """Stream segmentation updates; see CloudVL._stream_segment_response."""
+        add_geometry = _SegmentGeometry() if geometry else None
+        response, slot = await self._open(req, timeout)
+        try:
+            async for line in response:
+                data = _sse_data(line)
+                if data is None:
+                    continue
+                update = _segment_update(data)
+                if update is not None:
+                    if add_geometry is not None:
+                        update = add_geometry(update)
+                    yield update
+                    if update.get("completed"):
+                        break
+        finally:
+            await response.aclose()
+            slot.release()
+            self._report_transfer(response)
+
+    async def caption(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        length: Literal["normal", "short", "long"] = "normal",
+        stream: bool = False,
+        settings: Optional[SamplingSettings] = None,
+        timeout: Optional[float] = None,
+        stop: Optional[Stop] = None,
+        stop_when: Optional[StopWhen] = None,
+    ) -> AsyncCaptionOutput:
+        stops_early = _stops_early(stream, False, stop, stop_when)
+        payload = {
+            "length": length,
+            "stream": stream or stops_early,
+        }
+        if self.model is not None:
+            payload["model"] = self.model
+        if settings is not None:
+            payload["settings"] = settings
+
+        req = await self._build("caption", payload, image)
+
+        if stream or stops_early:
+            chunks = stop_early_async(self._stream_response(req, timeout), stop, stop_when)
+            if stream:
+                return {"caption": chunks}
+            return {"caption": "".join([chunk async for chunk in chunks])}
+
+        result = await self._request_json(req, timeout)
+        return {"caption": result["caption"]}
+
+    async def query(
+        self,
+        image: Optional[Union[Image.Image, EncodedImage]] = None,
+        question: Optional[str] = None,
+        stream: bool = False,
+        settings: Optional[SamplingSettings] = None,
+        reasoning: bool = False,
+        timeout: Optional[float] = None,
+        stop: Optional[Stop] = None,
+        stop_when: Optional[StopWhen] = None,
+    ) -> AsyncQueryOutput:
+        if question is None:
+            raise ValueError("question parameter is required")
+        stops_early = _stops_early(stream, reasoning, stop, stop_when)
+
+        payload = {
+            "question": question,
+            "stream": stream or stops_early,
+        }
+
+        if self.model is not None:
+            payload["model"] = self.model
+        if settings is not None:
+            payload["settings"] = settings
+        if reasoning:
+            payload["reasoning"] = reasoning
+
+        req = await self._build("query", payload, image)
+
+        if stream or stops_early:
+            chunks = stop_early_async(self._stream_response(req, timeout), stop, stop_when)
+            if stream:
+                return {"answer": chunks}
+            return {"answer": "".join([chunk async for chunk in chunks])}
+
+        result = await self._request_json(req, timeout)
+        output: AsyncQueryOutput = {"answer": result["answer"]}
+        if "reasoning" in result and result["reasoning"] is not None:
+            output["reasoning"] = result["reasoning"]
+        return output
+
+    async def detect(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        object: str,
+        settings: Optional[SamplingSettings] = None,
+        timeout: Optional[float] = None,
+        as_arrays: bool = False,
+    ) -> Union[DetectOutput, DetectResult]:
+        payload = {
+            "object": object,
+        }
+        if self.model is not None:
+            payload["model"] = self.model
+        if settings is not None:
+            payload["settings"] = settings
+
+        req = await self._build("detect", payload, image)
+        result = await self._request_json(req, timeout)
+        if as_arrays:
+            return DetectResult.from_output(result)
+        return {"objects": result["objects"]}
+
+    async def point(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        object: str,
+        settings: Optional[SamplingSettings] = None,
+        timeout: Optional[float] = None,
+        as_arrays: bool = False,
+    ) -> Union[PointOutput, PointResult]:
+        payload = {
+            "object": object,
+        }
+        if self.model is not None:
+            payload["model"] = self.model
+        if settings is not None:
+            payload["settings"] = settings
+
+        req = await self._build("point", payload, image)
+        result = await self._request_json(req, timeout)
+        if as_arrays:
+            return PointResult.from_output(result)
+        return {"points": result["points"]}
+
+    async def segment(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        object: str,
+        spatial_refs: Optional[List[SpatialRef]] = None,
+        stream: bool = False,
+        settings: Optional[SamplingSettings] = None,
+        timeout: Optional[float] = None,
+        geometry: bool = False,
+    ) -> Union[SegmentOutput, AsyncSegmentStreamOutput]:
+        if geometry and not stream:
+            raise ValueError("geometry=True requires stream=True")
+        payload = {
+            "object": object,
+            "stream": stream,
+        }
+        if self.model is not None:
+            payload["model"] = self.model
+        if spatial_refs is not None:
+            payload["spatial_refs"] = spatial_refs
+        if settings is not None:
+            payload["settings"] = settings
+
+        req = await self._build("segment", payload, image)
+
+        if stream:
+            return self._stream_segment_response(req, timeout, geometry)
+
+        result = await self._request_json(req, timeout)
+        output: SegmentOutput = {"path": result["path"]}
+        if result.get("bbox"):
+            output["bbox"] = result["bbox"]
+        return output
+
+    async def analyze(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        *,
+        queries: Sequence[str] = (),
+        detect: Sequence[str] = (),
+        point: Sequence[str] = (),
+        caption: Optional[CaptionLength] = None,
+        settings: Optional[SamplingSettings] = None,
+        timeout: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> AnalyzeOutput:
+        """Coroutine version of CloudVL.analyze; sub-requests run as concurrent tasks.
+
+        At most ``max_concurrency`` sub-requests (default: the client's
+        default_max_concurrency) are in flight at once, as in the sync client.
+        """
+        requests = self._analyze_requests(
+            queries, detect, point, caption, settings, timeout
+        )
+        if not requests:
+            return self._analyze_output([], [])
+        encoded = await asyncio.to_thread(self._encode_once, image)
+        limit = asyncio.Semaphore(max_concurrency or self.default_max_concurrency)
+
+        async def run(skill: str, kwargs: dict):
+            async with limit:
+                return await getattr(self, skill)(encoded, **kwargs)
+
+        results = await asyncio.gather(
+            *(run(skill, kwargs) for _, skill, kwargs in requests),
+            return_exceptions=True,
+        )
+        return self._analyze_output(requests, list(results))
@@ -0,0 +1,230 @@
+"""Client-side load balancing across several equivalent endpoints.
+
+``EndpointBalancer`` spreads requests over a list of servers, such as one local
+Moondream server per GPU box. Each attempt goes to the endpoint with the fewest
+requests outstanding, either among all of them or among two picked at random
+("power of two choices"). Endpoints are ejected passively: after several
+consecutive failures, or optionally when their response latency is far above
+the fastest endpoint's, they get no traffic for a while and are then tried
+again.
+"""
+
+import copy
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+from typing import List, Literal, Optional, Sequence, Tuple
+
+Strategy = Literal["p2c", "least_outstanding"]
+
+# Weight of the newest sample in each endpoint's latency average.
+_LATENCY_ALPHA = 0.2
+# Latency samples needed before an endpoint can be ejected for being slow.
+_MIN_LATENCY_SAMPLES = 5
+
+
+@dataclass
+class EndpointStats:
+    """Snapshot of one endpoint's counters.
+
+    ``latency`` is a moving average of the seconds until response headers
+    arrive, or None before the first response.
+    """
+
+    endpoint: str
+    requests: int = 0
+    failures: int = 0
+    outstanding: int = 0
+    latency: Optional[float] = None
+    ejected: bool = False
+    ejections: int = 0
+
+
+class _Endpoint:
+    def __init__(self, url: str):
+        self.url = url
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.outstanding = 0
+        self.latency: Optional[float] = None
+        self.latency_samples = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+
+    def available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def snapshot(self, now: float) -> EndpointStats:
+        return EndpointStats(
+            endpoint=self.url,
+            requests=self.requests,
+            failures=self.failures,
+            outstanding=self.outstanding,
+            latency=self.latency,
+            ejected=not self.available(now),
+            ejections=self.ejections,
+        )
+
+
+def _is_failure(exc: Optional[BaseException]) -> bool:
+    """Whether ``exc`` says something about the endpoint rather than the request."""
+    if exc is None:
+        return False
+    if isinstance(exc, urllib.error.HTTPError):
+        return exc.code == 429 or exc.code >= 500
+    return isinstance(exc, (urllib.error.URLError, OSError))
+
+
+class Lease:
+    """One attempt routed to an endpoint. Release it when the response is done."""
+
+    def __init__(self, balancer: "EndpointBalancer", endpoint: _Endpoint):
+        self._balancer = balancer
+        self.endpoint = endpoint.url
+        self._target = endpoint
+        self._started = time.monotonic()
+        self._released = False
+
+    def responded(self) -> None:
+        """Record the time until response headers arrived."""
+        self._balancer._record_latency(self._target, time.monotonic() - self._started)
+
+    def release(self, exc: Optional[BaseException] = None) -> None:
+        """Finish the attempt; ``exc`` is the error it failed with. Idempotent."""
+        if not self._released:
+            self._released = True
+            self._balancer._release(self._target, exc)
+
+
+class EndpointBalancer:
+    """Thread-safe least-outstanding-requests balancer with passive ejection.
+
+    Args:
+        endpoints (Sequence[str]): Base URLs of equivalent servers.
+        strategy (str): "p2c" compares two random endpoints, which keeps many
+            clients from piling onto the same one. "least_outstanding" scans
+            all of them.
+        max_failures (int): Consecutive failures (connection errors, 429 and
+            5xx) that eject an endpoint.
+        ejection_time (float): Seconds an ejected endpoint gets no traffic.
+            After that it is tried again, and one more failure ejects it.
+        slow_factor (Optional[float]): Eject an endpoint whose average
+            latency exceeds this multiple of the fastest endpoint's. Off
+            (None) by default: latency is time to first byte, which includes
+            generation, so it is only comparable when every endpoint serves
+            a similar mix of skills.
+
+    When every endpoint is ejected, requests are spread over all of them
+    rather than failing outright.
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[str],
+        *,
+        strategy: Strategy = "p2c",
+        max_failures: int = 3,
+        ejection_time: float = 30.0,
+        slow_factor: Optional[float] = None,
+    ):
+        if not endpoints:
+            raise ValueError("endpoints must not be empty")
+        if strategy not in ("p2c", "least_outstanding"):
+            raise ValueError("strategy must be 'p2c' or 'least_outstanding'")
+        if max_failures < 1:
+            raise ValueError("max_failures must be at least 1")
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.ejection_time = ejection_time
+        self.slow_factor = slow_factor
+        self._endpoints = [_Endpoint(url.rstrip("/")) for url in endpoints]
+        self._lock = threading.Lock()
+
+    @property
+    def endpoints(self) -> List[str]:
+        return [endpoint.url for endpoint in self._endpoints]
+
+    def stats(self) -> List[EndpointStats]:
+        now = time.monotonic()
+        with self._lock:
+            return [endpoint.snapshot(now) for endpoint in self._endpoints]
+
+    def acquire(self) -> Lease:
+        """Pick an endpoint for one attempt and count it as outstanding."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self._endpoints if e.available(now)]
+            if not candidates:
+                candidates = self._endpoints
+            if self.strategy == "p2c" and len(candidates) > 2:
+                candidates = random.sample(candidates, 2)
+            endpoint = min(candidates, key=lambda e: (e.outstanding, e.latency or 0.0))
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        return Lease(self, endpoint)
+
+    def route(
+        self, req: urllib.request.Request
+    ) -> Tuple[urllib.request.Request, Lease]:
+        """Acquire an endpoint and return a copy of ``req`` pointed at it.
+
+        ``req`` must target one of this balancer's endpoints. It is not
+        modified, so it can be routed again for a retry.
+        """
+        url = req.full_url
+        for endpoint in self._endpoints:
+            if url.startswith(endpoint.url + "/"):
+                lease = self.acquire()
+                routed = copy.copy(req)
+                routed.headers = dict(req.headers)
+                routed.unredirected_hdrs = dict(req.unredirected_hdrs)
+                routed.full_url = lease.endpoint + url[len(endpoint.url) :]
+                return routed, lease
+        raise ValueError(f"{url} is not under any balanced endpoint")
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _eject(self, endpoint: _Endpoint, now: float) -> None:
+        if endpoint.available(now):
+            endpoint.ejected_until = now + self.ejection_time
+            endpoint.ejections += 1
+
+    def _record_latency(self, endpoint: _Endpoint, seconds: float) -> None:
+        with self._lock:
+            if endpoint.latency is None:
+                endpoint.latency = seconds
+            else:
+                endpoint.latency += _LATENCY_ALPHA * (seconds - endpoint.latency)
+            endpoint.latency_samples += 1
+            if self.slow_factor is None or endpoint.latency_samples < _MIN_LATENCY_SAMPLES:
+                return
+            peers = [
+                e.latency
+                for e in self._endpoints
+                if e is not endpoint
+                and e.latency is not None
+                and e.latency_samples >= _MIN_LATENCY_SAMPLES
+            ]
+            if peers and endpoint.latency > self.slow_factor * min(peers):
+                self._eject(endpoint, time.monotonic())
+                # Start over once it is back, rather than judging it on old samples.
+                endpoint.latency_samples = 0
+
+    def _release(self, endpoint: _Endpoint, exc: Optional[BaseException]) -> None:
+        with self._lock:
+            endpoint.outstanding -= 1
+            if not _is_failure(exc):
+                if exc is None:
+                    endpoint.consecutive_failures = 0
+                return
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.max_failures:
+                self._eject(endpoint, time.monotonic())
+                endpoint.consecutive_failures = self.max_failures - 1
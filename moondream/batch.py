@@ -0,0 +1,85 @@
+"""Bounded-concurrency scheduling for VLM.map and the batch_* helpers."""
+
+import concurrent.futures
+from typing import Callable, Dict, Generator, Iterable, Mapping, Tuple, Union
+
+SKILLS = ("caption", "query", "detect", "point", "segment")
+
+# Ordered results wait in a reorder buffer until every earlier item finishes.
+# Cap how far submission may run ahead of the slowest item so memory stays
+# bounded for long inputs.
+_REORDER_FACTOR = 4
+
+Submit = Callable[[str, dict], concurrent.futures.Future]
+
+
+def run_batch(
+    submit: Submit,
+    skill: str,
+    inputs: Iterable[Mapping],
+    *,
+    max_concurrency: int,
+    ordered: bool = True,
+) -> Generator[Tuple[int, Union[dict, Exception]], None, None]:
+    """Run ``skill`` over ``inputs`` keeping up to ``max_concurrency`` in flight.
+
+    ``submit(skill, kwargs)`` starts one call and returns a future. Yields
+    ``(index, result)`` tuples where ``result`` is the skill output, or the
+    exception that item raised. Items are yielded in input order when
+    ``ordered`` is True and in completion order otherwise. Closing the
+    generator cancels calls that have not started yet.
+    """
+    if skill not in SKILLS:
+        raise ValueError(f"Unknown skill {skill!r}; expected one of {SKILLS}")
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    items = enumerate(inputs)
+    pending: Dict[concurrent.futures.Future, int] = {}
+    finished: Dict[int, Union[dict, Exception]] = {}
+    next_index = 0
+    exhausted = False
+    try:
+        while True:
+            while (
+                not exhausted
+                and len(pending) < max_concurrency
+                and len(pending) + len(finished) < max_concurrency * _REORDER_FACTOR
+            ):
+                try:
+                    index, kwargs = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                kwargs = dict(kwargs)
+                try:
+                    if kwargs.get("stream"):
+                        raise ValueError("stream=True is not supported in batch calls")
+                    future = submit(skill, kwargs)
+                except Exception as exc:
+                    future = concurrent.futures.Future()
+                    future.set_exception(exc)
+                pending[future] = index
+
+            if not pending:
+                return
+
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    result: Union[dict, Exception] = future.result()
+                except Exception as exc:
+                    result = exc
+                if ordered:
+                    finished[index] = result
+                else:
+                    yield index, result
+            while next_index in finished:
+                yield next_index, finished.pop(next_index)
+                next_index += 1
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,459 @@
+"""Offline benchmarks of client overhead against an in-process mock server.
+
+``MockServer`` answers the cloud skill endpoints (with server-sent-event
+streaming) and the finetuning endpoints with canned responses, after a
+configurable delay. ``run`` drives ``CloudVL`` and ``Finetune`` against it at a
+fixed concurrency and reports throughput, latency percentiles, client CPU per
+request and peak RSS. From the command line::
+
+    python -m moondream.bench --requests 500 --concurrency 16 --output bench.json
+
+The report is JSON so results can be compared between releases. Latency here
+is almost entirely client overhead plus the configured server delay, since the
+server runs on loopback and does no inference.
+"""
+
+import argparse
+import email.parser
+import email.policy
+import itertools
+import json
+import math
+import platform
+import sys
+import threading
+import time
+import zlib
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib.metadata import version as _pkg_version
+from typing import Callable, Dict, List, Optional, Sequence
+
+from PIL import Image
+
+from .cloud_vl import CloudVL, Upload
+from .finetune import Finetune
+from .transport import ConnectionPool
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+__version__ = _pkg_version("moondream")
+
+
+@dataclass
+class MockConfig:
+    """What the mock server sends back, and how slowly.
+
+    Attributes:
+        latency: Seconds before response headers are sent.
+        chunk_delay: Seconds between streamed chunks.
+        chunks: Chunks per streamed response.
+        chunk_bytes: Text size of each streamed chunk.
+        objects: Boxes or points per detect/point response.
+        path_bytes: Size of the SVG path in segment responses.
+    """
+
+    latency: float = 0.0
+    chunk_delay: float = 0.0
+    chunks: int = 16
+    chunk_bytes: int = 4
+    objects: int = 4
+    path_bytes: int = 1024
+
+
+def _box(i: int) -> dict:
+    return {"x_min": 0.1, "y_min": 0.1 + i * 1e-3, "x_max": 0.5, "y_max": 0.6}
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_MockHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self._respond()
+
+    def do_DELETE(self):
+        self._respond()
+
+    def _body(self) -> dict:
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding"):
+            raw = zlib.decompress(raw, 32 + zlib.MAX_WBITS)
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("multipart/"):
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + raw
+            )
+            for part in message.iter_parts():
+                if part.get_param("name", header="content-disposition") == "payload":
+                    return json.loads(part.get_payload(decode=True))
+            return {}
+        return json.loads(raw) if raw else {}
+
+    def _respond(self) -> None:
+        body = self._body()
+        config = self.server.config
+        if config.latency:
+            time.sleep(config.latency)
+        path = self.path.split("?", 1)[0]
+        name = path.rstrip("/").rsplit("/", 1)[-1]
+        if "/tuning/" in path:
+            self._send_json(self._tuning(path, name, body))
+        elif body.get("stream"):
+            self._send_events(self._events(name))
+        else:
+            self._send_json(self._skill(name))
+
+    def _text(self, size: int) -> str:
+        return ("moondream " * (size // 10 + 1))[:size]
+
+    def _skill(self, name: str) -> dict:
+        config = self.server.config
+        text = self._text(config.chunks * config.chunk_bytes)
+        if name == "detect":
+            return {"objects": [_box(i) for i in range(config.objects)]}
+        if name == "point":
+            return {"points": [{"x": 0.5, "y": 0.5}] * config.objects}
+        if name == "segment":
+            return {"path": self._path(), "bbox": _box(0)}
+        return {"caption": text, "answer": text}
+
+    def _path(self) -> str:
+        size = self.server.config.path_bytes
+        return ("M0 0 " + "L0.5 0.5 " * (size // 9 + 1))[:size]
+
+    def _events(self, name: str) -> List[dict]:
+        config = self.server.config
+        if name == "segment":
+            path = self._path()
+            step = max(1, len(path) // max(1, config.chunks))
+            return (
+                [{"type": "bbox", "bbox": _box(0)}]
+                + [
+                    {"type": "path_delta", "chunk": path[i : i + step], "completed": False}
+                    for i in range(0, len(path), step)
+                ]
+                + [{"type": "final", "path": path, "bbox": _box(0), "completed": True}]
+            )
+        chunk = self._text(config.chunk_bytes)
+        return [{"chunk": chunk}] * config.chunks + [{"completed": True}]
+
+    def _tuning(self, path: str, name: str, body: dict) -> dict:
+        finetune = {"finetune_id": "ft_bench", "name": "bench", "rank": 8}
+        parent = path.rstrip("/").rsplit("/", 2)[-2]
+        if name == "finetunes" or (parent == "finetunes" and self.command == "GET"):
+            return {"finetune": finetune, **finetune}
+        if name == "rollouts":
+            return {
+                "request": body.get("request", {}),
+                "rollouts": [
+                    {"skill": "query", "output": {"answer": self._text(64)}}
+                ]
+                * body.get("num_rollouts", 1),
+            }
+        if name == "train_step":
+            return {"step": 1}
+        return {}
+
+    def _send_json(self, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_events(self, events: List[dict]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        delay = self.server.config.chunk_delay
+        for event in events:
+            if delay:
+                time.sleep(delay)
+            data = f"data: {json.dumps(event)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    config: MockConfig
+
+
+class MockServer:
+    """Threaded HTTP server on a free loopback port, usable as a context manager."""
+
+    def __init__(self, config: Optional[MockConfig] = None):
+        self.config = MockConfig() if config is None else config
+        self._server: Optional[_MockHTTPServer] = None
+
+    @property
+    def endpoint(self) -> str:
+        if self._server is None:
+            raise RuntimeError("MockServer is not running")
+        return f"http://127.0.0.1:{self._server.server_port}/v1"
+
+    @property
+    def tuning_endpoint(self) -> str:
+        return f"{self.endpoint}/tuning"
+
+    def start(self) -> "MockServer":
+        self._server = _MockHTTPServer(("127.0.0.1", 0), _MockHandler)
+        self._server.config = self.config
+        threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True,
+        ).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+
+@dataclass
+class _Clients:
+    vl: CloudVL
+    ft: Finetune
+    image: Image.Image
+
+
+SCENARIOS: Dict[str, Callable[[_Clients], object]] = {
+    "caption": lambda c: c.vl.caption(c.image),
+    "caption_stream": lambda c: "".join(c.vl.caption(c.image, stream=True)["caption"]),
+    "query": lambda c: c.vl.query(c.image, "What is this?"),
+    "query_text": lambda c: c.vl.query(None, "What is a moondream?"),
+    "detect": lambda c: c.vl.detect(c.image, "car"),
+    "point": lambda c: c.vl.point(c.image, "car"),
+    "segment": lambda c: c.vl.segment(c.image, "car"),
+    "segment_stream": lambda c: list(c.vl.segment(c.image, "car", stream=True)),
+    "rollouts": lambda c: c.ft.rollouts("query", image=c.image, question="What is this?"),
+}
+
+
+@dataclass
+class ScenarioResult:
+    """Measurements for one scenario. Times are in seconds.
+
+    ``cpu_per_request`` counts CPU time of the benchmark's client threads
+    only, so the in-process server does not inflate it.
+    """
+
+    scenario: str
+    requests: int
+    concurrency: int
+    errors: int
+    seconds: float
+    throughput: float
+    latency: Dict[str, float] = field(default_factory=dict)
+    cpu_per_request: float = 0.0
+    peak_rss_bytes: Optional[int] = None
+
+
+def _percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values, with ``q`` in [0, 1]."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _measure(
+    name: str, call: Callable[[], object], requests: int, concurrency: int
+) -> ScenarioResult:
+    latencies: List[float] = []
+    totals = {"errors": 0, "cpu": 0.0}
+    lock = threading.Lock()
+    # next() on itertools.count is atomic, so workers can share it unlocked.
+    tickets = itertools.count()
+
+    def worker() -> None:
+        cpu_start = time.thread_time()
+        local: List[float] = []
+        errors = 0
+        while next(tickets) < requests:
+            started = time.perf_counter()
+            try:
+                call()
+            except Exception:
+                errors += 1
+            local.append(time.perf_counter() - started)
+        cpu = time.thread_time() - cpu_start
+        with lock:
+            latencies.extend(local)
+            totals["errors"] += errors
+            totals["cpu"] += cpu
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return ScenarioResult(
+        scenario=name,
+        requests=requests,
+        concurrency=concurrency,
+        errors=int(totals["errors"]),
+        seconds=seconds,
+        throughput=requests / seconds if seconds else 0.0,
+        latency={
+            "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p50": _percentile(latencies, 0.50),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else 0.0,
+        },
+        cpu_per_request=totals["cpu"] / requests if requests else 0.0,
+        peak_rss_bytes=_peak_rss_bytes(),
+    )
+
+
+def run(
+    scenarios: Optional[Sequence[str]] = None,
+    *,
+    requests: int = 200,
+    concurrency: int = 8,
+    warmup: int = 10,
+    image_size: int = 512,
+    upload: Upload = "json",
+    server: Optional[MockConfig] = None,
+) -> dict:
+    """Benchmark ``scenarios`` (default: all) and return the JSON-ready report.
+
+    Each scenario first makes ``warmup`` unmeasured calls so connection setup
+    is not counted, then ``requests`` calls spread over ``concurrency``
+    threads.
+    """
+    names = list(SCENARIOS) if scenarios is None else list(scenarios)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"Unknown scenarios {unknown}; expected some of {list(SCENARIOS)}")
+    if requests < 1 or concurrency < 1:
+        raise ValueError("requests and concurrency must be at least 1")
+
+    config = MockConfig() if server is None else server
+    image = Image.effect_noise((image_size, image_size), 64).convert("RGB")
+    results = []
+    with MockServer(config) as mock:
+        pool = ConnectionPool(max_size=concurrency)
+        clients = _Clients(
+            vl=CloudVL(endpoint=mock.endpoint, api_key="bench", pool=pool, upload=upload),
+            ft=Finetune(
+                api_key="bench",
+                endpoint=mock.tuning_endpoint,
+                finetune_id="ft_bench",
+                name="bench",
+                rank=8,
+                pool=pool,
+            ),
+            image=image,
+        )
+        try:
+            for name in names:
+                call = lambda scenario=SCENARIOS[name]: scenario(clients)
+                for _ in range(warmup):
+                    call()
+                results.append(_measure(name, call, requests, concurrency))
+        finally:
+            pool.clear()
+
+    return {
+        "moondream": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "requests": requests,
+            "concurrency": concurrency,
+            "warmup": warmup,
+            "image_size": image_size,
+            "upload": upload,
+            "server": asdict(config),
+        },
+        "results": [asdict(result) for result in results],
+        "peak_rss_bytes": _peak_rss_bytes(),
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m moondream.bench",
+        description="Benchmark moondream client overhead against a local mock server.",
+    )
+    parser.add_argument(
+        "scenarios", nargs="*", metavar="SCENARIO",
+        help=f"Scenarios to run (default: all). Choices: {', '.join(SCENARIOS)}",
+    )
+    parser.add_argument("--requests", type=int, default=200, help="Measured calls per scenario.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads.")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured calls per scenario.")
+    parser.add_argument("--image-size", type=int, default=512, help="Side of the test image in pixels.")
+    parser.add_argument("--upload", choices=("json", "multipart"), default="json")
+    parser.add_argument("--latency", type=float, default=0.0, help="Server delay before responding, in seconds.")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Server delay between streamed chunks.")
+    parser.add_argument("--chunks", type=int, default=16, help="Chunks per streamed response.")
+    parser.add_argument("--objects", type=int, default=4, help="Boxes or points per response.")
+    parser.add_argument("--path-bytes", type=int, default=1024, help="Size of segment paths.")
+    parser.add_argument("--output", "-o", help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args(argv)
+
+    try:
+        report = run(
+            args.scenarios or None,
+            requests=args.requests,
+            concurrency=args.concurrency,
+            warmup=args.warmup,
+            image_size=args.image_size,
+            upload=args.upload,
+            server=MockConfig(
+                latency=args.latency,
+                chunk_delay=args.chunk_delay,
+                chunks=args.chunks,
+                objects=args.objects,
+                path_bytes=args.path_bytes,
+            ),
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+"""The ``moondream`` command line tool.
+
+``moondream batch`` runs one skill over every image in a directory or a
+manifest and writes one JSON line per image::
+
+    moondream batch --skill detect --object car --input manifest.txt --output out.jsonl
+
+Images are read (and, for formats that can't be sent as-is, decoded) on a
+pool of reader threads while earlier images are being encoded and sent, with
+a bounded number of images held in memory at once. Progress lives next to the
+output in a job file: rerunning the same command after a crash or Ctrl-C
+skips every image that already has a line in the output.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import io
+import json
+import os
+import sys
+import time
+import urllib.request
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from PIL import Image
+
+from .batch import SKILLS
+from .types import VLM, BytesEncodedImage
+
+IMAGE_EXTENSIONS = frozenset(
+    (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif", ".tif", ".tiff")
+)
+
+# Reads are started at most this many times the inference concurrency ahead
+# of the images being processed.
+_READ_AHEAD_FACTOR = 2
+# Seconds between fsyncs of the output and rewrites of the job file.
+_CHECKPOINT_INTERVAL = 1.0
+# Seconds between progress lines.
+_PROGRESS_INTERVAL = 1.0
+
+_JOB_VERSION = 1
+
+
+def _is_url(source: str) -> bool:
+    return source.startswith(("http://", "https://"))
+
+
+def list_inputs(source: str) -> List[str]:
+    """Image paths under a directory, or the entries of a manifest file.
+
+    A manifest lists one local path or http(s) URL per line; blank lines and
+    lines starting with ``#`` are skipped. Relative paths are resolved against
+    the manifest's directory.
+    """
+    if os.path.isdir(source):
+        found = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                    found.append(os.path.join(root, name))
+        return found
+
+    base = os.path.dirname(os.path.abspath(source))
+    entries = []
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            entry = line.strip()
+            if not entry or entry.startswith("#"):
+                continue
+            if not _is_url(entry) and not os.path.isabs(entry):
+                entry = os.path.join(base, entry)
+            entries.append(entry)
+    return entries
+
+
+def load_image(source: str, timeout: Optional[float] = 60.0):
+    """Read one input as a BytesEncodedImage, or a decoded image for other formats.
+
+    JPEG, PNG and WebP bytes are passed through untouched so the client can
+    send them without re-encoding.
+    """
+    if _is_url(source):
+        with urllib.request.urlopen(source, timeout=timeout) as response:
+            data = response.read()
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+    try:
+        return BytesEncodedImage.from_bytes(data)
+    except ValueError:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        return image
+
+
+class Job:
+    """The job file that makes a batch run resumable.
+
+    It records the run's settings, so a resumed run can't silently mix
+    results from different prompts, along with progress counters. The output
+    JSONL is the record of which inputs are done; it is fsynced at every
+    checkpoint, and a line cut short by a crash is dropped on resume.
+    """
+
+    def __init__(self, path: str, settings: dict):
+        self.path = path
+        self.settings = settings
+        self.done = 0
+        self.errors = 0
+        self.total = 0
+
+    def load(self, restart: bool) -> bool:
+        """Check an existing job file against this run. Returns True to resume."""
+        if restart or not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            previous = json.load(f)
+        if previous.get("settings") != self.settings:
+            raise ValueError(
+                f"{self.path} belongs to a run with different settings; "
+                "pass --restart to discard it"
+            )
+        return True
+
+    def save(self, finished: bool = False) -> None:
+        state = {
+            "version": _JOB_VERSION,
+            "settings": self.settings,
+            "total": self.total,
+            "done": self.done,
+            "errors": self.errors,
+            "finished": finished,
+            "updated": time.time(),
+        }
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+def _completed(output: str, retry_errors: bool) -> Tuple[Set[str], int]:
+    """Inputs that already have a line in ``output``, and how many of those failed.
+
+    An input's last line decides its state. With ``retry_errors``, failed
+    inputs are left out so they run again. Truncates a partial last line left
+    by a crash so appends start cleanly.
+    """
+    failed: Dict[str, bool] = {}
+    if not os.path.exists(output):
+        return set(), 0
+    with open(output, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        if line.strip():
+            record = json.loads(line)
+            failed[record["input"]] = "error" in record
+    if retry_errors:
+        return {key for key, error in failed.items() if not error}, 0
+    return set(failed), sum(failed.values())
+
+
+class _Progress:
+    def __init__(self, job: Job, stream, enabled: bool):
+        self.job = job
+        self.stream = stream
+        self.enabled = enabled
+        self.started = time.monotonic()
+        self.initial = job.done
+        self.last = 0.0
+
+    def update(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not self.enabled or (not force and now - self.last < _PROGRESS_INTERVAL):
+            return
+        self.last = now
+        elapsed = now - self.started
+        rate = (self.job.done - self.initial) / elapsed if elapsed > 0 else 0.0
+        remaining = self.job.total - self.job.done
+        eta = f"{remaining / rate:.0f}s" if rate > 0 else "?"
+        self.stream.write(
+            f"\r{self.job.done}/{self.job.total} done, {self.job.errors} errors, "
+            f"{rate:.1f} images/s, ETA {eta}   "
+        )
+        self.stream.flush()
+
+
+def _read_ahead(
+    sources: Sequence[str],
+    params: dict,
+    readers: concurrent.futures.Executor,
+    depth: int,
+    keys: Dict[int, str],
+    on_error: Callable[[str, BaseException], None],
+) -> Iterator[dict]:
+    """Yield skill kwargs for ``sources``, keeping ``depth`` reads in flight.
+
+    ``keys`` maps the index of each yielded item to its source. Sources that
+    can't be read go to ``on_error`` instead of being yielded.
+    """
+    pending: collections.deque = collections.deque()
+    items = iter(sources)
+    index = 0
+    try:
+        while True:
+            while len(pending) < depth:
+                source = next(items, None)
+                if source is None:
+                    break
+                pending.append((source, readers.submit(load_image, source)))
+            if not pending:
+                return
+            source, future = pending.popleft()
+            try:
+                image = future.result()
+            except Exception as exc:
+                on_error(source, exc)
+                continue
+            keys[index] = source
+            index += 1
+            yield {"image": image, **params}
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def _error_text(exc: BaseException) -> str:
+    return f"{type(exc).__name__}: {exc}"
+
+
+def run_batch_job(
+    model: VLM,
+    skill: str,
+    params: dict,
+    source: str,
+    output: str,
+    *,
+    backend: Optional[dict] = None,
+    job_path: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    readers: int = 4,
+    restart: bool = False,
+    retry_errors: bool = False,
+    progress=None,
+) -> Job:
+    """Run ``skill`` over every image in ``source``, appending results to ``output``.
+
+    Each output line is ``{"input": ..., "result": {...}}`` or
+    ``{"input": ..., "error": "..."}``, in completion order. Returns the job
+    with its final counters. ``progress`` is a text stream for live stats.
+    ``backend`` describes the client that ``model`` was built with (model
+    name, endpoint and so on); it is saved with the job so a resume against a
+    different backend is refused.
+    """
+    if skill not in SKILLS:
+        raise ValueError(f"Unknown skill {skill!r}; expected one of {SKILLS}")
+    if concurrency is None:
+        concurrency = model.default_max_concurrency
+    job = Job(
+        f"{output}.job" if job_path is None else job_path,
+        {
+            "skill": skill,
+            "params": params,
+            "input": os.path.abspath(source),
+            "backend": backend or {},
+        },
+    )
+    resume = job.load(restart)
+    if not resume and os.path.exists(output):
+        if not restart:
+            raise ValueError(
+                f"{output} already exists and has no job file to resume from; "
+                "pass --restart to overwrite it"
+            )
+        os.remove(output)
+    done, errors = _completed(output, retry_errors) if resume else (set(), 0)
+
+    sources = list_inputs(source)
+    todo = [s for s in sources if s not in done]
+    job.total = len(sources)
+    job.done = len(sources) - len(todo)
+    job.errors = errors
+    job.save()
+
+    meter = _Progress(job, progress, progress is not None)
+    keys: Dict[int, str] = {}
+    last_checkpoint = time.monotonic()
+    with open(output, "a", encoding="utf-8") as out, concurrent.futures.ThreadPoolExecutor(
+        max_workers=readers, thread_name_prefix="moondream-read"
+    ) as pool:
+
+        def record(key: str, line: dict) -> None:
+            nonlocal last_checkpoint
+            out.write(json.dumps({"input": key, **line}) + "\n")
+            job.done += 1
+            if "error" in line:
+                job.errors += 1
+            now = time.monotonic()
+            if now - last_checkpoint >= _CHECKPOINT_INTERVAL:
+                last_checkpoint = now
+                out.flush()
+                os.fsync(out.fileno())
+                job.save()
+            meter.update()
+
+        inputs = _read_ahead(
+            todo,
+            params,
+            pool,
+            concurrency * _READ_AHEAD_FACTOR,
+            keys,
+            lambda key, exc: record(key, {"error": _error_text(exc)}),
+        )
+        try:
+            for index, result in model.map(
+                skill, inputs, max_concurrency=concurrency, ordered=False
+            ):
+                key = keys.pop(index)
+                if isinstance(result, Exception):
+                    record(key, {"error": _error_text(result)})
+                else:
+                    record(key, {"result": result})
+        finally:
+            out.flush()
+            os.fsync(out.fileno())
+            job.save(finished=job.done == job.total)
+            meter.update(force=True)
+            if meter.enabled:
+                progress.write("\n")
+    return job
+
+
+def _skill_params(args: argparse.Namespace) -> dict:
+    params: dict = {}
+    if args.skill in ("detect", "point", "segment"):
+        if not args.object:
+            raise ValueError(f"--object is required for {args.skill}")
+        params["object"] = args.object
+    if args.skill == "query":
+        if not args.question:
+            raise ValueError("--question is required for query")
+        params["question"] = args.question
+        if args.reasoning:
+            params["reasoning"] = True
+    if args.skill == "caption":
+        params["length"] = args.length
+    return params
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="moondream", description="Moondream command line tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser(
+        "batch",
+        help="Run a skill over a directory or manifest of images.",
+        description="Run a skill over every image in a directory or manifest, "
+        "writing one JSON line per image. Rerun the same command to resume.",
+    )
+    batch.add_argument("--skill", required=True, choices=SKILLS)
+    batch.add_argument("--input", required=True, help="Directory of images, or a manifest with one path or URL per line.")
+    batch.add_argument("--output", required=True, help="JSONL file to append results to.")
+    batch.add_argument("--object", help="Object to detect, point at or segment.")
+    batch.add_argument("--question", help="Question for query.")
+    batch.add_argument("--reasoning", action="store_true", help="Enable reasoning for query.")
+    batch.add_argument("--length", default="normal", choices=("short", "normal", "long"), help="Caption length.")
+    batch.add_argument("--job", help="Job file (default: OUTPUT.job).")
+    batch.add_argument("--restart", action="store_true", help="Discard previous progress and start over.")
+    batch.add_argument("--retry-errors", action="store_true", help="On resume, rerun images that failed.")
+    batch.add_argument("--concurrency", type=int, help="Calls in flight (default: the backend's default).")
+    batch.add_argument("--readers", type=int, default=4, help="Threads reading and decoding images.")
+    batch.add_argument("--local", action="store_true", help="Run on a local GPU with Photon.")
+    batch.add_argument("--endpoint", help="API endpoint (default: Moondream Cloud).")
+    batch.add_argument("--api-key", default=os.environ.get("MOONDREAM_API_KEY"), help="API key (default: $MOONDREAM_API_KEY).")
+    batch.add_argument("--model", help="Model name.")
+    batch.add_argument("--max-image-side", type=int, help="Downscale images so neither side exceeds this.")
+    batch.add_argument("--quiet", action="store_true", help="Don't print progress.")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    import moondream as md
+
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    try:
+        params = _skill_params(args)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    kwargs: dict = {"api_key": args.api_key, "local": args.local}
+    if args.endpoint:
+        kwargs["endpoint"] = args.endpoint
+    if args.model:
+        kwargs["model"] = args.model
+    if args.max_image_side:
+        kwargs["max_image_side"] = args.max_image_side
+    model = md.vl(**kwargs)
+    # Everything that picks the backend except the credentials.
+    backend = {k: v for k, v in kwargs.items() if k != "api_key"}
+
+    try:
+        job = run_batch_job(
+            model,
+            args.skill,
+            params,
+            args.input,
+            args.output,
+            backend=backend,
+            job_path=args.job,
+            concurrency=args.concurrency,
+            readers=args.readers,
+            restart=args.restart,
+            retry_errors=args.retry_errors,
+            progress=None if args.quiet else sys.stderr,
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume.", file=sys.stderr)
+        return 130
+    return 1 if job.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
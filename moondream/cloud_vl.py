@@ -1,14 +1,47 @@
-import base64
+import concurrent.futures
 import json
+import time
+import urllib.error
 import urllib.request
-from io import BytesIO
-from typing import Literal, Optional, Union
+import uuid
+from typing import Callable, List, Literal, Optional, Sequence, Tuple, Union
 
 from PIL import Image
 
+from .arrays import DetectResult, PointResult
+from .balancer import EndpointBalancer, Lease
+from .image import (
+    EncodeCache,
+    EncodeOptions,
+    _resolve_options,
+    image_bytes,
+    to_base64,
+)
+from .masks import PathParser, parse_path
+from .ratelimit import (
+    _NO_PERMIT,
+    Permit,
+    RateLimit,
+    RateLimiter,
+    _NoPermit,
+    shared_limiter,
+)
+from .streaming import Stop, StopWhen, _stops_early, stop_early
+from .timing import OnRequestComplete, RequestTiming, _finish, _timed_chunks
+from .transport import (
+    Compression,
+    ConnectionPool,
+    RetryBudget,
+    RetryPolicy,
+    TransferStats,
+    default_pool,
+    with_retries,
+)
 from .types import (
     VLM,
+    AnalyzeOutput,
     Base64EncodedImage,
+    BytesEncodedImage,
     CaptionOutput,
     DetectOutput,
     EncodedImage,
@@ -17,59 +50,477 @@ from .types import (
     Region,
     SamplingSettings,
     SegmentOutput,
+    SegmentStreamChunk,
     SpatialRef,
 )
 from importlib.metadata import version as _pkg_version
 
 __version__ = _pkg_version("moondream")
 
+DEFAULT_RETRY_POLICY = RetryPolicy()
+DEFAULT_TIMEOUT = 60.0
+
+Upload = Literal["json", "multipart"]
+CaptionLength = Literal["normal", "short", "long"]
+
+# (label, skill, kwargs) for one sub-request of analyze().
+_SubRequest = Tuple[str, str, dict]
+
+
+def _sse_data(line: bytes) -> Optional[dict]:
+    """Decode one server-sent-events line, returning None for non-data lines."""
+    if not line:
+        return None
+    text = line.decode("utf-8")
+    if not text.startswith("data: "):
+        return None
+    try:
+        return json.loads(text[6:])
+    except json.JSONDecodeError as e:
+        raise ValueError("Failed to parse JSON response from server.") from e
+
+
+def _segment_update(data: dict) -> Optional[SegmentStreamChunk]:
+    """Map a streamed segment message to the update dict yielded to callers."""
+    msg_type = data.get("type", "")
+    if msg_type == "bbox":
+        return {"bbox": data.get("bbox")}
+    if msg_type == "path_delta":
+        chunk = data.get("chunk", "")
+        return {"chunk": chunk} if chunk else None
+    if msg_type == "final":
+        return {
+            "path": data.get("path", ""),
+            "bbox": data.get("bbox"),
+            "completed": True,
+        }
+    return None
+
+
+class _SegmentGeometry:
+    """Adds parsed geometry to streamed segment updates.
+
+    Each path chunk is fed to one incremental parser, so the work per chunk
+    does not grow with the path.
+    """
+
+    def __init__(self):
+        self._parser = PathParser()
+
+    def __call__(self, update: SegmentStreamChunk) -> SegmentStreamChunk:
+        chunk = update.get("chunk")
+        if chunk:
+            commands = self._parser.feed(chunk)
+            if commands:
+                update["commands"] = commands
+        if update.get("completed"):
+            update["geometry"] = parse_path(update.get("path") or "")
+        return update
+
+
+def _multipart_body(payload: dict, image: bytes, mime_type: str) -> Tuple[bytes, str]:
+    """Encode ``payload`` as a JSON part followed by the raw ``image`` bytes.
+
+    Returns the body and its Content-Type header.
+    """
+    boundary = uuid.uuid4().hex
+    head = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="payload"\r\n'
+        "Content-Type: application/json\r\n\r\n"
+        f"{json.dumps(payload)}\r\n"
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="image"; filename="image"\r\n'
+        f"Content-Type: {mime_type}\r\n\r\n"
+    ).encode("utf-8")
+    tail = f"\r\n--{boundary}--\r\n".encode("ascii")
+    return b"".join((head, image, tail)), f"multipart/form-data; boundary={boundary}"
+
+
+class _MultipartRequest(urllib.request.Request):
+    """A multipart upload that can be rebuilt as a JSON request."""
+
+    def __init__(
+        self,
+        url: str,
+        data: bytes,
+        headers: dict,
+        as_json: Callable[[], urllib.request.Request],
+    ):
+        super().__init__(url, data=data, headers=headers)
+        self.as_json = as_json
+
+
+def _timing(req: urllib.request.Request) -> Optional[RequestTiming]:
+    """The timing record attached to ``req`` when a hook is listening."""
+    return getattr(req, "timing", None)
+
+
+class _Slot:
+    """The rate-limit permit and endpoint lease held by one request attempt.
+
+    ``request`` is the request to send, pointed at the leased endpoint. As a
+    context manager it releases both on exit, passing along any exception.
+    """
 
-class CloudVL(VLM):
+    def __init__(
+        self,
+        permit: Union[Permit, _NoPermit],
+        lease: Optional[Lease],
+        request: urllib.request.Request,
+    ):
+        self.permit = permit
+        self.lease = lease
+        self.request = request
+
+    def responded(self) -> None:
+        if self.lease is not None:
+            self.lease.responded()
+
+    def release(self, exc: Optional[BaseException] = None) -> None:
+        if self.lease is not None:
+            self.lease.release(exc)
+        self.permit.release(exc)
+
+    def __enter__(self) -> "_Slot":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release(exc)
+
+
+class _CloudRequests:
+    """Image encoding and request building shared by the sync and async clients."""
+
+    endpoint: str
+    balancer: Optional[EndpointBalancer]
+    rate_limiter: Optional[RateLimiter] = None
+    api_key: Optional[str]
+    model: Optional[str]
+    timeout: Optional[float]
+    encode_options: EncodeOptions
+    image_cache: Optional[EncodeCache]
+    compression: Optional[Compression]
+    on_transfer: Optional[Callable[[TransferStats], None]]
+    on_request_complete: Optional[OnRequestComplete] = None
+    upload: Upload
+    _multipart: bool
+
+    def _init_endpoint(
+        self, endpoint: Union[str, Sequence[str], EndpointBalancer]
+    ) -> None:
+        if isinstance(endpoint, str):
+            self.endpoint = endpoint
+            self.balancer = None
+            return
+        if not isinstance(endpoint, EndpointBalancer):
+            endpoint = EndpointBalancer(endpoint)
+        self.balancer = endpoint
+        # Requests are built against the first endpoint and re-pointed at
+        # whichever one the balancer picks for each attempt.
+        self.endpoint = endpoint.endpoints[0]
+
+    def _slot(self, req: urllib.request.Request) -> _Slot:
+        """Wait for the rate limiter and pick an endpoint for one attempt of ``req``."""
+        permit = (
+            _NO_PERMIT if self.rate_limiter is None else self.rate_limiter.acquire()
+        )
+        lease = None
+        try:
+            if self.balancer is not None:
+                req, lease = self.balancer.route(req)
+        except BaseException:
+            permit.release()
+            raise
+        return _Slot(permit, lease, req)
+
+    def _init_upload(self, upload: Upload) -> None:
+        if upload not in ("json", "multipart"):
+            raise ValueError("upload must be 'json' or 'multipart'")
+        self.upload = upload
+        self._multipart = upload == "multipart"
+
+    def _json_fallback(
+        self, req: urllib.request.Request, exc: urllib.error.HTTPError
+    ) -> urllib.request.Request:
+        """Return the JSON form of a multipart upload the endpoint rejected.
+
+        A 415 response means the endpoint doesn't accept multipart bodies, so
+        later calls on this client go straight to JSON. Anything else is
+        re-raised.
+        """
+        if exc.code != 415 or not isinstance(req, _MultipartRequest):
+            raise exc
+        exc.close()
+        self._multipart = False
+        return req.as_json()
+
+    def _report_transfer(self, response) -> None:
+        if self.on_transfer is not None:
+            self.on_transfer(response.transfer)
+
+    def _timeout(self, timeout: Optional[float]) -> Optional[float]:
+        """Per-call timeout if given, else the client's default."""
+        return self.timeout if timeout is None else timeout
+
+    def _headers(self, content_type: str) -> dict:
+        headers = {
+            "Content-Type": content_type,
+            "User-Agent": f"moondream-python/{__version__}",
+        }
+        if self.api_key:
+            headers["X-Moondream-Auth"] = self.api_key
+        return headers
+
+    def _request(
+        self,
+        path: str,
+        payload: dict,
+        image: Optional[Union[Image.Image, EncodedImage]] = None,
+    ) -> urllib.request.Request:
+        """Build the request for ``path``, attaching ``image`` if given.
+
+        In multipart mode the image is sent as raw bytes next to the JSON
+        payload; otherwise it is embedded as a base64 ``image_url``. With an
+        ``on_request_complete`` hook the request carries a ``timing`` record.
+        """
+        timing = None
+        if self.on_request_complete is not None:
+            timing = RequestTiming(call=path)
+        if image is None or not self._multipart:
+            return self._json_request(path, payload, image, timing)
+
+        started = time.perf_counter()
+        data, mime_type = image_bytes(image, self.encode_options, self.image_cache)
+        encoded = time.perf_counter()
+        body, content_type = _multipart_body(payload, data, mime_type)
+        req = _MultipartRequest(
+            f"{self.endpoint}/{path}",
+            body,
+            self._headers(content_type),
+            lambda: self._json_request(path, payload, image, timing),
+        )
+        if timing is not None:
+            timing.encode_seconds += encoded - started
+            timing.serialize_seconds += time.perf_counter() - encoded
+            timing.payload_bytes = len(body)
+            req.timing = timing
+        return req
+
+    def _json_request(
+        self,
+        path: str,
+        payload: dict,
+        image: Optional[Union[Image.Image, EncodedImage]] = None,
+        timing: Optional[RequestTiming] = None,
+    ) -> urllib.request.Request:
+        started = time.perf_counter()
+        if image is not None:
+            payload = {"image_url": self.encode_image(image).image_url, **payload}
+        encoded = time.perf_counter()
+        data = json.dumps(payload).encode("utf-8")
+        req = urllib.request.Request(
+            f"{self.endpoint}/{path}",
+            data=data,
+            headers=self._headers("application/json"),
+        )
+        if timing is not None:
+            timing.encode_seconds += encoded - started
+            timing.serialize_seconds += time.perf_counter() - encoded
+            timing.payload_bytes = len(data)
+            req.timing = timing
+        return req
+
+    def encode_image(
+        self, image: Union[Image.Image, EncodedImage]
+    ) -> Base64EncodedImage:
+        return to_base64(image, self.encode_options, self.image_cache)
+
+    def _encode_once(self, image: Union[Image.Image, EncodedImage]) -> EncodedImage:
+        """Encode ``image`` into the form the upload mode sends, for reuse."""
+        if self._multipart:
+            data, mime_type = image_bytes(image, self.encode_options, self.image_cache)
+            return BytesEncodedImage(data=data, mime_type=mime_type)
+        return self.encode_image(image)
+
+    def _analyze_requests(
+        self,
+        queries: Sequence[str],
+        detect: Sequence[str],
+        point: Sequence[str],
+        caption: Optional[CaptionLength],
+        settings: Optional[SamplingSettings],
+        timeout: Optional[float],
+    ) -> List[_SubRequest]:
+        common = {"settings": settings, "timeout": timeout}
+        requests: List[_SubRequest] = []
+        if caption is not None:
+            requests.append(("caption", "caption", {"length": caption, **common}))
+        for question in queries:
+            requests.append((f"query:{question}", "query", {"question": question, **common}))
+        for skill, objects in (("detect", detect), ("point", point)):
+            for name in objects:
+                requests.append((f"{skill}:{name}", skill, {"object": name, **common}))
+        return requests
+
+    @staticmethod
+    def _analyze_output(
+        requests: List[_SubRequest], results: List[Union[dict, BaseException]]
+    ) -> AnalyzeOutput:
+        output: AnalyzeOutput = {"answers": {}, "objects": {}, "points": {}, "errors": {}}
+        for (label, skill, kwargs), result in zip(requests, results):
+            if isinstance(result, BaseException):
+                output["errors"][label] = result
+            elif skill == "caption":
+                output["caption"] = result["caption"]
+            elif skill == "query":
+                output["answers"][kwargs["question"]] = result["answer"]
+            elif skill == "detect":
+                output["objects"][kwargs["object"]] = result["objects"]
+            else:
+                output["points"][kwargs["object"]] = result["points"]
+        return output
+
+
+class CloudVL(_CloudRequests, VLM):
     def __init__(
         self,
         *,
-        endpoint: str = "https://api.moondream.ai/v1",
+        endpoint: Union[
+            str, Sequence[str], EndpointBalancer
+        ] = "https://api.moondream.ai/v1",
         api_key: Optional[str] = None,
         model: Optional[str] = None,
+        pool: Optional[ConnectionPool] = None,
+        retry: Optional[RetryPolicy] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+        max_image_side: Optional[int] = None,
+        max_pixels: Optional[int] = None,
+        encode_options: Optional[EncodeOptions] = None,
+        image_cache: Optional[EncodeCache] = None,
+        compression: Optional[Compression] = None,
+        on_transfer: Optional[Callable[[TransferStats], None]] = None,
+        upload: Upload = "json",
+        rate_limit: Optional[RateLimit] = None,
+        on_request_complete: Optional[OnRequestComplete] = None,
     ):
         self.api_key = api_key
-        self.endpoint = endpoint
+        self._init_endpoint(endpoint)
         self.model = model
+        self.pool = default_pool() if pool is None else pool
+        self.retry = DEFAULT_RETRY_POLICY if retry is None else retry
+        self.retry_budget = RetryBudget() if retry_budget is None else retry_budget
+        self.timeout = timeout
+        self.encode_options = _resolve_options(
+            encode_options, max_image_side, max_pixels
+        )
+        self.image_cache = image_cache
+        self.compression = compression
+        self.on_transfer = on_transfer
+        self.on_request_complete = on_request_complete
+        self._init_upload(upload)
+        self.rate_limiter: Optional[RateLimiter] = (
+            None if rate_limit is None else shared_limiter(api_key, rate_limit)
+        )
 
-    def encode_image(
-        self, image: Union[Image.Image, EncodedImage]
-    ) -> Base64EncodedImage:
-        if isinstance(image, EncodedImage):
-            assert type(image) == Base64EncodedImage
-            return image
+    def _open(self, req: urllib.request.Request, timeout: Optional[float] = None):
+        """Open ``req`` on the pool, retrying failures that happen before the body.
+
+        Returns the response and its slot, which the caller releases once the
+        response is closed.
+        """
+
+        timing = _timing(req)
+
+        def attempt():
+            slot = self._slot(req)
+            if timing is not None:
+                timing.attempts += 1
+            try:
+                response = self.pool.urlopen(
+                    slot.request,
+                    timeout=self._timeout(timeout),
+                    compression=self.compression,
+                )
+            except BaseException as exc:
+                slot.release(exc)
+                raise
+            slot.responded()
+            if timing is not None:
+                timing.record_response(response)
+            return response, slot
+
+        try:
+            return with_retries(attempt, self.retry, self.retry_budget)
+        except urllib.error.HTTPError as exc:
+            return self._open(self._json_fallback(req, exc), timeout)
+
+    def _request_json(
+        self, req: urllib.request.Request, timeout: Optional[float] = None
+    ) -> dict:
+        timing = _timing(req)
         try:
-            if image.mode != "RGB":
-                image = image.convert("RGB")
-            buffered = BytesIO()
-            image.save(buffered, format="JPEG", quality=95)
-            img_str = base64.b64encode(buffered.getvalue()).decode()
-            return Base64EncodedImage(image_url=f"data:image/jpeg;base64,{img_str}")
-        except Exception as e:
-            raise ValueError("Failed to convert image to JPEG.") from e
-
-    def _stream_response(self, req):
+            result = self._send_json(req, timeout, timing)
+        except Exception as exc:
+            _finish(timing, self.on_request_complete, exc)
+            raise
+        _finish(timing, self.on_request_complete, None)
+        return result
+
+    def _send_json(
+        self,
+        req: urllib.request.Request,
+        timeout: Optional[float],
+        timing: Optional[RequestTiming],
+    ) -> dict:
+        def attempt() -> dict:
+            if timing is not None:
+                timing.attempts += 1
+            with self._slot(req) as slot, self.pool.urlopen(
+                slot.request,
+                timeout=self._timeout(timeout),
+                compression=self.compression,
+            ) as response:
+                slot.responded()
+                body = response.read()
+            self._report_transfer(response)
+            if timing is None:
+                return json.loads(body.decode("utf-8"))
+            timing.record_response(response)
+            started = time.perf_counter()
+            result = json.loads(body.decode("utf-8"))
+            timing.parse_seconds = time.perf_counter() - started
+            return result
+
+        try:
+            return with_retries(attempt, self.retry, self.retry_budget)
+        except urllib.error.HTTPError as exc:
+            return self._send_json(self._json_fallback(req, exc), timeout, timing)
+
+    def _timed(self, req: urllib.request.Request, chunks):
+        """Report ``req``'s timing once the ``chunks`` stream ends."""
+        timing = _timing(req)
+        if timing is None:
+            return chunks
+        return _timed_chunks(chunks, timing, self.on_request_complete)
+
+    def _stream_response(self, req, timeout: Optional[float] = None):
         """Helper function to stream response chunks from the API."""
-        with urllib.request.urlopen(req) as response:
+        response, slot = self._open(req, timeout)
+        try:
             for line in response:
-                if not line:
+                data = _sse_data(line)
+                if data is None:
                     continue
-                line = line.decode("utf-8")
-                if line.startswith("data: "):
-                    try:
-                        data = json.loads(line[6:])
-                        if "chunk" in data:
-                            yield data["chunk"]
-                        if data.get("completed"):
-                            break
-                    except json.JSONDecodeError as e:
-                        raise ValueError(
-                            "Failed to parse JSON response from server."
-                        ) from e
+                if "chunk" in data:
+                    yield data["chunk"]
+                if data.get("completed"):
+                    break
+        finally:
+            response.close()
+            slot.release()
+            self._report_transfer(response)
 
     def caption(
         self,
@@ -77,41 +528,30 @@ class CloudVL(VLM):
         length: Literal["normal", "short", "long"] = "normal",
         stream: bool = False,
         settings: Optional[SamplingSettings] = None,
+        timeout: Optional[float] = None,
+        stop: Optional[Stop] = None,
+        stop_when: Optional[StopWhen] = None,
     ) -> CaptionOutput:
-        encoded_image = self.encode_image(image)
+        stops_early = _stops_early(stream, False, stop, stop_when)
         payload = {
-            "image_url": encoded_image.image_url,
             "length": length,
-            "stream": stream,
+            "stream": stream or stops_early,
         }
         if self.model is not None:
             payload["model"] = self.model
         if settings is not None:
             payload["settings"] = settings
 
-        data = json.dumps(payload).encode("utf-8")
-        headers = {
-            "Content-Type": "application/json",
-            "User-Agent": f"moondream-python/{__version__}",
-        }
-        if self.api_key:
-            headers["X-Moondream-Auth"] = self.api_key
-        req = urllib.request.Request(
-            f"{self.endpoint}/caption",
-            data=data,
-            headers=headers,
-        )
-
-        def generator():
-            for chunk in self._stream_response(req):
-                yield chunk
+        req = self._request("caption", payload, image)
 
-        if stream:
-            return {"caption": generator()}
+        if stream or stops_early:
+            chunks = stop_early(
+                self._timed(req, self._stream_response(req, timeout)), stop, stop_when
+            )
+            return {"caption": chunks if stream else "".join(chunks)}
 
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode("utf-8"))
-            return {"caption": result["caption"]}
+        result = self._request_json(req, timeout)
+        return {"caption": result["caption"]}
 
     def query(
         self,
@@ -120,18 +560,19 @@ class CloudVL(VLM):
         stream: bool = False,
         settings: Optional[SamplingSettings] = None,
         reasoning: bool = False,
+        timeout: Optional[float] = None,
+        stop: Optional[Stop] = None,
+        stop_when: Optional[StopWhen] = None,
     ) -> QueryOutput:
         if question is None:
             raise ValueError("question parameter is required")
+        stops_early = _stops_early(stream, reasoning, stop, stop_when)
 
         payload = {
             "question": question,
-            "stream": stream,
+            "stream": stream or stops_early,
         }
 
-        if image is not None:
-            encoded_image = self.encode_image(image)
-            payload["image_url"] = encoded_image.image_url
         if self.model is not None:
             payload["model"] = self.model
         if settings is not None:
@@ -139,38 +580,29 @@ class CloudVL(VLM):
         if reasoning:
             payload["reasoning"] = reasoning
 
-        data = json.dumps(payload).encode("utf-8")
-        headers = {
-            "Content-Type": "application/json",
-            "User-Agent": f"moondream-python/{__version__}",
-        }
-        if self.api_key:
-            headers["X-Moondream-Auth"] = self.api_key
-        req = urllib.request.Request(
-            f"{self.endpoint}/query",
-            data=data,
-            headers=headers,
-        )
+        req = self._request("query", payload, image)
 
-        if stream:
-            return {"answer": self._stream_response(req)}
+        if stream or stops_early:
+            chunks = stop_early(
+                self._timed(req, self._stream_response(req, timeout)), stop, stop_when
+            )
+            return {"answer": chunks if stream else "".join(chunks)}
 
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode("utf-8"))
-            output = {"answer": result["answer"]}
-            if "reasoning" in result and result["reasoning"] is not None:
-                output["reasoning"] = result["reasoning"]
-            return output
+        result = self._request_json(req, timeout)
+        output = {"answer": result["answer"]}
+        if "reasoning" in result and result["reasoning"] is not None:
+            output["reasoning"] = result["reasoning"]
+        return output
 
     def detect(
         self,
         image: Union[Image.Image, EncodedImage],
         object: str,
         settings: Optional[SamplingSettings] = None,
-    ) -> DetectOutput:
-        encoded_image = self.encode_image(image)
+        timeout: Optional[float] = None,
+        as_arrays: bool = False,
+    ) -> Union[DetectOutput, DetectResult]:
         payload = {
-            "image_url": encoded_image.image_url,
             "object": object,
         }
         if self.model is not None:
@@ -178,32 +610,22 @@ class CloudVL(VLM):
         if settings is not None:
             payload["settings"] = settings
 
-        data = json.dumps(payload).encode("utf-8")
-        headers = {
-            "Content-Type": "application/json",
-            "User-Agent": f"moondream-python/{__version__}",
-        }
-        if self.api_key:
-            headers["X-Moondream-Auth"] = self.api_key
-        req = urllib.request.Request(
-            f"{self.endpoint}/detect",
-            data=data,
-            headers=headers,
-        )
+        req = self._request("detect", payload, image)
 
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode("utf-8"))
-            return {"objects": result["objects"]}
+        result = self._request_json(req, timeout)
+        if as_arrays:
+            return DetectResult.from_output(result)
+        return {"objects": result["objects"]}
 
     def point(
         self,
         image: Union[Image.Image, EncodedImage],
         object: str,
         settings: Optional[SamplingSettings] = None,
-    ) -> PointOutput:
-        encoded_image = self.encode_image(image)
+        timeout: Optional[float] = None,
+        as_arrays: bool = False,
+    ) -> Union[PointOutput, PointResult]:
         payload = {
-            "image_url": encoded_image.image_url,
             "object": object,
         }
         if self.model is not None:
@@ -211,24 +633,16 @@ class CloudVL(VLM):
         if settings is not None:
             payload["settings"] = settings
 
-        data = json.dumps(payload).encode("utf-8")
-        headers = {
-            "Content-Type": "application/json",
-            "User-Agent": f"moondream-python/{__version__}",
-        }
-        if self.api_key:
-            headers["X-Moondream-Auth"] = self.api_key
-        req = urllib.request.Request(
-            f"{self.endpoint}/point",
-            data=data,
-            headers=headers,
-        )
+        req = self._request("point", payload, image)
 
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode("utf-8"))
-            return {"points": result["points"]}
+        result = self._request_json(req, timeout)
+        if as_arrays:
+            return PointResult.from_output(result)
+        return {"points": result["points"]}
 
-    def _stream_segment_response(self, req):
+    def _stream_segment_response(
+        self, req, timeout: Optional[float] = None, geometry: bool = False
+    ):
         """Stream segmentation response, yielding update dicts.
 
         The streaming format sends:
@@ -240,34 +654,29 @@ class CloudVL(VLM):
         - {"bbox": Region} - when bbox is received
         - {"chunk": str} - for each coarse path chunk
         - {"path": str, "bbox": Region, "completed": True} - final message with refined path
+
+        With ``geometry``, chunk updates that complete path commands also carry
+        them under "commands", and the final message carries the refined path
+        parsed under "geometry".
         """
-        with urllib.request.urlopen(req) as response:
+        add_geometry = _SegmentGeometry() if geometry else None
+        response, slot = self._open(req, timeout)
+        try:
             for line in response:
-                if not line:
+                data = _sse_data(line)
+                if data is None:
                     continue
-                line = line.decode("utf-8")
-                if line.startswith("data: "):
-                    try:
-                        data = json.loads(line[6:])
-                        msg_type = data.get("type", "")
-
-                        if msg_type == "bbox":
-                            yield {"bbox": data.get("bbox")}
-                        elif msg_type == "path_delta":
-                            chunk = data.get("chunk", "")
-                            if chunk:
-                                yield {"chunk": chunk}
-                        elif msg_type == "final":
-                            yield {
-                                "path": data.get("path", ""),
-                                "bbox": data.get("bbox"),
-                                "completed": True,
-                            }
-                            break
-                    except json.JSONDecodeError as e:
-                        raise ValueError(
-                            "Failed to parse JSON response from server."
-                        ) from e
+                update = _segment_update(data)
+                if update is not None:
+                    if add_geometry is not None:
+                        update = add_geometry(update)
+                    yield update
+                    if update.get("completed"):
+                        break
+        finally:
+            response.close()
+            slot.release()
+            self._report_transfer(response)
 
     def segment(
         self,
@@ -276,10 +685,12 @@ class CloudVL(VLM):
         spatial_refs: Optional[list[SpatialRef]] = None,
         stream: bool = False,
         settings: Optional[SamplingSettings] = None,
+        timeout: Optional[float] = None,
+        geometry: bool = False,
     ):
-        encoded_image = self.encode_image(image)
+        if geometry and not stream:
+            raise ValueError("geometry=True requires stream=True")
         payload = {
-            "image_url": encoded_image.image_url,
             "object": object,
             "stream": stream,
         }
@@ -290,25 +701,62 @@ class CloudVL(VLM):
         if settings is not None:
             payload["settings"] = settings
 
-        data = json.dumps(payload).encode("utf-8")
-        headers = {
-            "Content-Type": "application/json",
-            "User-Agent": f"moondream-python/{__version__}",
-        }
-        if self.api_key:
-            headers["X-Moondream-Auth"] = self.api_key
-        req = urllib.request.Request(
-            f"{self.endpoint}/segment",
-            data=data,
-            headers=headers,
-        )
+        req = self._request("segment", payload, image)
 
         if stream:
-            return self._stream_segment_response(req)
-
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode("utf-8"))
-            output: SegmentOutput = {"path": result["path"]}
-            if result.get("bbox"):
-                output["bbox"] = result["bbox"]
-            return output
+            return self._timed(
+                req, self._stream_segment_response(req, timeout, geometry)
+            )
+
+        result = self._request_json(req, timeout)
+        output: SegmentOutput = {"path": result["path"]}
+        if result.get("bbox"):
+            output["bbox"] = result["bbox"]
+        return output
+
+    def analyze(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        *,
+        queries: Sequence[str] = (),
+        detect: Sequence[str] = (),
+        point: Sequence[str] = (),
+        caption: Optional[CaptionLength] = None,
+        settings: Optional[SamplingSettings] = None,
+        timeout: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> AnalyzeOutput:
+        """Ask several questions and run several skills on one image at once.
+
+        The image is encoded once and the sub-requests run concurrently over
+        the connection pool. A failed sub-request does not fail the others;
+        its exception is reported under ``errors``.
+
+        Args:
+            image: The image to analyze.
+            queries: Questions to ask.
+            detect: Objects to detect.
+            point: Objects to point at.
+            caption: Caption length, or None for no caption.
+            settings: Sampling settings shared by every sub-request.
+            timeout: Per-request timeout.
+            max_concurrency: Sub-requests in flight. Defaults to the client's
+                default_max_concurrency.
+        """
+        requests = self._analyze_requests(
+            queries, detect, point, caption, settings, timeout
+        )
+        if not requests:
+            return self._analyze_output([], [])
+        encoded = self._encode_once(image)
+        workers = min(len(requests), max_concurrency or self.default_max_concurrency)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(getattr(self, skill), encoded, **kwargs)
+                for _, skill, kwargs in requests
+            ]
+        results = []
+        for future in futures:
+            exc = future.exception()
+            results.append(future.result() if exc is None else exc)
+        return self._analyze_output(requests, results)
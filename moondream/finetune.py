@@ -1,19 +1,41 @@
-import base64
 import json
 import queue
-import random
-import socket
 import threading
 import time
-import urllib.error
 import urllib.parse
 import urllib.request
-from io import BytesIO
 from importlib.metadata import version as _pkg_version
-from typing import Dict, Generator, Iterable, List, Mapping, Optional, Sequence, Union
+from typing import (
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
 
 from PIL import Image
 
+from .image import (
+    DEFAULT_ENCODE_OPTIONS,
+    EncodeOptions,
+    _resolve_options,
+    to_base64,
+)
+from .ratelimit import _NO_PERMIT, RateLimit, RateLimiter, shared_limiter
+from .timing import OnRequestComplete, RequestTiming, _finish
+from .transport import (
+    Compression,
+    ConnectionPool,
+    RetryBudget,
+    RetryPolicy,
+    TransferStats,
+    default_pool,
+    with_retries,
+)
 from .types import (
     Base64EncodedImage,
     CheckpointListOutput,
@@ -36,36 +58,15 @@ __version__ = _pkg_version("moondream")
 
 DEFAULT_TUNING_ENDPOINT = "https://api.moondream.ai/v1/tuning"
 
-_RETRY_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504, 520, 521, 522, 523, 524}
-
-
-def _encode_image(image) -> Base64EncodedImage:
-    if isinstance(image, Base64EncodedImage):
-        return image
-    if not isinstance(image, Image.Image):
-        raise ValueError(f"Unsupported image type: {type(image)}")
-    try:
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-        buffered = BytesIO()
-        image.save(buffered, format="JPEG", quality=95)
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        return Base64EncodedImage(image_url=f"data:image/jpeg;base64,{img_str}")
-    except Exception as exc:
-        raise ValueError("Failed to convert image to JPEG.") from exc
-
 
-def _is_retryable(exc: Exception) -> bool:
-    if isinstance(exc, urllib.error.HTTPError):
-        return exc.code in _RETRY_STATUS_CODES
-    if isinstance(exc, urllib.error.URLError):
-        return True
-    return isinstance(exc, (TimeoutError, socket.timeout))
+def _encode_image(
+    image, options: EncodeOptions = DEFAULT_ENCODE_OPTIONS
+) -> Base64EncodedImage:
+    return to_base64(image, options)
 
 
-_MAX_RETRIES = 10
-_RETRY_BASE_DELAY = 0.5
-_RETRY_MAX_DELAY = 30.0
+# Training runs are long-lived, so finetune requests retry persistently.
+DEFAULT_RETRY_POLICY = RetryPolicy(max_retries=10)
 _REQUEST_TIMEOUT = 60.0
 
 
@@ -78,12 +79,42 @@ class Finetune:
         finetune_id: str,
         name: str,
         rank: int,
+        pool: Optional[ConnectionPool] = None,
+        retry: Optional[RetryPolicy] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        timeout: float = _REQUEST_TIMEOUT,
+        max_image_side: Optional[int] = None,
+        max_pixels: Optional[int] = None,
+        encode_options: Optional[EncodeOptions] = None,
+        compression: Optional[Compression] = None,
+        on_transfer: Optional[Callable[[TransferStats], None]] = None,
+        rate_limit: Optional[RateLimit] = None,
+        on_request_complete: Optional[OnRequestComplete] = None,
     ):
         self.api_key = api_key
         self.endpoint = endpoint.rstrip("/")
         self.finetune_id = finetune_id
         self.name = name
         self.rank = rank
+        self.pool = default_pool() if pool is None else pool
+        self.retry = DEFAULT_RETRY_POLICY if retry is None else retry
+        self.retry_budget = retry_budget
+        self.timeout = timeout
+        self.encode_options = _resolve_options(
+            encode_options, max_image_side, max_pixels
+        )
+        self.compression = compression
+        self.on_transfer = on_transfer
+        self.on_request_complete = on_request_complete
+        self.rate_limiter: Optional[RateLimiter] = (
+            None if rate_limit is None else shared_limiter(api_key, rate_limit)
+        )
+
+    def _permit(self):
+        """Wait for the rate limiter, if any, to admit one request."""
+        if self.rate_limiter is None:
+            return _NO_PERMIT
+        return self.rate_limiter.acquire()
 
     def _headers(self, has_body: bool = False) -> Dict[str, str]:
         headers = {
@@ -109,28 +140,46 @@ class Finetune:
         payload: Optional[dict] = None,
         query: Optional[dict] = None,
     ) -> dict:
+        timing = None
+        if self.on_request_complete is not None:
+            timing = RequestTiming(call=f"{method} {path}")
         data = None if payload is None else json.dumps(payload).encode("utf-8")
-        last_exc: Optional[Exception] = None
-        for attempt in range(_MAX_RETRIES + 1):
-            try:
-                req = urllib.request.Request(
-                    self._url(path, query=query),
-                    data=data,
-                    headers=self._headers(has_body=payload is not None),
-                    method=method,
-                )
-                with urllib.request.urlopen(req, timeout=_REQUEST_TIMEOUT) as response:
-                    body = response.read()
-                    if not body:
-                        return {}
-                    return json.loads(body.decode("utf-8"))
-            except Exception as exc:
-                last_exc = exc
-                if not _is_retryable(exc) or attempt == _MAX_RETRIES:
-                    raise
-                max_delay = min(_RETRY_MAX_DELAY, _RETRY_BASE_DELAY * (2 ** attempt))
-                time.sleep(random.uniform(0.0, max_delay))
-        raise last_exc  # unreachable, but keeps the type checker happy
+        if timing is not None:
+            timing.serialize_seconds = time.perf_counter() - timing.started
+            timing.payload_bytes = 0 if data is None else len(data)
+
+        def attempt() -> dict:
+            if timing is not None:
+                timing.attempts += 1
+            req = urllib.request.Request(
+                self._url(path, query=query),
+                data=data,
+                headers=self._headers(has_body=payload is not None),
+                method=method,
+            )
+            with self._permit(), self.pool.urlopen(
+                req, timeout=self.timeout, compression=self.compression
+            ) as response:
+                body = response.read()
+            if self.on_transfer is not None:
+                self.on_transfer(response.transfer)
+            if timing is not None:
+                timing.record_response(response)
+            if not body:
+                return {}
+            started = time.perf_counter()
+            result = json.loads(body.decode("utf-8"))
+            if timing is not None:
+                timing.parse_seconds = time.perf_counter() - started
+            return result
+
+        try:
+            result = with_retries(attempt, self.retry, self.retry_budget)
+        except Exception as exc:
+            _finish(timing, self.on_request_complete, exc)
+            raise
+        _finish(timing, self.on_request_complete, None)
+        return result
 
     def rollouts(
         self,
@@ -152,7 +201,7 @@ class Finetune:
         """
         request: SkillRequest = {"skill": skill}
         if image is not None:
-            request["image_url"] = _encode_image(image).image_url
+            request["image_url"] = _encode_image(image, self.encode_options).image_url
         if question is not None:
             request["question"] = question
         if object is not None:
@@ -288,7 +337,9 @@ class Finetune:
             request = group.get("request")
             if isinstance(request, dict) and "image" in request:
                 request = dict(request)
-                request["image_url"] = _encode_image(request.pop("image")).image_url
+                request["image_url"] = _encode_image(
+                    request.pop("image"), self.encode_options
+                ).image_url
                 group["request"] = request
             encoded_groups.append(group)
         payload = {
@@ -342,6 +393,17 @@ def ft(
     rank: Optional[int] = None,
     finetune_id: Optional[str] = None,
     endpoint: str = DEFAULT_TUNING_ENDPOINT,
+    pool: Optional[ConnectionPool] = None,
+    retry: Optional[RetryPolicy] = None,
+    retry_budget: Optional[RetryBudget] = None,
+    timeout: float = _REQUEST_TIMEOUT,
+    max_image_side: Optional[int] = None,
+    max_pixels: Optional[int] = None,
+    encode_options: Optional[EncodeOptions] = None,
+    compression: Optional[Compression] = None,
+    on_transfer: Optional[Callable[[TransferStats], None]] = None,
+    rate_limit: Optional[RateLimit] = None,
+    on_request_complete: Optional[OnRequestComplete] = None,
 ) -> Finetune:
     if finetune_id is not None:
         if name is not None or rank is not None:
@@ -352,6 +414,17 @@ def ft(
             finetune_id=finetune_id,
             name="",
             rank=0,
+            pool=pool,
+            retry=retry,
+            retry_budget=retry_budget,
+            timeout=timeout,
+            max_image_side=max_image_side,
+            max_pixels=max_pixels,
+            encode_options=encode_options,
+            compression=compression,
+            on_transfer=on_transfer,
+            rate_limit=rate_limit,
+            on_request_complete=on_request_complete,
         )
         result = client._request_json("GET", f"/finetunes/{finetune_id}")
         finetune: FinetuneInfo = result.get("finetune", result)
@@ -369,6 +442,17 @@ def ft(
         finetune_id="",
         name=name,
         rank=rank,
+        pool=pool,
+        retry=retry,
+        retry_budget=retry_budget,
+        timeout=timeout,
+        max_image_side=max_image_side,
+        max_pixels=max_pixels,
+        encode_options=encode_options,
+        compression=compression,
+        on_transfer=on_transfer,
+        rate_limit=rate_limit,
+        on_request_complete=on_request_complete,
     )
     result = client._request_json(
         "POST",
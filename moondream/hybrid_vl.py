@@ -0,0 +1,326 @@
+"""Route calls to a local engine first, overflowing to the cloud."""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Literal, Optional, Union
+
+from PIL import Image
+
+from .types import (
+    VLM,
+    CaptionOutput,
+    DetectOutput,
+    EncodedImage,
+    PointOutput,
+    QueryOutput,
+    SamplingSettings,
+    SegmentOutput,
+    SegmentStreamOutput,
+    SpatialRef,
+)
+
+Backend = Literal["local", "cloud"]
+Reason = Literal["local", "overflow", "failover"]
+
+# Weight of the newest call in each backend's latency average.
+_LATENCY_ALPHA = 0.2
+
+
+@dataclass
+class BackendStats:
+    """Counters for one side of a HybridVL.
+
+    ``latency`` is a moving average of call durations in seconds (streams
+    count until they finish), or None before the first call.
+    """
+
+    calls: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    latency: Optional[float] = None
+
+
+@dataclass
+class HybridStats:
+    """Snapshot of a HybridVL's routing counters.
+
+    ``overflow`` counts calls sent to the cloud because the local engine was
+    saturated, ``failover`` those retried on the cloud after a local error.
+    """
+
+    local: BackendStats = field(default_factory=BackendStats)
+    cloud: BackendStats = field(default_factory=BackendStats)
+    overflow: int = 0
+    failover: int = 0
+
+
+@dataclass
+class RouteRecord:
+    """One finished backend call, passed to ``on_route``."""
+
+    skill: str
+    backend: Backend
+    reason: Reason
+    seconds: float
+    error: Optional[BaseException] = None
+
+
+class _TrackedStream:
+    """Iterator that reports when a streamed call finishes or is closed.
+
+    The call's slot is released explicitly, once the stream is exhausted or
+    ``close()`` is called (or the ``with`` block exits). There is no finalizer:
+    releasing takes the router's lock, which a garbage collection pass could
+    find already held by the same thread.
+    """
+
+    def __init__(
+        self, chunks: Iterator, done: Callable[[Optional[BaseException]], None]
+    ):
+        self._chunks = chunks
+        self._done: Optional[Callable[[Optional[BaseException]], None]] = done
+
+    def __iter__(self) -> "_TrackedStream":
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            self._finish(None)
+            raise
+        except BaseException as exc:
+            self._finish(exc)
+            raise
+
+    def close(self) -> None:
+        try:
+            close = getattr(self._chunks, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._finish(None)
+
+    def __enter__(self) -> "_TrackedStream":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _finish(self, exc: Optional[BaseException]) -> None:
+        done, self._done = self._done, None
+        if done is not None:
+            done(exc)
+
+
+class HybridVL(VLM):
+    """Send calls to a local engine while it has capacity, else to the cloud.
+
+    Calls go to ``local`` while fewer than ``max_local_in_flight`` of this
+    router's calls are running there, and overflow to ``cloud`` once it is
+    saturated. With ``failover``, a call that fails locally is retried on the
+    cloud. Streams count as in flight until they are exhausted or closed, so
+    close streams you stop reading early; they fail over only if the local
+    call fails before returning its stream.
+    ValueError and TypeError are argument errors and are never retried.
+
+    Args:
+        local (VLM): Usually a PhotonVL.
+        cloud (VLM): Usually a CloudVL.
+        max_local_in_flight (Optional[int]): Local capacity. Defaults to the
+            local backend's default_max_concurrency (twice the Photon batch
+            size), which keeps its batch slots full without queueing deeper.
+        failover (bool): Retry failed local calls on the cloud.
+        on_route (Optional[Callable[[RouteRecord], None]]): Called after each
+            backend call with where it ran, why, and how long it took.
+    """
+
+    def __init__(
+        self,
+        local: VLM,
+        cloud: VLM,
+        *,
+        max_local_in_flight: Optional[int] = None,
+        failover: bool = True,
+        on_route: Optional[Callable[[RouteRecord], None]] = None,
+    ):
+        if max_local_in_flight is None:
+            max_local_in_flight = local.default_max_concurrency
+        if max_local_in_flight < 0:
+            raise ValueError("max_local_in_flight must not be negative")
+        self.local = local
+        self.cloud = cloud
+        self.max_local_in_flight = max_local_in_flight
+        self.failover = failover
+        self.on_route = on_route
+        self.default_max_concurrency = (
+            max_local_in_flight + cloud.default_max_concurrency
+        )
+        self._lock = threading.Lock()
+        self._stats = HybridStats()
+
+    def stats(self) -> HybridStats:
+        with self._lock:
+            return HybridStats(
+                local=BackendStats(**vars(self._stats.local)),
+                cloud=BackendStats(**vars(self._stats.cloud)),
+                overflow=self._stats.overflow,
+                failover=self._stats.failover,
+            )
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+
+    def _backend_stats(self, backend: Backend) -> BackendStats:
+        return self._stats.local if backend == "local" else self._stats.cloud
+
+    def _choose(self) -> Backend:
+        """Pick a backend for a new call and take an in-flight slot on it."""
+        with self._lock:
+            if self._stats.local.in_flight < self.max_local_in_flight:
+                self._stats.local.in_flight += 1
+                return "local"
+            self._stats.cloud.in_flight += 1
+            self._stats.overflow += 1
+            return "cloud"
+
+    def _fail_over(self) -> None:
+        with self._lock:
+            self._stats.cloud.in_flight += 1
+            self._stats.failover += 1
+
+    def _finish(
+        self,
+        skill: str,
+        backend: Backend,
+        reason: Reason,
+        started: float,
+        error: Optional[BaseException],
+    ) -> None:
+        seconds = time.perf_counter() - started
+        with self._lock:
+            stats = self._backend_stats(backend)
+            stats.in_flight -= 1
+            stats.calls += 1
+            if error is not None:
+                stats.errors += 1
+            if stats.latency is None:
+                stats.latency = seconds
+            else:
+                stats.latency += _LATENCY_ALPHA * (seconds - stats.latency)
+        if self.on_route is not None:
+            self.on_route(RouteRecord(skill, backend, reason, seconds, error))
+
+    def _run(self, skill: str, stream: bool, args: tuple, kwargs: dict):
+        if self._choose() == "cloud":
+            return self._call(skill, "cloud", "overflow", stream, args, kwargs)
+        try:
+            return self._call(skill, "local", "local", stream, args, kwargs)
+        except (ValueError, TypeError):
+            raise
+        except Exception:
+            if not self.failover:
+                raise
+        self._fail_over()
+        return self._call(skill, "cloud", "failover", stream, args, kwargs)
+
+    def _call(
+        self,
+        skill: str,
+        backend: Backend,
+        reason: Reason,
+        stream: bool,
+        args: tuple,
+        kwargs: dict,
+    ):
+        """Run ``skill`` on ``backend``, whose in-flight slot is already taken."""
+        model = self.local if backend == "local" else self.cloud
+        started = time.perf_counter()
+        done = lambda exc: self._finish(skill, backend, reason, started, exc)
+        try:
+            output = getattr(model, skill)(*args, **kwargs)
+        except BaseException as exc:
+            done(exc)
+            raise
+        if stream:
+            return _track_stream(output, done)
+        done(None)
+        return output
+
+    # ------------------------------------------------------------------
+    # Skills
+    # ------------------------------------------------------------------
+
+    def encode_image(self, image: Union[Image.Image, EncodedImage]) -> EncodedImage:
+        return self.local.encode_image(image)
+
+    def caption(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        length: Literal["normal", "short", "long"] = "normal",
+        stream: bool = False,
+        settings: Optional[SamplingSettings] = None,
+        **kwargs,
+    ) -> CaptionOutput:
+        kwargs.update(length=length, stream=stream, settings=settings)
+        return self._run("caption", stream, (image,), kwargs)
+
+    def query(
+        self,
+        image: Optional[Union[Image.Image, EncodedImage]] = None,
+        question: Optional[str] = None,
+        stream: bool = False,
+        settings: Optional[SamplingSettings] = None,
+        reasoning: bool = False,
+        **kwargs,
+    ) -> QueryOutput:
+        kwargs.update(
+            question=question, stream=stream, settings=settings, reasoning=reasoning
+        )
+        return self._run("query", stream, (image,), kwargs)
+
+    def detect(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        object: str,
+        settings: Optional[SamplingSettings] = None,
+        **kwargs,
+    ) -> DetectOutput:
+        kwargs.update(settings=settings)
+        return self._run("detect", False, (image, object), kwargs)
+
+    def point(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        object: str,
+        settings: Optional[SamplingSettings] = None,
+        **kwargs,
+    ) -> PointOutput:
+        kwargs.update(settings=settings)
+        return self._run("point", False, (image, object), kwargs)
+
+    def segment(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        object: str,
+        spatial_refs: Optional[List[SpatialRef]] = None,
+        stream: bool = False,
+        settings: Optional[SamplingSettings] = None,
+        **kwargs,
+    ) -> Union[SegmentOutput, SegmentStreamOutput]:
+        kwargs.update(spatial_refs=spatial_refs, stream=stream, settings=settings)
+        return self._run("segment", stream, (image, object), kwargs)
+
+
+def _track_stream(output, done: Callable[[Optional[BaseException]], None]):
+    """Wrap the iterator in a streamed output so ``done`` runs when it ends."""
+    if isinstance(output, dict):
+        for key, value in output.items():
+            if isinstance(value, Iterator):
+                return {**output, key: _TrackedStream(value, done)}
+    elif isinstance(output, Iterator):
+        return _TrackedStream(output, done)
+    done(None)
+    return output
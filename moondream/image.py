@@ -0,0 +1,447 @@
+"""Image encoding shared by the cloud, local and finetuning clients."""
+
+import base64
+import hashlib
+import math
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from io import BytesIO
+from typing import Literal, Optional, Tuple, Union
+
+from PIL import Image
+
+from .types import (
+    Base64EncodedImage,
+    BytesEncodedImage,
+    EncodedImage,
+    _sniff_mime_type,
+)
+
+_PASSTHROUGH_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+_EXIF_ORIENTATION = 0x0112
+_DEFAULT_QUALITY = 95
+# Lowest quality tried when searching for an encoding that fits target_bytes.
+_MIN_QUALITY = 10
+
+
+@dataclass(frozen=True)
+class EncodeOptions:
+    """Client-side preprocessing applied before an image is uploaded.
+
+    Args:
+        max_side (Optional[int]): Downscale so neither side exceeds this many
+            pixels. Aspect ratio is preserved, so normalized coordinates in
+            results still apply to the original image.
+        max_pixels (Optional[int]): Downscale so width * height does not
+            exceed this many pixels.
+        format (str): Codec used when an image has to be encoded: "JPEG",
+            "WEBP" or "PNG" (lossless; ``quality`` does not apply).
+        quality (int): JPEG/WebP quality from 1 to 100.
+        target_bytes (Optional[int]): Byte budget per image. JPEG/WebP use the
+            highest quality up to ``quality`` whose output fits, falling back
+            to the lowest quality tried if none does; combine with
+            ``max_side`` to guarantee the budget for very large images.
+
+    Files that are already compressed are sent as-is only under the default
+    JPEG q95 settings, and only if they fit ``target_bytes``.
+    """
+
+    max_side: Optional[int] = None
+    max_pixels: Optional[int] = None
+    format: Literal["JPEG", "WEBP", "PNG"] = "JPEG"
+    quality: int = _DEFAULT_QUALITY
+    target_bytes: Optional[int] = None
+
+    def __post_init__(self):
+        if self.format not in _PASSTHROUGH_FORMATS:
+            raise ValueError(
+                f"Unsupported format {self.format!r}; expected JPEG, WEBP or PNG"
+            )
+        if not 1 <= self.quality <= 100:
+            raise ValueError("quality must be between 1 and 100")
+        if self.target_bytes is not None and self.target_bytes < 1:
+            raise ValueError("target_bytes must be positive")
+
+    @property
+    def mime_type(self) -> str:
+        return _PASSTHROUGH_FORMATS[self.format]
+
+    def allows_passthrough(self, size: int) -> bool:
+        """Whether ``size`` bytes of already-compressed input may be sent as-is."""
+        if self.format != "JPEG" or self.quality != _DEFAULT_QUALITY:
+            return False
+        return self.target_bytes is None or size <= self.target_bytes
+
+    def target_size(self, size: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+        """Return the downscaled size for ``size``, or None if it already fits."""
+        width, height = size
+        scale = 1.0
+        if self.max_side is not None:
+            scale = min(scale, self.max_side / max(width, height))
+        if self.max_pixels is not None:
+            scale = min(scale, math.sqrt(self.max_pixels / (width * height)))
+        if scale >= 1.0:
+            return None
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+DEFAULT_ENCODE_OPTIONS = EncodeOptions()
+
+
+def _resolve_options(
+    options: Optional[EncodeOptions],
+    max_side: Optional[int] = None,
+    max_pixels: Optional[int] = None,
+) -> EncodeOptions:
+    """Merge a client's ``encode_options`` with its max_image_side/max_pixels."""
+    if options is None:
+        return EncodeOptions(max_side=max_side, max_pixels=max_pixels)
+    if max_side is not None:
+        options = replace(options, max_side=max_side)
+    if max_pixels is not None:
+        options = replace(options, max_pixels=max_pixels)
+    return options
+
+
+def _read_source(image: Image.Image) -> Optional[bytes]:
+    """Return the raw file behind a PIL image whose pixels were never loaded.
+
+    Unloaded pixels can't have been modified, so the file is still an exact
+    representation of the image.
+    """
+    fp = getattr(image, "fp", None)
+    if fp is None or getattr(image, "im", None) is not None:
+        return None
+    try:
+        position = fp.tell()
+        try:
+            fp.seek(0)
+            return fp.read()
+        finally:
+            fp.seek(position)
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _source_bytes(image: Image.Image) -> Optional[BytesEncodedImage]:
+    """Return the file an untouched PIL image was opened from, if usable as-is.
+
+    The image must not have been loaded, must be in a format and mode the API
+    decodes the same way as our own JPEG, and must have no EXIF rotation,
+    because the re-encode would have dropped it.
+    """
+    mime_type = _PASSTHROUGH_FORMATS.get(image.format or "")
+    if mime_type is None or image.mode != "RGB":
+        return None
+    # Read EXIF from the raw header; Image.getexif() may decode the pixels.
+    raw_exif = image.info.get("exif")
+    if raw_exif:
+        exif = Image.Exif()
+        exif.load(raw_exif)
+        if exif.get(_EXIF_ORIENTATION, 1) != 1:
+            return None
+    data = _read_source(image)
+    # Guard against files opened at an offset or wrapped in another container.
+    if data is None or _sniff_mime_type(data) != mime_type:
+        return None
+    return BytesEncodedImage(data=data, mime_type=mime_type)
+
+
+def _downscale(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """Resize to ``size`` cheaply, letting JPEG decode at reduced scale."""
+    if image.format == "JPEG":
+        data = _read_source(image)
+        if data is not None:
+            # Work on our own copy so draft() doesn't alter the caller's image.
+            image = Image.open(BytesIO(data))
+            image.draft("RGB", size)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    # reducing_gap box-reduces by an integer factor before the bilinear pass.
+    return image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+
+def _save(image: Image.Image, format: str, quality: int) -> bytes:
+    buffered = BytesIO()
+    if format == "PNG":
+        image.save(buffered, format="PNG")
+    else:
+        image.save(buffered, format=format, quality=quality)
+    return buffered.getvalue()
+
+
+def _fit_budget(image: Image.Image, options: EncodeOptions) -> Optional[bytes]:
+    """Binary-search the highest quality below ``options.quality`` that fits.
+
+    Returns the lowest-quality output tried if nothing fits, or None if there
+    was no lower quality to try.
+    """
+    assert options.target_bytes is not None
+    low, high = _MIN_QUALITY, options.quality - 1
+    best: Optional[bytes] = None
+    lowest: Optional[bytes] = None
+    while low <= high:
+        quality = (low + high) // 2
+        data = _save(image, options.format, quality)
+        if len(data) <= options.target_bytes:
+            best = data
+            low = quality + 1
+        else:
+            lowest = data
+            high = quality - 1
+    return best if best is not None else lowest
+
+
+def _encode(
+    image: Image.Image, options: EncodeOptions = DEFAULT_ENCODE_OPTIONS
+) -> Tuple[bytes, str]:
+    try:
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        data = _save(image, options.format, options.quality)
+        if (
+            options.target_bytes is not None
+            and options.format != "PNG"
+            and len(data) > options.target_bytes
+        ):
+            data = _fit_budget(image, options) or data
+        return data, options.mime_type
+    except Exception as e:
+        raise ValueError(f"Failed to convert image to {options.format}.") from e
+
+
+def image_bytes(
+    image: Union[Image.Image, EncodedImage],
+    options: EncodeOptions = DEFAULT_ENCODE_OPTIONS,
+    cache: Optional["EncodeCache"] = None,
+) -> Tuple[bytes, str]:
+    """Return compressed image bytes and their MIME type.
+
+    Already-compressed inputs (BytesEncodedImage, Base64EncodedImage, or a PIL
+    image freshly opened from a JPEG/PNG/WebP file) pass through without
+    decoding unless they exceed the limits in ``options`` or a non-default
+    codec is requested; anything else is encoded with ``options.format``.
+    Base64EncodedImage is assumed to have been produced by encode_image() and
+    is never re-encoded.
+    """
+    if cache is not None:
+        return cache.image_bytes(image, options)
+    if isinstance(image, BytesEncodedImage):
+        passthrough = options.allows_passthrough(len(image.data))
+        if passthrough and options.max_side is None and options.max_pixels is None:
+            return image.data, image.mime_type
+        try:
+            opened = Image.open(BytesIO(image.data))
+        except Exception as e:
+            raise ValueError("Failed to open image bytes.") from e
+        target = options.target_size(opened.size)
+        if target is None:
+            if passthrough:
+                return image.data, image.mime_type
+            return _encode(opened, options)
+        return _encode(_downscale(opened, target), options)
+    if isinstance(image, Base64EncodedImage):
+        data = image.image_url
+        mime_type = "image/jpeg"
+        if data.startswith("data:"):
+            header, data = data.split(",", 1)
+            mime_type = header[5:].split(";", 1)[0] or mime_type
+        return base64.b64decode(data), mime_type
+    if isinstance(image, EncodedImage):
+        raise ValueError(f"Unsupported EncodedImage type: {type(image)}")
+    if not isinstance(image, Image.Image):
+        raise ValueError(f"Unsupported image type: {type(image)}")
+
+    target = options.target_size(image.size)
+    if target is not None:
+        try:
+            image = _downscale(image, target)
+        except Exception as e:
+            raise ValueError("Failed to resize image.") from e
+    else:
+        source = _source_bytes(image)
+        if source is not None and options.allows_passthrough(len(source.data)):
+            return source.data, source.mime_type
+    return _encode(image, options)
+
+
+def _data_url(data: bytes, mime_type: str) -> str:
+    img_str = base64.b64encode(data).decode()
+    return f"data:{mime_type};base64,{img_str}"
+
+
+def to_base64(
+    image: Union[Image.Image, EncodedImage],
+    options: EncodeOptions = DEFAULT_ENCODE_OPTIONS,
+    cache: Optional["EncodeCache"] = None,
+) -> Base64EncodedImage:
+    """Return ``image`` as a data-URL Base64EncodedImage, as sent in JSON bodies."""
+    if isinstance(image, Base64EncodedImage):
+        return image
+    if cache is not None:
+        return Base64EncodedImage(image_url=cache.image_url(image, options))
+    return Base64EncodedImage(image_url=_data_url(*image_bytes(image, options)))
+
+
+@dataclass
+class EncodeCacheStats:
+    """Snapshot of an EncodeCache's counters."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+class _CacheEntry:
+    __slots__ = ("key", "data", "mime_type", "image_url", "ref")
+
+    def __init__(self, key: tuple, data: bytes, mime_type: str, ref=None):
+        self.key = key
+        self.data = data
+        self.mime_type = mime_type
+        self.image_url: Optional[str] = None
+        self.ref = ref
+
+    @property
+    def size(self) -> int:
+        return len(self.data) + len(self.image_url or "")
+
+
+class EncodeCache:
+    """Bounded LRU cache of encoded images, so repeated calls skip encoding.
+
+    Args:
+        max_bytes (int): Evict least recently used entries once the cached
+            bytes (encoded image plus any base64 data URL) exceed this.
+        key (str): "content" hashes the image data, so equal images share an
+            entry even across objects; unloaded images opened from a file hash
+            the file instead of decoding it. "identity" keys on the image
+            object itself plus its size and mode, which skips hashing but
+            returns a stale entry if the object's pixels are edited in place.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 1024 * 1024,
+        key: Literal["content", "identity"] = "content",
+    ):
+        if key not in ("content", "identity"):
+            raise ValueError('key must be "content" or "identity"')
+        self.max_bytes = max_bytes
+        self.key = key
+        self._entries: "OrderedDict[tuple, _CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = EncodeCacheStats()
+
+    def stats(self) -> EncodeCacheStats:
+        with self._lock:
+            return EncodeCacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                entries=len(self._entries),
+                bytes=self._bytes,
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def image_bytes(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        options: EncodeOptions = DEFAULT_ENCODE_OPTIONS,
+    ) -> Tuple[bytes, str]:
+        entry = self._entry(image, options)
+        if entry is None:
+            return image_bytes(image, options)
+        return entry.data, entry.mime_type
+
+    def image_url(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        options: EncodeOptions = DEFAULT_ENCODE_OPTIONS,
+    ) -> str:
+        entry = self._entry(image, options)
+        if entry is None:
+            return to_base64(image, options).image_url
+        if entry.image_url is None:
+            image_url = _data_url(entry.data, entry.mime_type)
+            with self._lock:
+                if entry.image_url is None:
+                    entry.image_url = image_url
+                    if self._entries.get(entry.key) is entry:
+                        self._bytes += len(image_url)
+                        self._evict()
+        return entry.image_url
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _cache_key(self, image, options: EncodeOptions) -> Optional[tuple]:
+        if not isinstance(image, (Image.Image, BytesEncodedImage)):
+            return None  # already base64; nothing to save
+        if self.key == "identity":
+            size = image.size if isinstance(image, Image.Image) else len(image.data)
+            mode = image.mode if isinstance(image, Image.Image) else image.mime_type
+            return ("identity", id(image), size, mode, options)
+        return (*_content_key(image), options)
+
+    def _entry(self, image, options: EncodeOptions) -> Optional[_CacheEntry]:
+        key = self._cache_key(image, options)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.ref is None or entry.ref() is image):
+                self._entries.move_to_end(key)
+                self._stats.hits += 1
+                return entry
+            self._stats.misses += 1
+
+        data, mime_type = image_bytes(image, options)
+        ref = weakref.ref(image) if self.key == "identity" else None
+        entry = _CacheEntry(key, data, mime_type, ref)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+        return entry
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self._stats.evictions += 1
+
+
+def _content_key(image: Union[Image.Image, EncodedImage]) -> tuple:
+    """Key identifying an image by its content, hashing as little as possible.
+
+    Unloaded PIL images opened from a file hash the file instead of decoding
+    it, so the same picture may key differently depending on how it arrived.
+    """
+    if isinstance(image, BytesEncodedImage):
+        return ("bytes", _digest(image.data))
+    if isinstance(image, Base64EncodedImage):
+        return ("base64", _digest(image.image_url.encode()))
+    if not isinstance(image, Image.Image):
+        raise ValueError(f"Unsupported image type: {type(image)}")
+    source = _read_source(image)
+    if source is not None:
+        return ("file", _digest(source))
+    return ("pixels", image.mode, image.size, _digest(image.tobytes()))
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
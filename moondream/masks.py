@@ -0,0 +1,524 @@
+"""Turn ``segment`` SVG paths into masks, and work with masks as COCO RLE.
+
+``parse_path`` reads a path string once into a NumPy vertex array, flattening
+curves and arcs into line segments. ``rasterize`` fills that geometry into a
+boolean mask of any size with a vectorized scanline fill. Masks convert to and
+from COCO run-length encoding (``encode_rle`` / ``decode_rle``), and
+``rle_area`` and ``rle_iou`` work on the runs directly without decoding.
+``PathParser`` parses a path as it streams in.
+
+Path coordinates are taken to be normalized to the image, like every other
+Moondream output. Pass ``region`` to rasterize a path whose coordinates are
+normalized to a box inside the image instead.
+"""
+
+import math
+import re
+from dataclasses import dataclass
+from typing import List, Literal, NamedTuple, Optional, Tuple, TypedDict, Union
+
+import numpy as np
+
+from .types import Region
+
+FillRule = Literal["nonzero", "evenodd"]
+
+# COCO's mask format: run lengths of a column-major mask, starting with a
+# run of zeros. "counts" is a list of ints, or COCO's compact string form.
+RLE = TypedDict("RLE", {"size": List[int], "counts": Union[str, List[int]]})
+
+_COMMAND = re.compile(r"([MmZzLlHhVvCcSsQqTtAa])")
+_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_FLAG = re.compile(r"[\s,]*([01])")
+_SEPARATORS = frozenset(" \t\r\n,+-")
+_ARGUMENTS = {"M": 2, "L": 2, "H": 1, "V": 1, "C": 6, "S": 4, "Q": 4, "T": 2, "A": 7}
+
+
+class PathPiece(NamedTuple):
+    """The vertices one path command added, in absolute path coordinates.
+
+    An "M" or "m" command starts a new subpath at ``points[0]``; its other
+    points, and every other command's, continue the current subpath.
+    """
+
+    command: str
+    points: np.ndarray
+
+
+@dataclass(frozen=True)
+class ParsedPath:
+    """A path flattened to polygons.
+
+    Attributes:
+        vertices: (N, 2) float64 array of every subpath's vertices.
+        starts: Index into ``vertices`` where each subpath begins.
+    """
+
+    vertices: np.ndarray
+    starts: np.ndarray
+
+    def polygons(self) -> List[np.ndarray]:
+        """One (K, 2) view into ``vertices`` per subpath."""
+        return np.split(self.vertices, self.starts[1:]) if len(self.starts) else []
+
+    def bounds(self) -> Optional[Tuple[float, float, float, float]]:
+        """``(x_min, y_min, x_max, y_max)`` of the vertices, or None if empty."""
+        if not len(self.vertices):
+            return None
+        x0, y0 = self.vertices.min(axis=0).tolist()
+        x1, y1 = self.vertices.max(axis=0).tolist()
+        return x0, y0, x1, y1
+
+
+def _bernstein(degree: int, segments: int) -> np.ndarray:
+    """(segments, degree + 1) weights sampling a Bezier curve at t = 1/n .. 1."""
+    t = np.arange(1, segments + 1, dtype=np.float64)[:, None] / segments
+    k = np.arange(degree + 1)
+    binomial = np.array([math.comb(degree, i) for i in k], dtype=np.float64)
+    return binomial * t**k * (1 - t) ** (degree - k)
+
+
+def _arc(
+    start: np.ndarray,
+    rx: float,
+    ry: float,
+    rotation: float,
+    large_arc: bool,
+    sweep: bool,
+    end: np.ndarray,
+    segments: int,
+) -> np.ndarray:
+    """Points along an SVG elliptical arc, excluding ``start``.
+
+    Follows the endpoint-to-center conversion in the SVG spec (F.6.5).
+    """
+    if rx == 0 or ry == 0 or np.allclose(start, end):
+        return end[None, :].copy()
+    rx, ry = abs(rx), abs(ry)
+    phi = math.radians(rotation)
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+    dx, dy = (start - end) / 2
+    x1 = cos_phi * dx + sin_phi * dy
+    y1 = -sin_phi * dx + cos_phi * dy
+    scale = x1 * x1 / (rx * rx) + y1 * y1 / (ry * ry)
+    if scale > 1:
+        rx, ry = rx * math.sqrt(scale), ry * math.sqrt(scale)
+    numerator = rx * rx * ry * ry - rx * rx * y1 * y1 - ry * ry * x1 * x1
+    denominator = rx * rx * y1 * y1 + ry * ry * x1 * x1
+    factor = math.sqrt(max(0.0, numerator / denominator))
+    if large_arc == sweep:
+        factor = -factor
+    cx1, cy1 = factor * rx * y1 / ry, -factor * ry * x1 / rx
+    center = np.array(
+        [cos_phi * cx1 - sin_phi * cy1, sin_phi * cx1 + cos_phi * cy1]
+    ) + (start + end) / 2
+    theta = math.atan2((y1 - cy1) / ry, (x1 - cx1) / rx)
+    delta = math.atan2((-y1 - cy1) / ry, (-x1 - cx1) / rx) - theta
+    if sweep and delta < 0:
+        delta += 2 * math.pi
+    elif not sweep and delta > 0:
+        delta -= 2 * math.pi
+    angles = theta + delta * np.arange(1, segments + 1) / segments
+    x = rx * np.cos(angles)
+    y = ry * np.sin(angles)
+    points = np.stack([cos_phi * x - sin_phi * y, sin_phi * x + cos_phi * y], axis=1)
+    points += center
+    points[-1] = end
+    return points
+
+
+def _arc_arguments(text: str) -> List[float]:
+    """Parse arc arguments, whose one-digit flags may be written without separators."""
+    values: List[float] = []
+    position = 0
+    while True:
+        slot = len(values) % 7
+        pattern = _FLAG if slot in (3, 4) else _NUMBER
+        if pattern is _NUMBER:
+            match = _NUMBER.search(text, position)
+        else:
+            match = _FLAG.match(text, position)
+        if match is None:
+            return values
+        values.append(float(match.group(match.lastindex or 0)))
+        position = match.end()
+
+
+class PathParser:
+    """Incremental SVG path parser.
+
+    ``feed`` accepts the path in arbitrary pieces, such as the chunks of a
+    streamed ``segment`` call, and returns the commands completed so far;
+    ``close`` flushes the rest. Work per call is proportional to the new
+    text, not to the path so far.
+
+    A number counts as complete once a separator follows it, since more
+    digits could still arrive. Complete argument groups are returned without
+    waiting for the next command letter, so a long implicit polyline
+    ("L x y x y ...") comes out piece by piece.
+    """
+
+    def __init__(self, curve_segments: int = 8):
+        if curve_segments < 1:
+            raise ValueError("curve_segments must be at least 1")
+        self.curve_segments = curve_segments
+        self._cubic = _bernstein(3, curve_segments)
+        self._quadratic = _bernstein(2, curve_segments)
+        self._pending = ""
+        self._current = np.zeros(2)
+        self._start = np.zeros(2)
+        self._control: Optional[np.ndarray] = None
+        self._previous = ""
+
+    def feed(self, text: str) -> List[PathPiece]:
+        """Add ``text`` to the path. Returns the newly completed commands."""
+        self._pending += text
+        parts = _COMMAND.split(self._pending)
+        if len(parts) < 3:
+            return []
+        pieces = self._run(parts[:-2])
+        command, arguments = parts[-2], parts[-1]
+        self._pending = command + arguments
+        upper = command.upper()
+        if upper in ("Z", "A"):
+            # Z takes no arguments and arc flags need not be separated, so
+            # these wait for the next command.
+            return pieces
+
+        count = _ARGUMENTS[upper]
+        complete = 0
+        end = 0
+        for match in _NUMBER.finditer(arguments):
+            following = arguments[match.end() : match.end() + 1]
+            if not following or following not in _SEPARATORS:
+                break
+            complete += 1
+            if complete % count == 0:
+                end = match.end()
+        if end:
+            pieces.extend(self._run(["", command, arguments[:end]]))
+            # Extra pairs after a moveto are implicit linetos.
+            implied = {"M": "L", "m": "l"}.get(command, command)
+            self._pending = implied + arguments[end:]
+        return pieces
+
+    def close(self) -> List[PathPiece]:
+        """End the path. Returns the commands still pending."""
+        parts = _COMMAND.split(self._pending)
+        self._pending = ""
+        return self._run(parts)
+
+    def _run(self, parts: List[str]) -> List[PathPiece]:
+        pieces: List[PathPiece] = []
+        # parts alternates text before a command, command letter, its arguments...
+        for command, arguments in zip(parts[1::2], parts[2::2]):
+            points = self._command(command, arguments)
+            if points is not None and len(points):
+                pieces.append(PathPiece(command, points))
+        return pieces
+
+    def _command(self, command: str, arguments: str) -> Optional[np.ndarray]:
+        upper = command.upper()
+        relative = command != upper
+        if upper == "Z":
+            self._current = self._start.copy()
+            self._control = None
+            self._previous = upper
+            return self._start[None, :].copy()
+
+        if upper == "A":
+            values = np.array(_arc_arguments(arguments), dtype=np.float64)
+        else:
+            values = np.array(_NUMBER.findall(arguments), dtype=np.float64)
+        count = _ARGUMENTS[upper]
+        values = values[: len(values) - len(values) % count].reshape(-1, count)
+        if not len(values):
+            return None
+
+        if upper in ("M", "L"):
+            points = np.cumsum(values, axis=0) + self._current if relative else values
+            if upper == "M":
+                self._start = points[0].copy()
+            self._control = None
+        elif upper in ("H", "V"):
+            axis = 0 if upper == "H" else 1
+            coordinate = values[:, 0]
+            if relative:
+                coordinate = np.cumsum(coordinate) + self._current[axis]
+            points = np.repeat(self._current[None, :], len(coordinate), axis=0)
+            points[:, axis] = coordinate
+            self._control = None
+        elif upper in ("C", "Q"):
+            degree = 3 if upper == "C" else 2
+            controls = values.reshape(len(values), degree, 2)
+            if relative:
+                ends = np.cumsum(controls[:, -1], axis=0) + self._current
+                bases = np.vstack([self._current, ends[:-1]])
+                controls = controls + bases[:, None, :]
+            else:
+                bases = np.vstack([self._current, controls[:-1, -1]])
+            curves = np.concatenate([bases[:, None, :], controls], axis=1)
+            weights = self._cubic if degree == 3 else self._quadratic
+            points = np.einsum("sk,ckd->csd", weights, curves).reshape(-1, 2)
+            points[self.curve_segments - 1 :: self.curve_segments] = controls[:, -1]
+            self._control = controls[-1, -2].copy()
+        else:
+            points = self._sequential(upper, relative, values)
+
+        self._current = points[-1].copy()
+        self._previous = upper
+        return points
+
+    def _sequential(self, upper: str, relative: bool, values: np.ndarray) -> np.ndarray:
+        """S, T and A, where each segment depends on the one before it."""
+        pieces = []
+        for row in values:
+            current = self._current
+            offset = current if relative else np.zeros(2)
+            if upper == "A":
+                end = row[5:7] + offset
+                points = _arc(
+                    current, row[0], row[1], row[2], bool(row[3]), bool(row[4]), end,
+                    self.curve_segments,
+                )
+                self._control = None
+            else:
+                smooth = ("C", "S") if upper == "S" else ("Q", "T")
+                if self._control is not None and self._previous in smooth:
+                    first = 2 * current - self._control
+                else:
+                    first = current
+                if upper == "S":
+                    second, end = row[0:2] + offset, row[2:4] + offset
+                    curve = np.stack([current, first, second, end])
+                    points = self._cubic @ curve
+                    self._control = second
+                else:
+                    end = row[0:2] + offset
+                    curve = np.stack([current, first, end])
+                    points = self._quadratic @ curve
+                    self._control = first
+                points[-1] = end
+            pieces.append(points)
+            self._current = points[-1].copy()
+            self._previous = upper
+        return np.concatenate(pieces)
+
+
+def _assemble(pieces: List[PathPiece]) -> ParsedPath:
+    chunks: List[np.ndarray] = []
+    starts: List[int] = []
+    size = 0
+    for command, points in pieces:
+        if command in ("M", "m") or not starts:
+            starts.append(size)
+        chunks.append(points)
+        size += len(points)
+    vertices = np.concatenate(chunks) if chunks else np.empty((0, 2))
+    return ParsedPath(vertices, np.asarray(starts, dtype=np.intp))
+
+
+def parse_path(path: str, curve_segments: int = 8) -> ParsedPath:
+    """Parse an SVG path into polygons.
+
+    Supports every path command, absolute and relative. Curves and arcs are
+    flattened into ``curve_segments`` line segments each.
+    """
+    parser = PathParser(curve_segments)
+    pieces = parser.feed(path)
+    pieces.extend(parser.close())
+    return _assemble(pieces)
+
+
+def _to_pixels(
+    vertices: np.ndarray, width: int, height: int, region: Optional[Region]
+) -> np.ndarray:
+    if region is None:
+        return vertices * np.array([width, height], dtype=np.float64)
+    origin = np.array([region["x_min"] * width, region["y_min"] * height])
+    scale = np.array(
+        [
+            (region["x_max"] - region["x_min"]) * width,
+            (region["y_max"] - region["y_min"]) * height,
+        ]
+    )
+    return vertices * scale + origin
+
+
+def rasterize(
+    path: Union[str, ParsedPath],
+    width: int,
+    height: int,
+    *,
+    region: Optional[Region] = None,
+    fill_rule: FillRule = "nonzero",
+) -> np.ndarray:
+    """Fill ``path`` into a (height, width) boolean mask.
+
+    A pixel is set when its center is inside the path. Every subpath is
+    closed for filling, as SVG does. ``region`` gives the box the path's
+    normalized coordinates refer to, if not the whole image.
+
+    Edges are intersected with every scanline they cross in one vectorized
+    step. Each crossing then adds its winding direction at its column, and a
+    cumulative sum along each row gives the winding number of every pixel,
+    so no per-row sorting is needed.
+    """
+    if isinstance(path, str):
+        path = parse_path(path)
+    mask_shape = (height, width)
+    if len(path.vertices) < 2 or width < 1 or height < 1:
+        return np.zeros(mask_shape, dtype=bool)
+
+    points = _to_pixels(path.vertices, width, height, region)
+    count = len(points)
+    following = np.arange(1, count + 1)
+    last = np.append(path.starts[1:], count) - 1
+    following[last] = path.starts
+    x0, y0 = points[:, 0], points[:, 1]
+    x1, y1 = points[following, 0], points[following, 1]
+
+    sloped = y0 != y1
+    x0, y0, x1, y1 = x0[sloped], y0[sloped], x1[sloped], y1[sloped]
+    # Scanline r passes through pixel centers at y = r + 0.5, and an edge
+    # covers it when min(y0, y1) <= r + 0.5 < max(y0, y1).
+    first_row = np.clip(np.ceil(np.minimum(y0, y1) - 0.5), 0, height).astype(np.intp)
+    end_row = np.clip(np.ceil(np.maximum(y0, y1) - 0.5), 0, height).astype(np.intp)
+    rows_per_edge = end_row - first_row
+    total = int(rows_per_edge.sum())
+    if total == 0:
+        return np.zeros(mask_shape, dtype=bool)
+
+    edge = np.repeat(np.arange(len(rows_per_edge)), rows_per_edge)
+    offsets = np.arange(total) - np.repeat(
+        np.cumsum(rows_per_edge) - rows_per_edge, rows_per_edge
+    )
+    rows = first_row[edge] + offsets
+    scan_y = rows + 0.5
+    ex0, ey0, ex1, ey1 = x0[edge], y0[edge], x1[edge], y1[edge]
+    crossing_x = ex0 + (scan_y - ey0) * (ex1 - ex0) / (ey1 - ey0)
+    # Pixel c is right of the crossing when its center c + 0.5 >= x.
+    columns = np.clip(np.ceil(crossing_x - 0.5), 0, width).astype(np.intp)
+    if fill_rule == "nonzero":
+        weights = np.where(ey1 > ey0, 1.0, -1.0)
+    elif fill_rule == "evenodd":
+        weights = None
+    else:
+        raise ValueError("fill_rule must be 'nonzero' or 'evenodd'")
+
+    stride = width + 1
+    crossings = np.bincount(
+        rows * stride + columns, weights=weights, minlength=height * stride
+    ).reshape(height, stride)[:, :width]
+    winding = np.cumsum(crossings, axis=1)
+    if weights is None:
+        return (winding.astype(np.int64) & 1).astype(bool)
+    return np.rint(winding) != 0
+
+
+def encode_rle(mask: np.ndarray, compress: bool = True) -> RLE:
+    """COCO run-length encoding of a 2-D mask.
+
+    With ``compress`` the counts use COCO's compact string form, as
+    pycocotools' ``mask.encode`` produces; otherwise they are a list of ints.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if mask.ndim != 2:
+        raise ValueError("mask must be 2-D")
+    height, width = mask.shape
+    flat = mask.ravel(order="F")
+    if flat.size == 0:
+        counts: List[int] = [0]
+    else:
+        changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+        bounds = np.concatenate([[0], changes, [flat.size]])
+        counts = np.diff(bounds).tolist()
+        if flat[0]:
+            counts.insert(0, 0)
+    return {
+        "size": [height, width],
+        "counts": _counts_to_string(counts) if compress else counts,
+    }
+
+
+def _counts(rle: RLE) -> np.ndarray:
+    counts = rle["counts"]
+    if isinstance(counts, (str, bytes)):
+        counts = _string_to_counts(counts)
+    return np.asarray(counts, dtype=np.int64)
+
+
+def decode_rle(rle: RLE) -> np.ndarray:
+    """The (height, width) boolean mask for an RLE."""
+    height, width = rle["size"]
+    counts = _counts(rle)
+    values = (np.arange(len(counts)) % 2).astype(bool)
+    flat = np.repeat(values, counts)
+    if flat.size != height * width:
+        raise ValueError("RLE counts do not match its size")
+    return flat.reshape((height, width), order="F")
+
+
+def rle_area(rle: RLE) -> int:
+    """Number of set pixels."""
+    return int(_counts(rle)[1::2].sum())
+
+
+def rle_iou(a: RLE, b: RLE) -> float:
+    """Intersection over union of two masks of the same size, from their runs.
+
+    Runs of both masks are split at every run boundary of either, and the
+    pieces where both are set are summed. 0.0 if both masks are empty.
+    """
+    if list(a["size"]) != list(b["size"]):
+        raise ValueError("masks must be the same size")
+    counts_a, counts_b = _counts(a), _counts(b)
+    ends_a, ends_b = np.cumsum(counts_a), np.cumsum(counts_b)
+    edges = np.union1d(ends_a, ends_b)
+    starts = np.concatenate([[0], edges[:-1]])
+    lengths = edges - starts
+    # A run index is odd for set pixels.
+    inside_a = np.searchsorted(ends_a, starts, side="right") % 2 == 1
+    inside_b = np.searchsorted(ends_b, starts, side="right") % 2 == 1
+    intersection = int(lengths[inside_a & inside_b].sum())
+    union = int(counts_a[1::2].sum() + counts_b[1::2].sum()) - intersection
+    return intersection / union if union else 0.0
+
+
+def _counts_to_string(counts: List[int]) -> str:
+    """COCO's compact counts: deltas in 5-bit groups (maskApi.c rleToString)."""
+    out = []
+    for i, value in enumerate(counts):
+        x = value - counts[i - 2] if i > 2 else value
+        more = True
+        while more:
+            c = x & 0x1F
+            x >>= 5
+            more = x != -1 if c & 0x10 else x != 0
+            if more:
+                c |= 0x20
+            out.append(chr(c + 48))
+    return "".join(out)
+
+
+def _string_to_counts(text: Union[str, bytes]) -> List[int]:
+    if isinstance(text, bytes):
+        text = text.decode("ascii")
+    counts: List[int] = []
+    position = 0
+    while position < len(text):
+        x = 0
+        shift = 0
+        more = True
+        while more:
+            c = ord(text[position]) - 48
+            x |= (c & 0x1F) << shift
+            more = bool(c & 0x20)
+            position += 1
+            shift += 5
+            if not more and c & 0x10:
+                x |= -1 << shift
+        if len(counts) > 2:
+            x += counts[-2]
+        counts.append(x)
+    return counts
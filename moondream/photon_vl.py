@@ -1,15 +1,27 @@
 """Local GPU inference backend using kestrel (Photon)."""
 
 import asyncio
-import base64
+import concurrent.futures
+import contextlib
 import queue
 import threading
-from io import BytesIO
-from typing import Generator, List, Literal, Optional, Union
+import time
+from typing import Callable, Generator, Iterator, List, Literal, Optional, Tuple, Union
 
 import torch
 from PIL import Image
 
+from .image import (
+    DEFAULT_ENCODE_OPTIONS,
+    EncodeCache,
+    EncodeOptions,
+    _resolve_options,
+    to_base64,
+)
+from .arrays import DetectResult, PointResult
+from .image import image_bytes as _encoded_image_bytes
+from .streaming import Stop, StopWhen, _stops_early, stop_early
+from .timing import OnRequestComplete, RequestTiming, _finish, _timed_chunks
 from .types import (
     VLM,
     Base64EncodedImage,
@@ -24,6 +36,11 @@ from .types import (
 )
 
 
+# Chunks a streamed request may produce ahead of the reader before the
+# engine-side consumer waits for it.
+_STREAM_BUFFER = 64
+
+
 def _default_photon_device() -> str:
     """Choose the local Photon device when the caller does not specify one."""
     if torch.cuda.is_available():
@@ -36,24 +53,13 @@ def _default_photon_device() -> str:
     )
 
 
-def _image_to_bytes(image: Union[Image.Image, EncodedImage]) -> bytes:
-    """Convert a PIL Image or Base64EncodedImage to raw JPEG bytes."""
-    if isinstance(image, Base64EncodedImage):
-        # Strip data URI prefix if present
-        data = image.image_url
-        if data.startswith("data:"):
-            data = data.split(",", 1)[1]
-        return base64.b64decode(data)
-
-    if isinstance(image, EncodedImage):
-        raise ValueError(f"Unsupported EncodedImage type: {type(image)}")
-
-    # PIL Image
-    if image.mode != "RGB":
-        image = image.convert("RGB")
-    buf = BytesIO()
-    image.save(buf, format="JPEG", quality=95)
-    return buf.getvalue()
+def _image_to_bytes(
+    image: Union[Image.Image, EncodedImage],
+    options: EncodeOptions = DEFAULT_ENCODE_OPTIONS,
+    cache: Optional[EncodeCache] = None,
+) -> bytes:
+    """Convert a PIL Image or EncodedImage to compressed image bytes."""
+    return _encoded_image_bytes(image, options, cache)[0]
 
 
 def _parse_model(model: str) -> tuple[str, Optional[str]]:
@@ -140,7 +146,12 @@ def _get_or_create_engine(
 
 
 class PhotonVL(VLM):
-    """Local GPU inference via kestrel's InferenceEngine."""
+    """Local GPU inference via kestrel's InferenceEngine.
+
+    With ``on_request_complete``, each call reports a RequestTiming that
+    separates image encoding, the hop onto the engine's event loop
+    (``schedule_seconds``) and the engine's own time (``engine_seconds``).
+    """
 
     def __init__(
         self,
@@ -150,8 +161,21 @@ class PhotonVL(VLM):
         max_batch_size: int = 4,
         kv_cache_pages: Optional[int] = None,
         device: Optional[str] = None,
+        max_image_side: Optional[int] = None,
+        max_pixels: Optional[int] = None,
+        encode_options: Optional[EncodeOptions] = None,
+        image_cache: Optional[EncodeCache] = None,
+        on_request_complete: Optional[OnRequestComplete] = None,
     ):
+        self.model = model
         base_model, self._adapter = _parse_model(model)
+        self.encode_options = _resolve_options(
+            encode_options, max_image_side, max_pixels
+        )
+        self.image_cache = image_cache
+        self.on_request_complete = on_request_complete
+        # Keep the engine's batch slots full with queued work during map().
+        self.default_max_concurrency = 2 * max_batch_size
         device = _default_photon_device() if device is None else device
         self._engine, self._loop, self._thread = _get_or_create_engine(
             base_model, max_batch_size, kv_cache_pages, device, api_key=api_key
@@ -161,32 +185,106 @@ class PhotonVL(VLM):
     # Helpers
     # ------------------------------------------------------------------
 
-    def _run(self, coro):
+    def _timing(self, call: str) -> Optional[RequestTiming]:
+        if self.on_request_complete is None:
+            return None
+        return RequestTiming(call=call)
+
+    def _run(self, coro, timing: Optional[RequestTiming] = None):
         """Run an async coroutine on the background loop and return result."""
-        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+        if timing is None:
+            return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
 
-    def _stream_to_generator(self, coro) -> Generator[str, None, None]:
-        """Bridge an async EngineStream into a sync generator of text chunks."""
+        submitted = time.perf_counter()
+
+        async def timed():
+            started = time.perf_counter()
+            timing.schedule_seconds = started - submitted
+            try:
+                return await coro
+            finally:
+                timing.engine_seconds = time.perf_counter() - started
+
+        try:
+            result = asyncio.run_coroutine_threadsafe(timed(), self._loop).result()
+        except Exception as exc:
+            _finish(timing, self.on_request_complete, exc)
+            raise
+        _finish(timing, self.on_request_complete, None)
+        return result
+
+    def _stream_to_generator(
+        self, coro, timing: Optional[RequestTiming] = None
+    ) -> Iterator[str]:
+        """Bridge an async EngineStream into a sync generator of text chunks.
+
+        At most _STREAM_BUFFER chunks are buffered for the reader. Closing the
+        generator cancels the engine request, freeing its decode slot.
+        """
+        chunks = self._bridge_stream(coro, timing)
+        if timing is None:
+            return chunks
+        return _timed_chunks(chunks, timing, self.on_request_complete)
+
+    def _bridge_stream(
+        self, coro, timing: Optional[RequestTiming]
+    ) -> Generator[str, None, None]:
         q: queue.Queue = queue.Queue()
+        credits: Optional[asyncio.Semaphore] = None
+        submitted = time.perf_counter()
 
         async def _consume():
+            nonlocal credits
+            credits = asyncio.Semaphore(_STREAM_BUFFER)
+            started = time.perf_counter()
+            if timing is not None:
+                timing.schedule_seconds = started - submitted
+            stream = None
             try:
                 stream = await coro
                 async for update in stream:
+                    await credits.acquire()
                     q.put(update.text)
+                if timing is not None:
+                    timing.engine_seconds = time.perf_counter() - started
                 q.put(None)  # sentinel
             except Exception as exc:
+                if timing is not None:
+                    timing.engine_seconds = time.perf_counter() - started
                 q.put(exc)
-
-        asyncio.run_coroutine_threadsafe(_consume(), self._loop)
-
-        while True:
-            item = q.get()
-            if item is None:
-                return
-            if isinstance(item, Exception):
-                raise item
-            yield item
+            finally:
+                aclose = getattr(stream, "aclose", None)
+                if aclose is not None:
+                    with contextlib.suppress(Exception):
+                        await aclose()
+
+        future = asyncio.run_coroutine_threadsafe(_consume(), self._loop)
+        try:
+            while True:
+                item = q.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                self._loop.call_soon_threadsafe(credits.release)
+                yield item
+        finally:
+            # Cancels _consume if it is still running, which aborts the
+            # engine stream it is iterating.
+            future.cancel()
+
+    def _image_bytes(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        timing: Optional[RequestTiming] = None,
+    ) -> bytes:
+        if timing is None:
+            return _image_to_bytes(image, self.encode_options, self.image_cache)
+        started = time.perf_counter()
+        data = _image_to_bytes(image, self.encode_options, self.image_cache)
+        timing.encode_seconds = time.perf_counter() - started
+        timing.payload_bytes = len(data)
+        return data
 
     def _settings(
         self, settings: Optional[SamplingSettings] = None
@@ -194,6 +292,138 @@ class PhotonVL(VLM):
         """Build engine settings with this instance's adapter."""
         return _build_settings(settings, self._adapter)
 
+    def batch_submitter(
+        self, max_concurrency: int
+    ) -> Tuple[Callable[[str, dict], concurrent.futures.Future], Callable[[], None]]:
+        """Schedule batch calls straight onto the engine loop, without threads.
+
+        Each call encodes its image on the loop's default executor, so images
+        are encoded in parallel and JPEG work never blocks the event loop that
+        feeds the engine. Calls report a RequestTiming like single calls do;
+        for these the hook runs on the engine's loop thread.
+        """
+
+        def submit(skill: str, kwargs: dict) -> concurrent.futures.Future:
+            kwargs.pop("stream", None)
+            coro = self._batch_call(skill, kwargs, self._timing(skill), time.perf_counter())
+            return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+        return submit, lambda: None
+
+    async def _batch_call(
+        self,
+        skill: str,
+        kwargs: dict,
+        timing: Optional[RequestTiming],
+        submitted: float,
+    ):
+        image = kwargs.pop("image", None)
+        if timing is not None:
+            timing.schedule_seconds = time.perf_counter() - submitted
+        try:
+            image_bytes = (
+                await asyncio.to_thread(self._image_bytes, image, timing)
+                if image is not None
+                else None
+            )
+            started = time.perf_counter()
+            try:
+                result = await getattr(self, f"_{skill}")(image_bytes, **kwargs)
+            finally:
+                if timing is not None:
+                    timing.engine_seconds = time.perf_counter() - started
+        except Exception as exc:
+            _finish(timing, self.on_request_complete, exc)
+            raise
+        _finish(timing, self.on_request_complete, None)
+        return result
+
+    # ------------------------------------------------------------------
+    # Engine calls
+    # ------------------------------------------------------------------
+
+    async def _caption(
+        self,
+        image_bytes: bytes,
+        length: str = "normal",
+        settings: Optional[SamplingSettings] = None,
+    ) -> CaptionOutput:
+        result = await self._engine.caption(
+            image_bytes,
+            length=length,
+            stream=False,
+            settings=self._settings(settings),
+        )
+        return {"caption": result.output["caption"]}
+
+    async def _query(
+        self,
+        image_bytes: Optional[bytes],
+        question: Optional[str] = None,
+        settings: Optional[SamplingSettings] = None,
+        reasoning: bool = False,
+    ) -> QueryOutput:
+        if question is None:
+            raise ValueError("question parameter is required")
+        result = await self._engine.query(
+            image=image_bytes,
+            question=question,
+            reasoning=reasoning,
+            stream=False,
+            settings=self._settings(settings),
+        )
+        output: QueryOutput = {"answer": result.output["answer"]}
+        if "reasoning" in result.output and result.output["reasoning"] is not None:
+            output["reasoning"] = result.output["reasoning"]
+        return output
+
+    async def _detect(
+        self,
+        image_bytes: bytes,
+        object: str,
+        settings: Optional[SamplingSettings] = None,
+        as_arrays: bool = False,
+    ) -> Union[DetectOutput, DetectResult]:
+        result = await self._engine.detect(
+            image_bytes, object, settings=self._settings(settings)
+        )
+        if as_arrays:
+            return DetectResult.from_output(result.output)
+        return {"objects": result.output["objects"]}
+
+    async def _point(
+        self,
+        image_bytes: bytes,
+        object: str,
+        settings: Optional[SamplingSettings] = None,
+        as_arrays: bool = False,
+    ) -> Union[PointOutput, PointResult]:
+        result = await self._engine.point(
+            image_bytes, object, settings=self._settings(settings)
+        )
+        if as_arrays:
+            return PointResult.from_output(result.output)
+        return {"points": result.output["points"]}
+
+    async def _segment(
+        self,
+        image_bytes: bytes,
+        object: str,
+        spatial_refs: Optional[List[SpatialRef]] = None,
+        settings: Optional[SamplingSettings] = None,
+    ) -> SegmentOutput:
+        result = await self._engine.segment(
+            image_bytes,
+            object,
+            spatial_refs=spatial_refs,
+            settings=self._settings(settings),
+        )
+        seg = result.output["segments"][0]
+        output: SegmentOutput = {"path": seg["path"]}
+        if seg.get("bbox"):
+            output["bbox"] = seg["bbox"]
+        return output
+
     # ------------------------------------------------------------------
     # VLM interface
     # ------------------------------------------------------------------
@@ -206,15 +436,7 @@ class PhotonVL(VLM):
         For the local backend the kestrel prefix cache handles reuse
         automatically, so this just converts to the common format.
         """
-        if isinstance(image, EncodedImage):
-            assert type(image) == Base64EncodedImage
-            return image
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-        buf = BytesIO()
-        image.save(buf, format="JPEG", quality=95)
-        img_str = base64.b64encode(buf.getvalue()).decode()
-        return Base64EncodedImage(image_url=f"data:image/jpeg;base64,{img_str}")
+        return to_base64(image, self.encode_options, self.image_cache)
 
     def caption(
         self,
@@ -222,30 +444,29 @@ class PhotonVL(VLM):
         length: Literal["normal", "short", "long"] = "normal",
         stream: bool = False,
         settings: Optional[SamplingSettings] = None,
+        stop: Optional[Stop] = None,
+        stop_when: Optional[StopWhen] = None,
     ) -> CaptionOutput:
-        image_bytes = _image_to_bytes(image)
-        engine_settings = self._settings(settings)
+        stops_early = _stops_early(stream, False, stop, stop_when)
+        timing = self._timing("caption")
+        image_bytes = self._image_bytes(image, timing)
 
-        if stream:
+        if stream or stops_early:
             gen = self._stream_to_generator(
                 self._engine.caption(
                     image_bytes,
                     length=length,
                     stream=True,
-                    settings=engine_settings,
-                )
+                    settings=self._settings(settings),
+                ),
+                timing,
             )
-            return {"caption": gen}
+            gen = stop_early(gen, stop, stop_when)
+            return {"caption": gen if stream else "".join(gen)}
 
-        result = self._run(
-            self._engine.caption(
-                image_bytes,
-                length=length,
-                stream=False,
-                settings=engine_settings,
-            )
+        return self._run(
+            self._caption(image_bytes, length=length, settings=settings), timing
         )
-        return {"caption": result.output["caption"]}
 
     def query(
         self,
@@ -254,62 +475,69 @@ class PhotonVL(VLM):
         stream: bool = False,
         settings: Optional[SamplingSettings] = None,
         reasoning: bool = False,
+        stop: Optional[Stop] = None,
+        stop_when: Optional[StopWhen] = None,
     ) -> QueryOutput:
         if question is None:
             raise ValueError("question parameter is required")
+        stops_early = _stops_early(stream, reasoning, stop, stop_when)
 
-        image_bytes = _image_to_bytes(image) if image is not None else None
-        engine_settings = self._settings(settings)
+        timing = self._timing("query")
+        image_bytes = (
+            self._image_bytes(image, timing) if image is not None else None
+        )
 
-        if stream:
+        if stream or stops_early:
             gen = self._stream_to_generator(
                 self._engine.query(
                     image=image_bytes,
                     question=question,
                     reasoning=reasoning,
                     stream=True,
-                    settings=engine_settings,
-                )
+                    settings=self._settings(settings),
+                ),
+                timing,
             )
-            return {"answer": gen}
+            gen = stop_early(gen, stop, stop_when)
+            return {"answer": gen if stream else "".join(gen)}
 
-        result = self._run(
-            self._engine.query(
-                image=image_bytes,
+        return self._run(
+            self._query(
+                image_bytes,
                 question=question,
+                settings=settings,
                 reasoning=reasoning,
-                stream=False,
-                settings=engine_settings,
-            )
+            ),
+            timing,
         )
-        output: QueryOutput = {"answer": result.output["answer"]}
-        if "reasoning" in result.output and result.output["reasoning"] is not None:
-            output["reasoning"] = result.output["reasoning"]
-        return output
 
     def detect(
         self,
         image: Union[Image.Image, EncodedImage],
         object: str,
         settings: Optional[SamplingSettings] = None,
-    ) -> DetectOutput:
-        image_bytes = _image_to_bytes(image)
-        result = self._run(
-            self._engine.detect(image_bytes, object, settings=self._settings(settings))
+        as_arrays: bool = False,
+    ) -> Union[DetectOutput, DetectResult]:
+        timing = self._timing("detect")
+        image_bytes = self._image_bytes(image, timing)
+        return self._run(
+            self._detect(image_bytes, object, settings=settings, as_arrays=as_arrays),
+            timing,
         )
-        return {"objects": result.output["objects"]}
 
     def point(
         self,
         image: Union[Image.Image, EncodedImage],
         object: str,
         settings: Optional[SamplingSettings] = None,
-    ) -> PointOutput:
-        image_bytes = _image_to_bytes(image)
-        result = self._run(
-            self._engine.point(image_bytes, object, settings=self._settings(settings))
+        as_arrays: bool = False,
+    ) -> Union[PointOutput, PointResult]:
+        timing = self._timing("point")
+        image_bytes = self._image_bytes(image, timing)
+        return self._run(
+            self._point(image_bytes, object, settings=settings, as_arrays=as_arrays),
+            timing,
         )
-        return {"points": result.output["points"]}
 
     def segment(
         self,
@@ -319,17 +547,11 @@ class PhotonVL(VLM):
         stream: bool = False,
         settings: Optional[SamplingSettings] = None,
     ) -> SegmentOutput:
-        image_bytes = _image_to_bytes(image)
-        result = self._run(
-            self._engine.segment(
-                image_bytes,
-                object,
-                spatial_refs=spatial_refs,
-                settings=self._settings(settings),
-            )
+        timing = self._timing("segment")
+        image_bytes = self._image_bytes(image, timing)
+        return self._run(
+            self._segment(
+                image_bytes, object, spatial_refs=spatial_refs, settings=settings
+            ),
+            timing,
         )
-        seg = result.output["segments"][0]
-        output: SegmentOutput = {"path": seg["path"]}
-        if seg.get("bbox"):
-            output["bbox"] = seg["bbox"]
-        return output
@@ -0,0 +1,186 @@
+"""Client-side rate limiting shared by every client that uses an API key.
+
+A ``RateLimiter`` combines a token bucket (requests per second) with a cap on
+requests in flight. The rate adapts: each 429 response halves it, and it
+climbs back linearly while requests keep succeeding, so a process settles just
+under its quota instead of bursting into it and having every thread retry at
+once.
+"""
+
+import threading
+import time
+import urllib.error
+import weakref
+from dataclasses import dataclass
+from typing import Optional
+
+# The adapted rate never drops below this fraction of the configured rate.
+_MIN_RATE_FRACTION = 0.05
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Limits for a RateLimiter.
+
+    Args:
+        requests_per_second (Optional[float]): Upper bound on the request
+            rate. None leaves the rate unlimited (and not adaptive).
+        max_in_flight (Optional[int]): Upper bound on concurrent requests.
+            A streamed response holds its slot until it is closed.
+        burst (float): Requests that may start back to back after an idle
+            period.
+        backoff (float): Factor the rate is multiplied by on a 429.
+        ramp_up (float): Fraction of ``requests_per_second`` regained per
+            second without a 429.
+    """
+
+    requests_per_second: Optional[float] = None
+    max_in_flight: Optional[int] = None
+    burst: float = 1.0
+    backoff: float = 0.5
+    ramp_up: float = 0.05
+
+    def __post_init__(self):
+        if self.requests_per_second is not None and self.requests_per_second <= 0:
+            raise ValueError("requests_per_second must be positive")
+        if self.max_in_flight is not None and self.max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        if self.burst < 1:
+            raise ValueError("burst must be at least 1")
+        if not 0 < self.backoff < 1:
+            raise ValueError("backoff must be between 0 and 1")
+        if self.ramp_up <= 0:
+            raise ValueError("ramp_up must be positive")
+
+
+class Permit:
+    """One admitted request. Release it once the response is finished.
+
+    As a context manager it releases on exit, passing along any exception.
+    """
+
+    def __init__(self, limiter: "RateLimiter", started: float):
+        self._limiter = limiter
+        self.started = started
+        self._released = False
+
+    def release(self, exc: Optional[BaseException] = None) -> None:
+        """Free the in-flight slot; ``exc`` is the error the request failed with.
+
+        Safe to call more than once.
+        """
+        if not self._released:
+            self._released = True
+            self._limiter._release(self, exc)
+
+    def __enter__(self) -> "Permit":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release(exc)
+
+
+class RateLimiter:
+    """Thread-safe token bucket and in-flight cap with adaptive rate.
+
+    Clients take one with ``rate_limit=RateLimit(...)``, which shares a single
+    limiter between every client in the process that uses the same API key.
+    """
+
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        self._cond = threading.Condition()
+        self._rate = limit.requests_per_second
+        self._tokens = limit.burst
+        self._refilled = time.monotonic()
+        self._throttled = float("-inf")
+        self._in_flight = 0
+
+    @property
+    def rate(self) -> Optional[float]:
+        """The current, possibly reduced, request rate."""
+        with self._cond:
+            self._refill(time.monotonic())
+            return self._rate
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> Permit:
+        """Block until a request may start and return its permit."""
+        max_in_flight = self.limit.max_in_flight
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if max_in_flight is not None and self._in_flight >= max_in_flight:
+                    self._cond.wait()
+                elif self._rate is not None and self._tokens < 1:
+                    self._cond.wait((1 - self._tokens) / self._rate)
+                else:
+                    if self._rate is not None:
+                        self._tokens -= 1
+                    self._in_flight += 1
+                    return Permit(self, now)
+
+    def _release(self, permit: Permit, exc: Optional[BaseException]) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            throttled = isinstance(exc, urllib.error.HTTPError) and exc.code == 429
+            # A burst of 429s from requests sent at the old rate backs off once.
+            if throttled and self._rate is not None and permit.started > self._throttled:
+                now = time.monotonic()
+                self._refill(now)
+                floor = self.limit.requests_per_second * _MIN_RATE_FRACTION
+                self._rate = max(floor, self._rate * self.limit.backoff)
+                self._tokens = min(self._tokens, 0.0)
+                self._throttled = now
+            self._cond.notify_all()
+
+    def _refill(self, now: float) -> None:
+        if self._rate is None:
+            return
+        elapsed = now - self._refilled
+        self._refilled = now
+        ceiling = self.limit.requests_per_second
+        self._rate = min(ceiling, self._rate + ceiling * self.limit.ramp_up * elapsed)
+        self._tokens = min(self.limit.burst, self._tokens + self._rate * elapsed)
+
+
+_shared: "weakref.WeakValueDictionary[Optional[str], RateLimiter]" = (
+    weakref.WeakValueDictionary()
+)
+_shared_lock = threading.Lock()
+
+
+def shared_limiter(api_key: Optional[str], limit: RateLimit) -> RateLimiter:
+    """Return the process-wide limiter for ``api_key``, creating it if needed.
+
+    Raises ValueError if the key already has a limiter with different limits.
+    """
+    with _shared_lock:
+        limiter = _shared.get(api_key)
+        if limiter is None:
+            limiter = _shared[api_key] = RateLimiter(limit)
+        elif limiter.limit != limit:
+            raise ValueError(
+                "a different rate_limit is already in use for this API key"
+            )
+        return limiter
+
+
+class _NoPermit:
+    """Stand-in permit for clients without a rate limit."""
+
+    def release(self, exc: Optional[BaseException] = None) -> None:
+        pass
+
+    def __enter__(self) -> "_NoPermit":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NO_PERMIT = _NoPermit()
@@ -0,0 +1,450 @@
+"""Persistent on-disk cache of deterministic inference results."""
+
+import dataclasses
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, List, Literal, Optional, Union
+
+from PIL import Image
+
+from .arrays import DetectResult, PointResult
+from .image import _content_key
+from .types import (
+    VLM,
+    CaptionOutput,
+    DetectOutput,
+    EncodedImage,
+    PointOutput,
+    QueryOutput,
+    SamplingSettings,
+    SegmentOutput,
+    SegmentStreamOutput,
+    SpatialRef,
+)
+
+# Hits only refresh an entry's LRU timestamp this often, so reads from many
+# processes don't each take the database write lock.
+_TOUCH_INTERVAL = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+CREATE INDEX IF NOT EXISTS results_created ON results (created);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results BEGIN
+    UPDATE totals SET bytes = bytes + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS results_update AFTER UPDATE OF size ON results BEGIN
+    UPDATE totals SET bytes = bytes + new.size - old.size;
+END;
+CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results BEGIN
+    UPDATE totals SET bytes = bytes - old.size;
+END;
+"""
+
+
+@dataclass
+class ResultCacheStats:
+    """Snapshot of a ResultCache. Counters cover this process only."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+class ResultCache:
+    """SQLite-backed cache of skill results, safe to share between processes.
+
+    Args:
+        path: Database file. Created if missing; ":memory:" keeps it private
+            to this object.
+        ttl (Optional[float]): Seconds an entry stays valid after it is
+            written. None keeps entries until they are evicted.
+        max_bytes (int): Evict least recently used entries once the stored
+            results exceed this size.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, "os.PathLike[str]"],
+        *,
+        ttl: Optional[float] = None,
+        max_bytes: int = 1024 * 1024 * 1024,
+    ):
+        self.path = os.fspath(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = ResultCacheStats()
+        self._conn = sqlite3.connect(
+            self.path, timeout=30.0, isolation_level=None, check_same_thread=False
+        )
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached result for ``key``, or None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created, accessed FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self._expired(row[1], now):
+                with self._write():
+                    self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._stats.misses += 1
+                return None
+            if now - row[2] > _TOUCH_INTERVAL:
+                with self._write():
+                    self._conn.execute(
+                        "UPDATE results SET accessed = ? WHERE key = ?", (now, key)
+                    )
+            self._stats.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict) -> None:
+        """Store ``value`` (a JSON-serializable skill result) under ``key``."""
+        data = json.dumps(value, separators=(",", ":"))
+        size = len(key) + len(data)
+        now = time.time()
+        with self._lock, self._write():
+            if self.ttl is not None:
+                self._conn.execute(
+                    "DELETE FROM results WHERE created < ?", (now - self.ttl,)
+                )
+            self._conn.execute(
+                "INSERT INTO results (key, value, size, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET value = excluded.value,"
+                " size = excluded.size, created = excluded.created,"
+                " accessed = excluded.accessed",
+                (key, data, size, now, now),
+            )
+            self._evict()
+
+    def stats(self) -> ResultCacheStats:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            total = self._conn.execute("SELECT bytes FROM totals").fetchone()[0]
+            return ResultCacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                entries=entries,
+                bytes=total,
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._write():
+            self._conn.execute("DELETE FROM results")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    @contextmanager
+    def _write(self) -> Iterator[None]:
+        # Take the write lock up front so concurrent writers wait on
+        # busy_timeout instead of failing when upgrading a read lock.
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _evict(self) -> None:
+        excess = self._conn.execute("SELECT bytes FROM totals").fetchone()[0]
+        excess -= self.max_bytes
+        if excess <= 0:
+            return
+        victims: List[str] = []
+        rows = self._conn.execute("SELECT key, size FROM results ORDER BY accessed")
+        try:
+            for key, size in rows:
+                victims.append(key)
+                excess -= size
+                if excess <= 0:
+                    break
+        finally:
+            rows.close()
+        self._conn.executemany(
+            "DELETE FROM results WHERE key = ?", [(key,) for key in victims]
+        )
+        self._stats.evictions += len(victims)
+
+
+def _is_deterministic(skill: str, settings: Optional[SamplingSettings]) -> bool:
+    """Whether a call's result can be reused.
+
+    Caption and query sample text, so they are only cached with an explicit
+    temperature of 0. Detect, point and segment are cached unless a non-zero
+    temperature is set.
+    """
+    temperature = (settings or {}).get("temperature")
+    if skill in ("caption", "query"):
+        return temperature == 0
+    return not temperature
+
+
+def _stop_params(kwargs: dict) -> dict:
+    """Stop strings truncate the result, so they belong in its key."""
+    stop = kwargs.get("stop")
+    return {} if stop is None else {"stop": stop}
+
+
+def _backend_scope(model: VLM) -> dict:
+    """The parts of a client's configuration that change its results."""
+    while isinstance(model, _WrappedVL):
+        model = model.model
+    encode_options = getattr(model, "encode_options", None)
+    return {
+        "backend": type(model).__name__,
+        "endpoint": getattr(model, "endpoint", None),
+        "model": getattr(model, "model", None),
+        "encode": (
+            None if encode_options is None else dataclasses.asdict(encode_options)
+        ),
+    }
+
+
+def _call_key(
+    scope: dict,
+    skill: str,
+    image: Optional[Union[Image.Image, EncodedImage]],
+    params: dict,
+) -> str:
+    """Hash a call's backend scope, skill, image content and arguments."""
+    image_key = None
+    if image is not None:
+        image_key = [
+            part.hex() if isinstance(part, bytes) else part
+            for part in _content_key(image)
+        ]
+    blob = json.dumps(
+        {**scope, "skill": skill, "image": image_key, "params": params},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.blake2b(blob.encode(), digest_size=16).hexdigest()
+
+
+class _WrappedVL(VLM):
+    """Base for wrappers that handle calls by a key of their arguments.
+
+    Subclasses implement ``_dispatch(skill, image, params, call)``, where
+    ``params`` are the arguments that affect the output and ``call()`` runs
+    the wrapped model. Streaming calls and ``stop_when`` predicates go
+    straight to the wrapped model.
+    """
+
+    def __init__(self, model: VLM):
+        self.model = model
+        self.default_max_concurrency = model.default_max_concurrency
+        self._scope = _backend_scope(model)
+
+    def _key(
+        self,
+        skill: str,
+        image: Optional[Union[Image.Image, EncodedImage]],
+        params: dict,
+    ) -> str:
+        return _call_key(self._scope, skill, image, params)
+
+    def _dispatch(
+        self,
+        skill: str,
+        image: Optional[Union[Image.Image, EncodedImage]],
+        params: dict,
+        call: Callable[[], dict],
+    ) -> dict:
+        raise NotImplementedError
+
+    def encode_image(self, image: Union[Image.Image, EncodedImage]) -> EncodedImage:
+        return self.model.encode_image(image)
+
+    def caption(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        length: Literal["normal", "short", "long"] = "normal",
+        stream: bool = False,
+        settings: Optional[SamplingSettings] = None,
+        **kwargs,
+    ) -> CaptionOutput:
+        def call():
+            return self.model.caption(
+                image, length=length, stream=stream, settings=settings, **kwargs
+            )
+
+        if stream or kwargs.get("stop_when") is not None:
+            return call()
+        params = {"length": length, "settings": settings, **_stop_params(kwargs)}
+        return self._dispatch("caption", image, params, call)
+
+    def query(
+        self,
+        image: Optional[Union[Image.Image, EncodedImage]] = None,
+        question: Optional[str] = None,
+        stream: bool = False,
+        settings: Optional[SamplingSettings] = None,
+        reasoning: bool = False,
+        **kwargs,
+    ) -> QueryOutput:
+        def call():
+            return self.model.query(
+                image,
+                question=question,
+                stream=stream,
+                settings=settings,
+                reasoning=reasoning,
+                **kwargs,
+            )
+
+        if stream or question is None or kwargs.get("stop_when") is not None:
+            return call()
+        params = {
+            "question": question,
+            "reasoning": reasoning,
+            "settings": settings,
+            **_stop_params(kwargs),
+        }
+        return self._dispatch("query", image, params, call)
+
+    def detect(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        object: str,
+        settings: Optional[SamplingSettings] = None,
+        as_arrays: bool = False,
+        **kwargs,
+    ) -> Union[DetectOutput, DetectResult]:
+        # Results are stored and shared as dicts and converted on the way out.
+        result = self._dispatch(
+            "detect",
+            image,
+            {"object": object, "settings": settings},
+            lambda: self.model.detect(image, object, settings=settings, **kwargs),
+        )
+        return DetectResult.from_output(result) if as_arrays else result
+
+    def point(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        object: str,
+        settings: Optional[SamplingSettings] = None,
+        as_arrays: bool = False,
+        **kwargs,
+    ) -> Union[PointOutput, PointResult]:
+        result = self._dispatch(
+            "point",
+            image,
+            {"object": object, "settings": settings},
+            lambda: self.model.point(image, object, settings=settings, **kwargs),
+        )
+        return PointResult.from_output(result) if as_arrays else result
+
+    def segment(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        object: str,
+        spatial_refs: Optional[List[SpatialRef]] = None,
+        stream: bool = False,
+        settings: Optional[SamplingSettings] = None,
+        **kwargs,
+    ) -> Union[SegmentOutput, SegmentStreamOutput]:
+        def call():
+            return self.model.segment(
+                image,
+                object,
+                spatial_refs=spatial_refs,
+                stream=stream,
+                settings=settings,
+                **kwargs,
+            )
+
+        if stream:
+            return call()
+        params = {"object": object, "spatial_refs": spatial_refs, "settings": settings}
+        return self._dispatch("segment", image, params, call)
+
+
+class CachedVL(_WrappedVL):
+    """Wrap a VLM so deterministic calls are answered from a ResultCache.
+
+    Hits return without encoding the image or touching the network or GPU.
+    Entries are keyed by the backend (class, endpoint and model string), the
+    client's encode options, the skill, a hash of the image content and every
+    other argument that affects the output. Streaming calls, sampled settings
+    (see above) and calls with a ``stop_when`` predicate always go to the
+    wrapped model. With the cloud API, pin ``model=`` so results from a newer
+    default model aren't mixed in.
+
+    Args:
+        model (VLM): The client to wrap, e.g. a CloudVL or PhotonVL.
+        cache (ResultCache): Where results are stored.
+    """
+
+    def __init__(self, model: VLM, cache: ResultCache):
+        super().__init__(model)
+        self.cache = cache
+
+    def cache_key(
+        self,
+        skill: str,
+        image: Optional[Union[Image.Image, EncodedImage]],
+        **params: Any,
+    ) -> str:
+        """Return the key a call to ``skill`` with these arguments is stored under."""
+        return self._key(skill, image, params)
+
+    def _dispatch(
+        self,
+        skill: str,
+        image: Optional[Union[Image.Image, EncodedImage]],
+        params: dict,
+        call: Callable[[], dict],
+    ) -> dict:
+        if not _is_deterministic(skill, params.get("settings")):
+            return call()
+        key = self._key(skill, image, params)
+        result = self.cache.get(key)
+        if result is None:
+            result = call()
+            self.cache.set(key, result)
+        return result
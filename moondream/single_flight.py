@@ -0,0 +1,98 @@
+"""Coalescing of identical calls that are in flight at the same time."""
+
+import copy
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Union
+
+from PIL import Image
+
+from .result_cache import _is_deterministic, _WrappedVL
+from .types import VLM, EncodedImage
+
+
+@dataclass
+class SingleFlightStats:
+    """Snapshot of a SingleFlightVL's counters.
+
+    ``calls`` counts calls eligible for coalescing, ``deduplicated`` those
+    that waited for an identical call instead of sending their own, and
+    ``in_flight`` the distinct upstream calls running right now.
+    """
+
+    calls: int = 0
+    deduplicated: int = 0
+    in_flight: int = 0
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[dict] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlightVL(_WrappedVL):
+    """Wrap a VLM so identical concurrent calls share one upstream call.
+
+    Calls match when the backend, skill, image content and every argument
+    that affects the output are the same (see CachedVL for how they are
+    keyed). The first caller runs the call. Callers that arrive while it is
+    running wait for it and get a copy of its result, or the same exception.
+    Only deterministic calls are coalesced, since sampled ones are expected
+    to differ. Streaming calls and calls with ``stop_when`` always go to the
+    wrapped model.
+
+    Args:
+        model (VLM): The client to wrap, e.g. a CloudVL or PhotonVL.
+    """
+
+    def __init__(self, model: VLM):
+        super().__init__(model)
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = SingleFlightStats()
+
+    def stats(self) -> SingleFlightStats:
+        with self._lock:
+            return SingleFlightStats(
+                calls=self._stats.calls,
+                deduplicated=self._stats.deduplicated,
+                in_flight=len(self._flights),
+            )
+
+    def _dispatch(
+        self,
+        skill: str,
+        image: Optional[Union[Image.Image, EncodedImage]],
+        params: dict,
+        call: Callable[[], dict],
+    ) -> dict:
+        if not _is_deterministic(skill, params.get("settings")):
+            return call()
+        key = self._key(skill, image, params)
+        with self._lock:
+            self._stats.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._stats.deduplicated += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        try:
+            flight.result = call()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
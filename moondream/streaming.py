@@ -0,0 +1,134 @@
+"""Early stopping for streamed caption and query text."""
+
+from typing import (
+    AsyncIterator,
+    Callable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+Stop = Union[str, Sequence[str]]
+StopWhen = Callable[[str], bool]
+
+
+def _stops_early(
+    stream: bool,
+    reasoning: bool,
+    stop: Optional[Stop],
+    stop_when: Optional[StopWhen],
+) -> bool:
+    """Return whether a call stops early, rejecting unsupported combinations.
+
+    Without stream=True, early stopping streams internally and joins the
+    chunks, which would drop a query's separately returned reasoning.
+    """
+    stops_early = stop is not None or stop_when is not None
+    if stops_early and reasoning and not stream:
+        raise ValueError("stop and stop_when require stream=True with reasoning=True")
+    return stops_early
+
+
+class _StopMatcher:
+    """Truncates text at the first stop string or once ``stop_when`` holds.
+
+    Text that could be the start of a stop string split across chunks is held
+    back until the next chunk shows whether it is.
+    """
+
+    def __init__(self, stop: Optional[Stop], stop_when: Optional[StopWhen]):
+        self.stops: List[str] = [stop] if isinstance(stop, str) else list(stop or ())
+        if not all(self.stops):
+            raise ValueError("stop strings must be non-empty")
+        self.stop_when = stop_when
+        self.hold = max((len(s) for s in self.stops), default=1) - 1
+        self.pending = ""
+        self.text = ""
+
+    def feed(self, chunk: str) -> Tuple[str, bool]:
+        """Return the text to emit for ``chunk`` and whether to stop."""
+        buffered, self.pending = self.pending + chunk, ""
+        cut = min((i for i in map(buffered.find, self.stops) if i >= 0), default=-1)
+        if cut >= 0:
+            return self._emit(buffered[:cut]), True
+        split = len(buffered) - min(self.hold, len(buffered))
+        out = self._emit(buffered[:split])
+        self.pending = buffered[split:]
+        if self.stop_when is not None and self.stop_when(self.text + self.pending):
+            return out + self.flush(), True
+        return out, False
+
+    def flush(self) -> str:
+        text, self.pending = self.pending, ""
+        return self._emit(text)
+
+    def _emit(self, text: str) -> str:
+        if self.stop_when is not None:
+            self.text += text
+        return text
+
+
+def stop_early(
+    chunks: Iterator[str],
+    stop: Optional[Stop] = None,
+    stop_when: Optional[StopWhen] = None,
+) -> Iterator[str]:
+    """Yield ``chunks`` until a stop string appears or ``stop_when(text)`` holds.
+
+    Output is truncated before the first stop string. With ``stop_when``, the
+    chunk that satisfied it is still yielded. Either way ``chunks`` is closed
+    as soon as the stream stops, which aborts the underlying request.
+    """
+    if stop is None and stop_when is None:
+        return chunks
+    return _stop_early(chunks, _StopMatcher(stop, stop_when))
+
+
+def _stop_early(chunks: Iterator[str], matcher: _StopMatcher) -> Iterator[str]:
+    try:
+        for chunk in chunks:
+            text, done = matcher.feed(chunk)
+            if text:
+                yield text
+            if done:
+                return
+        tail = matcher.flush()
+        if tail:
+            yield tail
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def stop_early_async(
+    chunks: AsyncIterator[str],
+    stop: Optional[Stop] = None,
+    stop_when: Optional[StopWhen] = None,
+) -> AsyncIterator[str]:
+    """Async counterpart of stop_early()."""
+    if stop is None and stop_when is None:
+        return chunks
+    return _stop_early_async(chunks, _StopMatcher(stop, stop_when))
+
+
+async def _stop_early_async(
+    chunks: AsyncIterator[str], matcher: _StopMatcher
+) -> AsyncIterator[str]:
+    try:
+        async for chunk in chunks:
+            text, done = matcher.feed(chunk)
+            if text:
+                yield text
+            if done:
+                return
+        tail = matcher.flush()
+        if tail:
+            yield tail
+    finally:
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,248 @@
+"""Tiled ``detect`` and ``point`` for images too large to send whole.
+
+A 40 MP scan downscaled to the model's input size loses small objects. These
+helpers cut the image into overlapping tiles, run the skill on every tile
+concurrently through ``VLM.map``, move each tile's normalized results back to
+whole-image coordinates, and merge the duplicates that overlapping tiles
+produce. Merging is vectorized with NumPy so it stays fast with thousands of
+boxes.
+"""
+
+from io import BytesIO
+from typing import Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from .types import (
+    VLM,
+    BytesEncodedImage,
+    DetectOutput,
+    EncodedImage,
+    PointOutput,
+    SamplingSettings,
+)
+
+# (left, top, right, bottom) in pixels.
+TileBox = Tuple[int, int, int, int]
+
+
+def tile_grid(
+    width: int, height: int, tile: int = 1024, overlap: int = 128
+) -> List[TileBox]:
+    """Overlapping tiles covering a ``width`` x ``height`` image, row by row.
+
+    Tiles are ``tile`` pixels square (smaller only when the image is) and
+    neighbours share at least ``overlap`` pixels. The last tile in each row
+    and column is aligned to the image edge rather than running past it.
+    """
+    if tile < 1:
+        raise ValueError("tile must be at least 1")
+    if not 0 <= overlap < tile:
+        raise ValueError("overlap must be at least 0 and less than tile")
+    xs = _starts(width, tile, overlap)
+    ys = _starts(height, tile, overlap)
+    return [
+        (x, y, min(x + tile, width), min(y + tile, height)) for y in ys for x in xs
+    ]
+
+
+def _starts(size: int, tile: int, overlap: int) -> List[int]:
+    if size <= tile:
+        return [0]
+    stride = tile - overlap
+    starts = list(range(0, size - tile, stride))
+    starts.append(size - tile)
+    return starts
+
+
+def _open(image: Union[Image.Image, EncodedImage]) -> Image.Image:
+    if isinstance(image, Image.Image):
+        return image
+    if isinstance(image, BytesEncodedImage):
+        return Image.open(BytesIO(image.data))
+    raise ValueError("tiled calls need a PIL image or a BytesEncodedImage")
+
+
+def _run_tiles(
+    model: VLM,
+    skill: str,
+    image: Union[Image.Image, EncodedImage],
+    object: str,
+    tile: int,
+    overlap: int,
+    settings: Optional[SamplingSettings],
+    max_concurrency: Optional[int],
+) -> Iterator[Tuple[TileBox, Tuple[int, int], dict]]:
+    """Run ``skill`` on every tile, yielding (tile box, image size, output)."""
+    source = _open(image)
+    size = source.size
+    boxes = tile_grid(size[0], size[1], tile, overlap)
+    kwargs: dict = {"object": object}
+    if settings is not None:
+        kwargs["settings"] = settings
+    # Crops are made lazily as map() pulls inputs, so only the tiles in
+    # flight are held in memory.
+    inputs = ({"image": source.crop(box), **kwargs} for box in boxes)
+    for index, result in model.map(skill, inputs, max_concurrency=max_concurrency):
+        if isinstance(result, Exception):
+            raise result
+        yield boxes[index], size, result
+
+
+def box_iou(boxes: np.ndarray, box: np.ndarray, metric: str = "iou") -> np.ndarray:
+    """Overlap of each row of ``boxes`` (N, 4) with one ``box`` (4,).
+
+    Boxes are ``x_min, y_min, x_max, y_max``. ``metric`` is "iou"
+    (intersection over union) or "ios" (intersection over the smaller box,
+    which is 1 when one box lies inside the other).
+    """
+    x0 = np.maximum(boxes[:, 0], box[0])
+    y0 = np.maximum(boxes[:, 1], box[1])
+    x1 = np.minimum(boxes[:, 2], box[2])
+    y1 = np.minimum(boxes[:, 3], box[3])
+    inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    if metric == "iou":
+        denominator = areas + area - inter
+    elif metric == "ios":
+        denominator = np.minimum(areas, area)
+    else:
+        raise ValueError("metric must be 'iou' or 'ios'")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, inter / denominator, 0.0)
+
+
+def nms(boxes: np.ndarray, threshold: float = 0.5, metric: str = "iou") -> np.ndarray:
+    """Greedy non-maximum suppression. Returns the indices of the kept boxes.
+
+    Moondream detections carry no scores, so larger boxes win: a box cut
+    off at a tile edge is dropped in favour of the whole object from a
+    neighbouring tile. Each step compares one kept box against all remaining
+    boxes at once.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = np.argsort(-areas, kind="stable")
+    keep = []
+    while order.size:
+        current = order[0]
+        keep.append(current)
+        rest = order[1:]
+        overlap = box_iou(boxes[rest], boxes[current], metric)
+        order = rest[overlap <= threshold]
+    return np.asarray(keep, dtype=np.intp)
+
+
+def cluster_points(points: np.ndarray, radius: float) -> np.ndarray:
+    """Merge points closer than ``radius`` to a cluster's first point.
+
+    Returns an (M, 2) array of cluster centroids, in input order of each
+    cluster's first point.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    remaining = np.arange(len(points))
+    centroids = []
+    limit = radius * radius
+    while remaining.size:
+        candidates = points[remaining]
+        close = ((candidates - candidates[0]) ** 2).sum(axis=1) <= limit
+        centroids.append(candidates[close].mean(axis=0))
+        remaining = remaining[~close]
+    return np.asarray(centroids, dtype=np.float64).reshape(-1, 2)
+
+
+def detect_tiled(
+    model: VLM,
+    image: Union[Image.Image, EncodedImage],
+    object: str,
+    *,
+    tile: int = 1024,
+    overlap: int = 128,
+    threshold: float = 0.6,
+    metric: str = "ios",
+    settings: Optional[SamplingSettings] = None,
+    max_concurrency: Optional[int] = None,
+) -> DetectOutput:
+    """Detect ``object`` tile by tile and merge the results.
+
+    Args:
+        model (VLM): Any synchronous client.
+        image: A PIL image or BytesEncodedImage; tiles are cropped from it.
+        object (str): What to detect.
+        tile (int): Tile side in pixels.
+        overlap (int): Pixels shared by neighbouring tiles. Objects up to this
+            size appear whole in at least one tile.
+        threshold (float): Boxes overlapping a larger kept box by more than
+            this are merged into it.
+        metric (str): "ios" (intersection over the smaller box) merges the
+            partial boxes cut off at tile edges; "iou" is classic NMS.
+        settings (Optional[SamplingSettings]): Passed to every tile call.
+        max_concurrency (Optional[int]): Tiles in flight; defaults to the
+            model's default_max_concurrency.
+
+    Returns:
+        A DetectOutput whose regions are normalized to the whole image. If a
+        tile fails, its exception is raised.
+    """
+    rows = []
+    size = (1, 1)
+    for (left, top, right, bottom), size, result in _run_tiles(
+        model, "detect", image, object, tile, overlap, settings, max_concurrency
+    ):
+        for region in result["objects"]:
+            rows.append(
+                (
+                    left + region["x_min"] * (right - left),
+                    top + region["y_min"] * (bottom - top),
+                    left + region["x_max"] * (right - left),
+                    top + region["y_max"] * (bottom - top),
+                )
+            )
+    if not rows:
+        return {"objects": []}
+    boxes = np.asarray(rows, dtype=np.float64)
+    merged = boxes[nms(boxes, threshold, metric)]
+    merged /= np.array([size[0], size[1], size[0], size[1]], dtype=np.float64)
+    return {
+        "objects": [
+            {"x_min": x0, "y_min": y0, "x_max": x1, "y_max": y1}
+            for x0, y0, x1, y1 in merged.tolist()
+        ]
+    }
+
+
+def point_tiled(
+    model: VLM,
+    image: Union[Image.Image, EncodedImage],
+    object: str,
+    *,
+    tile: int = 1024,
+    overlap: int = 128,
+    radius: float = 32.0,
+    settings: Optional[SamplingSettings] = None,
+    max_concurrency: Optional[int] = None,
+) -> PointOutput:
+    """Point at ``object`` tile by tile and merge points from overlapping tiles.
+
+    Points within ``radius`` pixels of each other (in the full image) are
+    merged into their centroid. Other arguments are as for detect_tiled.
+    """
+    rows = []
+    size = (1, 1)
+    for (left, top, right, bottom), size, result in _run_tiles(
+        model, "point", image, object, tile, overlap, settings, max_concurrency
+    ):
+        for point in result["points"]:
+            rows.append(
+                (
+                    left + point["x"] * (right - left),
+                    top + point["y"] * (bottom - top),
+                )
+            )
+    if not rows:
+        return {"points": []}
+    merged = cluster_points(np.asarray(rows, dtype=np.float64), radius)
+    merged /= np.array(size, dtype=np.float64)
+    return {"points": [{"x": x, "y": y} for x, y in merged.tolist()]}
@@ -0,0 +1,126 @@
+"""Per-call latency breakdowns reported through ``on_request_complete``."""
+
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional, TypeVar
+
+from .transport import TransferStats
+
+
+@dataclass
+class RequestTiming:
+    """Where the time went in one call. Durations are in seconds.
+
+    Phases that did not happen stay None (or 0 for counters). For the cloud
+    and finetuning clients ``connect_seconds``, ``upload_seconds`` and
+    ``ttfb_seconds`` describe the last attempt, and ``transfer`` holds its
+    byte counts. For Photon, ``schedule_seconds`` is the time a call waited
+    to start on the engine's event loop and ``engine_seconds`` the time the
+    engine took from there.
+
+    Attributes:
+        call: The skill name, or "METHOD /path" for finetuning requests.
+        encode_seconds: Turning the image into bytes or a data URL.
+        serialize_seconds: Building the request body.
+        payload_bytes: Size of the request body before compression.
+        ttft_seconds: From the start of the call to the first streamed chunk.
+        stream_seconds: From the first streamed chunk to the last.
+        chunks: Streamed chunks received (roughly one token each).
+        parse_seconds: Decoding the JSON response.
+        total_seconds: The whole call, including retries and streaming.
+        attempts: Requests sent, including retries.
+        status: HTTP status of the last response, if any.
+        error: The exception the call failed with, if any.
+    """
+
+    call: str
+    encode_seconds: float = 0.0
+    serialize_seconds: float = 0.0
+    payload_bytes: int = 0
+    connect_seconds: Optional[float] = None
+    upload_seconds: Optional[float] = None
+    ttfb_seconds: Optional[float] = None
+    ttft_seconds: Optional[float] = None
+    stream_seconds: Optional[float] = None
+    chunks: int = 0
+    parse_seconds: float = 0.0
+    schedule_seconds: Optional[float] = None
+    engine_seconds: Optional[float] = None
+    total_seconds: float = 0.0
+    attempts: int = 0
+    status: Optional[int] = None
+    error: Optional[BaseException] = None
+    transfer: Optional[TransferStats] = None
+    started: float = field(default_factory=time.perf_counter, repr=False)
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1)
+
+    @property
+    def chunks_per_second(self) -> Optional[float]:
+        """Streaming rate after the first chunk, or None for unary calls."""
+        if self.chunks < 2 or not self.stream_seconds:
+            return None
+        return (self.chunks - 1) / self.stream_seconds
+
+    def record_response(self, response) -> None:
+        """Copy status and network timings from a pooled response."""
+        self.status = response.status
+        transfer = response.transfer
+        self.transfer = transfer
+        self.connect_seconds = transfer.connect_seconds
+        self.upload_seconds = transfer.upload_seconds
+        self.ttfb_seconds = transfer.ttfb_seconds
+
+    def record_chunk(self) -> None:
+        now = time.perf_counter() - self.started
+        if self.chunks == 0:
+            self.ttft_seconds = now
+        else:
+            self.stream_seconds = now - self.ttft_seconds
+        self.chunks += 1
+
+
+OnRequestComplete = Callable[[RequestTiming], None]
+
+T = TypeVar("T")
+
+
+def _finish(
+    timing: Optional[RequestTiming],
+    hook: Optional[OnRequestComplete],
+    error: Optional[BaseException],
+) -> None:
+    """Stamp the total time on ``timing`` and hand it to ``hook``."""
+    if timing is None or hook is None:
+        return
+    timing.total_seconds = time.perf_counter() - timing.started
+    timing.error = error
+    status = getattr(error, "code", None)
+    if isinstance(status, int):
+        timing.status = status
+    hook(timing)
+
+
+def _timed_chunks(
+    chunks: Iterator[T], timing: RequestTiming, hook: OnRequestComplete
+) -> Iterator[T]:
+    """Count the chunks of a stream and report ``timing`` when it ends.
+
+    Closing the stream early closes ``chunks`` first, so the response is
+    released before the hook runs.
+    """
+    error = None
+    try:
+        for chunk in chunks:
+            timing.record_chunk()
+            yield chunk
+    except Exception as exc:
+        error = exc
+        raise
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+        _finish(timing, hook, error)
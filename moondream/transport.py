@@ -0,0 +1,1010 @@
+"""Shared HTTP transport for the cloud and finetuning clients.
+
+Requests go through a keep-alive ``ConnectionPool`` instead of a fresh
+``urllib.request.urlopen`` per call, so repeated calls to the same endpoint
+skip TCP and TLS setup. Errors are raised as ``urllib.error.HTTPError`` and
+``urllib.error.URLError`` just like ``urlopen``. ``AsyncConnectionPool`` is
+the asyncio counterpart used by ``AsyncCloudVL``. Both can compress request
+bodies and decode compressed responses; see ``Compression``.
+"""
+
+import asyncio
+import email.parser
+import email.utils
+import gzip
+import http.client
+import io
+import random
+import select
+import socket
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import weakref
+import zlib
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    FrozenSet,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+_PoolKey = Tuple[str, str, int]
+
+_READ_SIZE = 64 * 1024
+
+# Errors that mean a reused keep-alive connection was closed by the server
+# before it saw our request. These are retried once on a fresh connection.
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+RETRY_STATUS_CODES = frozenset(
+    {408, 425, 429, 500, 502, 503, 504, 520, 521, 522, 523, 524}
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How failed requests are retried.
+
+    Delays use full-jitter exponential backoff: attempt ``n`` sleeps a random
+    time up to ``min(max_delay, base_delay * 2**n)``. A ``Retry-After`` header
+    on a retryable response takes precedence, up to ``max_retry_after``.
+    """
+
+    max_retries: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    retry_status_codes: FrozenSet[int] = field(default=RETRY_STATUS_CODES)
+    respect_retry_after: bool = True
+    max_retry_after: float = 60.0
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        if isinstance(exc, urllib.error.HTTPError):
+            return exc.code in self.retry_status_codes
+        if isinstance(exc, urllib.error.URLError):
+            return True
+        return isinstance(
+            exc, (TimeoutError, socket.timeout, asyncio.TimeoutError, ConnectionError)
+        )
+
+    def delay(self, attempt: int, exc: BaseException) -> float:
+        """Seconds to wait before retry number ``attempt`` (0-based)."""
+        if self.respect_retry_after:
+            retry_after = _retry_after(exc)
+            if retry_after is not None:
+                return min(retry_after, self.max_retry_after)
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * (2**attempt)))
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date) from an HTTPError."""
+    if not isinstance(exc, urllib.error.HTTPError) or exc.headers is None:
+        return None
+    value = exc.headers.get("Retry-After")
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class RetryBudget:
+    """Caps retries per client so a struggling server isn't stampeded.
+
+    Every failed attempt spends one token and every success earns back
+    ``token_ratio``. Retries are only allowed while more than half of
+    ``max_tokens`` remain, so sustained failures quickly turn retries off and
+    they come back as requests start succeeding again.
+    """
+
+    def __init__(self, max_tokens: float = 10.0, token_ratio: float = 0.1):
+        self.max_tokens = max_tokens
+        self.token_ratio = token_ratio
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.token_ratio)
+
+    def record_failure(self) -> bool:
+        """Spend a token for a failed attempt; return True if a retry is allowed."""
+        with self._lock:
+            self._tokens = max(0.0, self._tokens - 1.0)
+            return self._tokens > self.max_tokens / 2
+
+
+def _should_retry(
+    exc: Exception,
+    attempt: int,
+    policy: RetryPolicy,
+    budget: Optional[RetryBudget],
+) -> bool:
+    if not policy.is_retryable(exc):
+        return False
+    allowed = budget.record_failure() if budget is not None else True
+    return allowed and attempt < policy.max_retries
+
+
+def with_retries(
+    fn: Callable[[], T],
+    policy: RetryPolicy,
+    budget: Optional[RetryBudget] = None,
+) -> T:
+    """Call ``fn`` until it succeeds or ``policy``/``budget`` stop retrying."""
+    attempt = 0
+    while True:
+        try:
+            result = fn()
+        except Exception as exc:
+            if not _should_retry(exc, attempt, policy, budget):
+                raise
+            time.sleep(policy.delay(attempt, exc))
+            attempt += 1
+            continue
+        if budget is not None:
+            budget.record_success()
+        return result
+
+
+async def with_retries_async(
+    fn: Callable[[], Awaitable[T]],
+    policy: RetryPolicy,
+    budget: Optional[RetryBudget] = None,
+) -> T:
+    """Asyncio version of with_retries."""
+    attempt = 0
+    while True:
+        try:
+            result = await fn()
+        except Exception as exc:
+            if not _should_retry(exc, attempt, policy, budget):
+                raise
+            await asyncio.sleep(policy.delay(attempt, exc))
+            attempt += 1
+            continue
+        if budget is not None:
+            budget.record_success()
+        return result
+
+
+@dataclass
+class PoolStats:
+    """Snapshot of a ConnectionPool's counters."""
+
+    hits: int = 0  # requests served on a reused connection
+    misses: int = 0  # requests that had to open a new connection
+    evictions: int = 0  # idle connections closed for age or staleness
+    idle: int = 0  # connections currently parked in the pool
+
+
+@dataclass(frozen=True)
+class Compression:
+    """Opt-in compression of request and response bodies.
+
+    Args:
+        request_encoding (Optional[str]): Compress request bodies with "gzip"
+            or "deflate", or send them as-is with None. The server must accept
+            a Content-Encoding on requests.
+        min_size (int): Only compress bodies of at least this many bytes, so
+            small requests don't pay for it.
+        level (int): zlib compression level, from 1 (fastest) to 9 (smallest).
+        accept_encoding (bool): Let the server gzip or deflate responses.
+            Compressed responses are decoded whether or not this is set.
+    """
+
+    request_encoding: Optional[Literal["gzip", "deflate"]] = "gzip"
+    min_size: int = 1024
+    level: int = 6
+    accept_encoding: bool = True
+
+    def __post_init__(self):
+        if self.request_encoding not in (None, "gzip", "deflate"):
+            raise ValueError('request_encoding must be "gzip", "deflate" or None')
+        if not 1 <= self.level <= 9:
+            raise ValueError("level must be between 1 and 9")
+
+    def encode(self, data: Optional[bytes]) -> Tuple[Optional[bytes], Optional[str]]:
+        """Return ``(body, content_encoding)``, compressing ``data`` if worthwhile."""
+        if data is None or self.request_encoding is None or len(data) < self.min_size:
+            return data, None
+        if self.request_encoding == "gzip":
+            compressed = gzip.compress(data, compresslevel=self.level, mtime=0)
+        else:
+            compressed = zlib.compress(data, self.level)
+        if len(compressed) >= len(data):
+            return data, None
+        return compressed, self.request_encoding
+
+
+@dataclass
+class TransferStats:
+    """Body sizes and network timings for one request.
+
+    ``request_bytes``/``response_bytes`` are the uncompressed bodies and the
+    ``*_wire_bytes`` fields what actually crossed the network, excluding
+    headers. Response counts cover what has been read so far.
+
+    ``connect_seconds`` is 0 on a reused connection, ``upload_seconds``
+    covers sending the request, and ``ttfb_seconds`` runs from then until the
+    response headers arrive. They are None when the request went through
+    urllib instead of the pool (proxies).
+    """
+
+    url: str
+    request_bytes: int = 0
+    request_wire_bytes: int = 0
+    response_bytes: int = 0
+    response_wire_bytes: int = 0
+    connect_seconds: Optional[float] = None
+    upload_seconds: Optional[float] = None
+    ttfb_seconds: Optional[float] = None
+
+
+_DECODED_ENCODINGS = frozenset({"gzip", "x-gzip", "deflate"})
+
+
+def _inflater(headers) -> Optional["zlib._Decompress"]:
+    """Return a decompressor for a gzip/deflate response, else None."""
+    encoding = (headers.get("Content-Encoding") or "").strip().lower()
+    if encoding not in _DECODED_ENCODINGS:
+        return None
+    # 32 + MAX_WBITS accepts both gzip and zlib ("deflate") framing.
+    return zlib.decompressobj(32 + zlib.MAX_WBITS)
+
+
+def _prepare_request(
+    req: urllib.request.Request, compression: Optional[Compression]
+) -> Tuple[Optional[bytes], Dict[str, str], TransferStats]:
+    """Return the body and headers to send for ``req``, plus its stats record."""
+    headers = dict(req.header_items())
+    data = req.data
+    transfer = TransferStats(req.full_url, request_bytes=len(data or b""))
+    if compression is not None:
+        data, encoding = compression.encode(data)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        if compression.accept_encoding and not any(
+            name.lower() == "accept-encoding" for name in headers
+        ):
+            headers["Accept-Encoding"] = "gzip, deflate"
+    transfer.request_wire_bytes = len(data or b"")
+    return data, headers, transfer
+
+
+class _InflatingReader(io.RawIOBase):
+    """Raw stream that decompresses an HTTP response body as it is read."""
+
+    def __init__(self, response, inflater, transfer: TransferStats):
+        self._response = response
+        self._inflater: Optional["zlib._Decompress"] = inflater
+        self._transfer = transfer
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            if self._inflater is None:
+                return 0
+            # read1 returns what has arrived instead of waiting to fill the
+            # request, so streamed events are decoded as they come in.
+            data = self._response.read1(_READ_SIZE)
+            self._transfer.response_wire_bytes += len(data)
+            self._pending = self._inflater.decompress(data) if data else b""
+            if not data or self._inflater.eof:
+                # read() consumes any trailer and lets http.client mark the
+                # response complete, so the connection can be reused.
+                rest = self._response.read()
+                self._transfer.response_wire_bytes += len(rest)
+                self._pending += self._inflater.flush()
+                self._inflater = None
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+def _is_connection_dropped(conn: http.client.HTTPConnection) -> bool:
+    """True if the server closed an idle connection (readable with no request)."""
+    sock = conn.sock
+    if sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+class PooledResponse:
+    """File-like response that returns its connection to the pool on close.
+
+    Supports ``read()``, line iteration and use as a context manager, which
+    is everything the clients previously used from ``urlopen``. gzip and
+    deflate bodies are decoded transparently; ``transfer`` counts the bytes.
+    """
+
+    def __init__(
+        self,
+        pool: "ConnectionPool",
+        key: Optional[_PoolKey],
+        conn: Optional[http.client.HTTPConnection],
+        response: http.client.HTTPResponse,
+        transfer: Optional[TransferStats] = None,
+    ):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self._closed = False
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self.transfer = TransferStats("") if transfer is None else transfer
+        inflater = _inflater(response.headers)
+        self._decoding = inflater is not None
+        self._body = (
+            io.BufferedReader(_InflatingReader(response, inflater, self.transfer))
+            if self._decoding
+            else response
+        )
+
+    def getcode(self) -> int:
+        return self.status
+
+    def _count(self, data: bytes) -> bytes:
+        self.transfer.response_bytes += len(data)
+        if not self._decoding:
+            self.transfer.response_wire_bytes += len(data)
+        return data
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        return self._count(self._body.read(amt))
+
+    def readline(self, limit: int = -1) -> bytes:
+        return self._count(self._body.readline(limit))
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        conn, self._conn = self._conn, None
+        if conn is None:
+            self._response.close()
+            return
+        # A response is only safe to reuse once its body has been fully read;
+        # http.client marks it closed at that point.
+        reusable = self._response.isclosed() and not self._response.will_close
+        self._response.close()
+        if reusable:
+            self._pool._release(self._key, conn)
+        else:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """Thread-safe pool of keep-alive HTTP(S) connections, keyed by host.
+
+    Args:
+        max_size (int): Maximum number of idle connections kept per host.
+            Connections beyond this are closed when released.
+        idle_timeout (float): Seconds an idle connection may sit in the pool
+            before it is evicted instead of reused.
+    """
+
+    def __init__(self, max_size: int = 10, idle_timeout: float = 30.0):
+        if max_size < 0:
+            raise ValueError("max_size must be non-negative")
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle: Dict[_PoolKey, List[Tuple[http.client.HTTPConnection, float]]] = {}
+        self._lock = threading.Lock()
+        self._stats = PoolStats()
+        self._ssl_context: Optional[ssl.SSLContext] = None
+
+    def stats(self) -> PoolStats:
+        """Return a snapshot of the hit/miss/eviction counters."""
+        with self._lock:
+            return PoolStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                idle=sum(len(conns) for conns in self._idle.values()),
+            )
+
+    def clear(self) -> None:
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn, _ in conns:
+                conn.close()
+
+    def urlopen(
+        self,
+        req: urllib.request.Request,
+        timeout: Optional[float] = None,
+        compression: Optional[Compression] = None,
+    ) -> PooledResponse:
+        """Send ``req`` on a pooled connection, mirroring ``urllib.request.urlopen``.
+
+        Raises ``urllib.error.HTTPError`` for 4xx/5xx responses and
+        ``urllib.error.URLError`` when the connection cannot be made.
+        """
+        data, headers, transfer = _prepare_request(req, compression)
+        parts = urllib.parse.urlsplit(req.full_url)
+        scheme = parts.scheme.lower()
+        host = parts.hostname or ""
+        if scheme not in ("http", "https") or _uses_proxy(scheme, host):
+            # Leave proxies and exotic schemes to urllib's handler chain.
+            if compression is not None:
+                req = urllib.request.Request(
+                    req.full_url, data=data, headers=headers, method=req.get_method()
+                )
+            response = urllib.request.urlopen(req, timeout=timeout)
+            return PooledResponse(self, None, None, response, transfer)
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, host, port)
+
+        conn, reused = self._acquire(key, timeout)
+        try:
+            response = self._send(conn, req, data, headers, transfer, timeout)
+        except _STALE_CONNECTION_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            conn = self._new_connection(key, timeout)
+            response = self._send(conn, req, data, headers, transfer, timeout)
+
+        pooled = PooledResponse(self, key, conn, response, transfer)
+        if response.status >= 400:
+            with pooled:
+                body = pooled.read()
+            raise urllib.error.HTTPError(
+                req.full_url, response.status, response.reason, response.headers,
+                BytesIO(body),
+            )
+        return pooled
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _send(
+        self,
+        conn: http.client.HTTPConnection,
+        req: urllib.request.Request,
+        data: Optional[bytes],
+        headers: Dict[str, str],
+        transfer: TransferStats,
+        timeout: Optional[float],
+    ) -> http.client.HTTPResponse:
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        conn.timeout = timeout
+        start = connected = time.perf_counter()
+        try:
+            if conn.sock is None:
+                conn.connect()
+                connected = time.perf_counter()
+            conn.request(req.get_method(), req.selector, body=data, headers=headers)
+        except _STALE_CONNECTION_ERRORS:
+            raise
+        except OSError as exc:
+            conn.close()
+            raise urllib.error.URLError(exc) from exc
+        sent = time.perf_counter()
+        try:
+            response = conn.getresponse()
+        except BaseException:
+            conn.close()
+            raise
+        transfer.connect_seconds = connected - start
+        transfer.upload_seconds = sent - connected
+        transfer.ttfb_seconds = time.perf_counter() - sent
+        return response
+
+    def _acquire(
+        self, key: _PoolKey, timeout: Optional[float]
+    ) -> Tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        stale: List[http.client.HTTPConnection] = []
+        conn = None
+        with self._lock:
+            conns = self._idle.get(key, [])
+            while conns:
+                candidate, released_at = conns.pop()
+                if now - released_at > self.idle_timeout or _is_connection_dropped(
+                    candidate
+                ):
+                    stale.append(candidate)
+                    self._stats.evictions += 1
+                    continue
+                conn = candidate
+                break
+            if conn is not None:
+                self._stats.hits += 1
+            else:
+                self._stats.misses += 1
+        for candidate in stale:
+            candidate.close()
+        if conn is not None:
+            return conn, True
+        return self._new_connection(key, timeout), False
+
+    def _new_connection(
+        self, key: _PoolKey, timeout: Optional[float]
+    ) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            return http.client.HTTPSConnection(
+                host, port, timeout=timeout, context=self._ssl_context
+            )
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _release(self, key: _PoolKey, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            conns = self._idle.setdefault(key, [])
+            if len(conns) < self.max_size:
+                conns.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+
+def _uses_proxy(scheme: str, host: str) -> bool:
+    proxies = urllib.request.getproxies()
+    return scheme in proxies and not urllib.request.proxy_bypass(host)
+
+
+_default_pool: Optional[ConnectionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def default_pool() -> ConnectionPool:
+    """Return the process-wide pool shared by clients created without one."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool()
+        return _default_pool
+
+
+# ----------------------------------------------------------------------
+# asyncio transport
+# ----------------------------------------------------------------------
+
+
+async def _wait(aw, timeout: Optional[float]):
+    if timeout is None:
+        return await aw
+    return await asyncio.wait_for(aw, timeout)
+
+
+class _AsyncConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def is_dropped(self) -> bool:
+        return self.reader.at_eof() or self.writer.is_closing()
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class AsyncPooledResponse:
+    """Asyncio response that returns its connection to the pool once drained.
+
+    Use ``await response.read()`` for the whole body or ``async for line in
+    response`` to stream it line by line. gzip and deflate bodies are decoded
+    transparently; ``transfer`` counts the bytes.
+    """
+
+    def __init__(
+        self,
+        pool: "AsyncConnectionPool",
+        key: _PoolKey,
+        conn: _AsyncConnection,
+        status: int,
+        reason: str,
+        headers: http.client.HTTPMessage,
+        will_close: bool,
+        length: Optional[int],
+        chunked: bool,
+        timeout: Optional[float],
+        transfer: Optional[TransferStats] = None,
+    ):
+        self._pool = pool
+        self._key = key
+        self._conn: Optional[_AsyncConnection] = conn
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self._will_close = will_close
+        self._remaining = length
+        self._chunked = chunked
+        self._chunk_left = 0
+        self._timeout = timeout
+        self._done = False
+        self.transfer = TransferStats("") if transfer is None else transfer
+        self._inflater = _inflater(headers)
+        self._decoding = self._inflater is not None
+
+    async def _read_piece(self) -> bytes:
+        """Return the next piece of the body, or b"" once it is exhausted."""
+        if self._done or self._conn is None:
+            return b""
+        reader = self._conn.reader
+        if self._chunked:
+            if self._chunk_left == 0:
+                size_line = await _wait(reader.readline(), self._timeout)
+                size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+                if size == 0:
+                    while (await _wait(reader.readline(), self._timeout)).strip():
+                        pass  # discard trailers
+                    return self._finish()
+                self._chunk_left = size
+            data = await _wait(reader.read(min(_READ_SIZE, self._chunk_left)), self._timeout)
+            if not data:
+                raise http.client.IncompleteRead(b"")
+            self._chunk_left -= len(data)
+            if self._chunk_left == 0:
+                await _wait(reader.readexactly(2), self._timeout)
+            return data
+        if self._remaining is not None:
+            if self._remaining == 0:
+                return self._finish()
+            data = await _wait(reader.read(min(_READ_SIZE, self._remaining)), self._timeout)
+            if not data:
+                raise http.client.IncompleteRead(b"", self._remaining)
+            self._remaining -= len(data)
+            return data
+        data = await _wait(reader.read(_READ_SIZE), self._timeout)
+        if not data:
+            return self._finish()
+        return data
+
+    def _finish(self) -> bytes:
+        self._done = True
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            if self._will_close:
+                conn.close()
+            else:
+                self._pool._release(self._key, conn)
+        return b""
+
+    async def _read_decoded(self) -> bytes:
+        """Return the next piece of the decoded body, or b"" at the end."""
+        while True:
+            piece = await self._read_piece()
+            self.transfer.response_wire_bytes += len(piece)
+            if not self._decoding:
+                data = piece
+            elif self._inflater is None:
+                data = b""
+            elif piece:
+                data = self._inflater.decompress(piece)
+                if not data:
+                    continue  # wait for enough input to decode something
+            else:
+                data, self._inflater = self._inflater.flush(), None
+            self.transfer.response_bytes += len(data)
+            return data
+
+    async def read(self) -> bytes:
+        parts = []
+        while True:
+            piece = await self._read_decoded()
+            if not piece:
+                return b"".join(parts)
+            parts.append(piece)
+
+    async def _iter_lines(self) -> AsyncIterator[bytes]:
+        buffer = b""
+        while True:
+            piece = await self._read_decoded()
+            if not piece:
+                break
+            buffer += piece
+            while True:
+                newline = buffer.find(b"\n")
+                if newline < 0:
+                    break
+                yield buffer[: newline + 1]
+                buffer = buffer[newline + 1 :]
+        if buffer:
+            yield buffer
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self._iter_lines()
+
+    async def aclose(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            # The body was not fully read, so the connection can't be reused.
+            conn.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+        return False
+
+
+class AsyncConnectionPool:
+    """Keep-alive connection pool for asyncio, keyed by event loop and host.
+
+    Connections belong to the event loop that opened them, so one pool can be
+    shared safely by code that calls ``asyncio.run`` more than once. Proxies
+    from the environment are not applied on this path.
+
+    Args:
+        max_size (int): Maximum number of idle connections kept per host.
+        idle_timeout (float): Seconds an idle connection may sit in the pool
+            before it is evicted instead of reused.
+    """
+
+    def __init__(self, max_size: int = 10, idle_timeout: float = 30.0):
+        if max_size < 0:
+            raise ValueError("max_size must be non-negative")
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        # event loop -> {host key -> [(connection, released_at)]}
+        self._idle: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._stats = PoolStats()
+        self._ssl_context: Optional[ssl.SSLContext] = None
+
+    def stats(self) -> PoolStats:
+        """Return a snapshot of the hit/miss/eviction counters."""
+        return PoolStats(
+            hits=self._stats.hits,
+            misses=self._stats.misses,
+            evictions=self._stats.evictions,
+            idle=sum(
+                len(conns)
+                for per_loop in self._idle.values()
+                for conns in per_loop.values()
+            ),
+        )
+
+    async def aclose(self) -> None:
+        """Close every idle connection owned by the running event loop."""
+        per_loop = self._idle.pop(asyncio.get_running_loop(), {})
+        for conns in per_loop.values():
+            for conn, _ in conns:
+                conn.close()
+
+    async def urlopen(
+        self,
+        req: urllib.request.Request,
+        timeout: Optional[float] = None,
+        compression: Optional[Compression] = None,
+    ) -> AsyncPooledResponse:
+        """Send ``req`` and return once the response headers have arrived.
+
+        Raises ``urllib.error.HTTPError`` for 4xx/5xx responses and
+        ``urllib.error.URLError`` when the connection cannot be made.
+        """
+        parts = urllib.parse.urlsplit(req.full_url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise urllib.error.URLError(f"unsupported URL scheme: {scheme}")
+        host = parts.hostname or ""
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, host, port)
+        data, headers, transfer = _prepare_request(req, compression)
+        head = self._encode_head(req, parts.netloc, data, headers)
+
+        conn, reused = self._acquire(key)
+        transfer.connect_seconds = 0.0
+        if conn is None:
+            conn = await self._connect(key, timeout, transfer)
+        try:
+            response = await self._send(key, conn, head, req, data, transfer, timeout)
+        except _STALE_CONNECTION_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            conn = await self._connect(key, timeout, transfer)
+            response = await self._send(key, conn, head, req, data, transfer, timeout)
+
+        if response.status >= 400:
+            body = await response.read()
+            await response.aclose()
+            raise urllib.error.HTTPError(
+                req.full_url, response.status, response.reason, response.headers,
+                BytesIO(body),
+            )
+        return response
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _encode_head(
+        req: urllib.request.Request,
+        netloc: str,
+        data: Optional[bytes],
+        headers: Dict[str, str],
+    ) -> bytes:
+        lines = [f"{req.get_method()} {req.selector} HTTP/1.1", f"Host: {netloc}"]
+        if not any(name.lower() == "accept-encoding" for name in headers):
+            headers["Accept-Encoding"] = "identity"
+        if data is not None:
+            headers["Content-Length"] = str(len(data))
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send(
+        self,
+        key: _PoolKey,
+        conn: _AsyncConnection,
+        head: bytes,
+        req: urllib.request.Request,
+        data: Optional[bytes],
+        transfer: TransferStats,
+        timeout: Optional[float],
+    ) -> AsyncPooledResponse:
+        start = time.perf_counter()
+        try:
+            conn.writer.write(head)
+            if data is not None:
+                conn.writer.write(data)
+            await _wait(conn.writer.drain(), timeout)
+            sent = time.perf_counter()
+
+            while True:
+                status_line = await _wait(conn.reader.readline(), timeout)
+                if not status_line:
+                    raise http.client.RemoteDisconnected(
+                        "Remote end closed connection without response"
+                    )
+                version, status, reason = _parse_status_line(status_line)
+                header_lines = []
+                while True:
+                    line = await _wait(conn.reader.readline(), timeout)
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    header_lines.append(line)
+                if status != 100:
+                    break
+        except BaseException:
+            conn.close()
+            raise
+        transfer.upload_seconds = sent - start
+        transfer.ttfb_seconds = time.perf_counter() - sent
+
+        headers = email.parser.Parser(_class=http.client.HTTPMessage).parsestr(
+            b"".join(header_lines).decode("iso-8859-1")
+        )
+        connection = (headers.get("Connection") or "").lower()
+        will_close = "close" in connection or (
+            version == "HTTP/1.0" and "keep-alive" not in connection
+        )
+        chunked = "chunked" in (headers.get("Transfer-Encoding") or "").lower()
+        length: Optional[int] = None
+        if req.get_method() == "HEAD" or status in (204, 304):
+            length = 0
+        elif not chunked and headers.get("Content-Length") is not None:
+            length = int(headers["Content-Length"])
+        elif not chunked:
+            will_close = True  # body runs until the server closes the socket
+        return AsyncPooledResponse(
+            self, key, conn, status, reason, headers, will_close, length, chunked,
+            timeout, transfer,
+        )
+
+    def _acquire(self, key: _PoolKey) -> Tuple[Optional[_AsyncConnection], bool]:
+        now = time.monotonic()
+        per_loop = self._idle.get(asyncio.get_running_loop(), {})
+        conns = per_loop.get(key, [])
+        while conns:
+            conn, released_at = conns.pop()
+            if now - released_at > self.idle_timeout or conn.is_dropped():
+                conn.close()
+                self._stats.evictions += 1
+                continue
+            self._stats.hits += 1
+            return conn, True
+        self._stats.misses += 1
+        return None, False
+
+    async def _connect(
+        self, key: _PoolKey, timeout: Optional[float], transfer: TransferStats
+    ) -> _AsyncConnection:
+        start = time.perf_counter()
+        scheme, host, port = key
+        ssl_context = None
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            ssl_context = self._ssl_context
+        try:
+            reader, writer = await _wait(
+                asyncio.open_connection(host, port, ssl=ssl_context), timeout
+            )
+        except OSError as exc:
+            raise urllib.error.URLError(exc) from exc
+        transfer.connect_seconds = time.perf_counter() - start
+        return _AsyncConnection(reader, writer)
+
+    def _release(self, key: _PoolKey, conn: _AsyncConnection) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            conn.close()
+            return
+        conns = self._idle.setdefault(loop, {}).setdefault(key, [])
+        if len(conns) < self.max_size:
+            conns.append((conn, time.monotonic()))
+        else:
+            conn.close()
+
+
+def _parse_status_line(line: bytes) -> Tuple[str, int, str]:
+    try:
+        version, rest = line.decode("iso-8859-1").rstrip("\r\n").split(" ", 1)
+        status, _, reason = rest.partition(" ")
+        return version, int(status), reason
+    except ValueError as exc:
+        raise http.client.BadStatusLine(line.decode("iso-8859-1", "replace")) from exc
+
+
+_default_async_pool: Optional[AsyncConnectionPool] = None
+
+
+def default_async_pool() -> AsyncConnectionPool:
+    """Return the process-wide pool shared by async clients created without one."""
+    global _default_async_pool
+    with _default_pool_lock:
+        if _default_async_pool is None:
+            _default_async_pool = AsyncConnectionPool()
+        return _default_async_pool
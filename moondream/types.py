@@ -1,7 +1,28 @@
+import concurrent.futures
+import os
 from abc import ABC, abstractmethod
 from PIL import Image
 from dataclasses import dataclass
-from typing import Generator, List, TypedDict, Union, Optional, Literal
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Mapping,
+    Tuple,
+    TypedDict,
+    Union,
+    Optional,
+    Literal,
+)
+
+from .batch import run_batch
+
+if TYPE_CHECKING:
+    from .masks import ParsedPath, PathPiece
 
 
 @dataclass
@@ -14,6 +35,42 @@ class Base64EncodedImage(EncodedImage):
     image_url: str
 
 
+# Leading bytes of the compressed formats the API accepts as-is.
+_IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+)
+
+
+def _sniff_mime_type(data: bytes) -> Optional[str]:
+    for signature, mime_type in _IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+@dataclass
+class BytesEncodedImage(EncodedImage):
+    """An already-compressed JPEG, PNG or WebP file, sent without re-encoding."""
+
+    data: bytes
+    mime_type: str
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BytesEncodedImage":
+        mime_type = _sniff_mime_type(data)
+        if mime_type is None:
+            raise ValueError("Image bytes are not a JPEG, PNG or WebP file.")
+        return cls(data=bytes(data), mime_type=mime_type)
+
+    @classmethod
+    def from_file(cls, path: Union[str, "os.PathLike[str]"]) -> "BytesEncodedImage":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
 SamplingSettings = TypedDict(
     "SamplingSettings",
     {
@@ -29,6 +86,10 @@ CaptionOutput = TypedDict(
     "CaptionOutput", {"caption": Union[str, Generator[str, None, None]]}
 )
 
+AsyncCaptionOutput = TypedDict(
+    "AsyncCaptionOutput", {"caption": Union[str, AsyncIterator[str]]}
+)
+
 ReasoningGrounding = TypedDict(
     "ReasoningGrounding",
     {
@@ -55,6 +116,15 @@ QueryOutput = TypedDict(
     total=False
 )
 
+AsyncQueryOutput = TypedDict(
+    "AsyncQueryOutput",
+    {
+        "answer": Union[str, AsyncIterator[str]],
+        "reasoning": Optional[Reasoning]
+    },
+    total=False
+)
+
 Region = TypedDict(
     "Region", {"x_min": float, "y_min": float, "x_max": float, "y_max": float}
 )
@@ -63,6 +133,21 @@ DetectOutput = TypedDict("DetectOutput", {"objects": List[Region]})
 Point = TypedDict("Point", {"x": float, "y": float})
 PointOutput = TypedDict("PointOutput", {"points": List[Point]})
 
+# Result of CloudVL.analyze. Answers, objects and points are keyed by the
+# question or object name; sub-requests that failed appear only in "errors",
+# keyed by labels such as "query:<question>" or "detect:<object>".
+AnalyzeOutput = TypedDict(
+    "AnalyzeOutput",
+    {
+        "caption": str,
+        "answers": Dict[str, str],
+        "objects": Dict[str, List[Region]],
+        "points": Dict[str, List[Point]],
+        "errors": Dict[str, Exception],
+    },
+    total=False,
+)
+
 SpatialRef = List[float]  # [x, y] point or [x1, y1, x2, y2] bbox, normalized to [0, 1]
 
 SegmentOutput = TypedDict(
@@ -82,11 +167,16 @@ SegmentStreamChunk = TypedDict(
         "chunk": Optional[str],  # Coarse path chunk (path_delta messages)
         "path": Optional[str],  # Final refined path (final message only)
         "completed": Optional[bool],  # True in final message
+        # With geometry=True (cloud clients): path commands completed by this
+        # chunk, and the final path parsed.
+        "commands": List["PathPiece"],
+        "geometry": "ParsedPath",
     },
     total=False,
 )
 
 SegmentStreamOutput = Generator[SegmentStreamChunk, None, None]
+AsyncSegmentStreamOutput = AsyncIterator[SegmentStreamChunk]
 
 PointGroundTruth = TypedDict(
     "PointGroundTruth",
@@ -253,7 +343,13 @@ SFTGroup = TypedDict(
 )
 
 
+BatchResult = Tuple[int, Union[dict, Exception]]
+
+
 class VLM(ABC):
+    # Default number of in-flight calls for map() and the batch_* helpers.
+    default_max_concurrency = 8
+
     @abstractmethod
     def encode_image(self, image: Union[Image.Image, EncodedImage]) -> EncodedImage:
         """
@@ -398,3 +494,179 @@ class VLM(ABC):
                 - {"chunk": str} - coarse path chunks
                 - {"path": str, "bbox": Region, "completed": True} - final refined path
         """
+
+    def batch_submitter(
+        self, max_concurrency: int
+    ) -> Tuple[Callable[[str, dict], concurrent.futures.Future], Callable[[], None]]:
+        """Return ``(submit, close)`` for scheduling many calls concurrently.
+
+        ``submit(skill, kwargs)`` starts one call and returns a future for its
+        output; ``close()`` cancels calls that have not started. map() and
+        FramePipeline use this, and backends override it to schedule calls
+        their own way. The default runs calls on a thread pool of
+        ``max_concurrency`` workers.
+        """
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency)
+
+        def submit(skill: str, kwargs: dict) -> concurrent.futures.Future:
+            return executor.submit(getattr(self, skill), **kwargs)
+
+        def close() -> None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return submit, close
+
+    def map(
+        self,
+        skill: str,
+        inputs: Iterable[Mapping],
+        *,
+        max_concurrency: Optional[int] = None,
+        ordered: bool = True,
+    ) -> Generator[BatchResult, None, None]:
+        """
+        Run one skill over many inputs with bounded concurrency.
+
+        Args:
+            skill (str): One of "caption", "query", "detect", "point" or "segment".
+            inputs (Iterable[Mapping]): Keyword arguments for each call, e.g.
+                {"image": image, "question": "..."}. Streaming is not supported.
+            max_concurrency (Optional[int]): Maximum calls in flight. Defaults to
+                the backend's default_max_concurrency.
+            ordered (bool): If True, yield results in input order; otherwise yield
+                them as they complete. Defaults to True.
+
+        Returns:
+            A generator of (index, result) tuples, where result is the skill output
+            or the exception raised for that input. One failed input does not stop
+            the others.
+        """
+        if max_concurrency is None:
+            max_concurrency = self.default_max_concurrency
+        submit, close = self.batch_submitter(max_concurrency)
+        try:
+            yield from run_batch(
+                submit,
+                skill,
+                inputs,
+                max_concurrency=max_concurrency,
+                ordered=ordered,
+            )
+        finally:
+            close()
+
+    def _batch(self, skill: str, images, max_concurrency, **kwargs) -> list:
+        inputs = ({"image": image, **kwargs} for image in images)
+        return [
+            result
+            for _, result in self.map(skill, inputs, max_concurrency=max_concurrency)
+        ]
+
+    def batch_caption(
+        self,
+        images: Iterable[Union[Image.Image, EncodedImage]],
+        *,
+        max_concurrency: Optional[int] = None,
+        **kwargs,
+    ) -> List[Union[CaptionOutput, Exception]]:
+        """Caption each image; see map(). Results (or exceptions) are in input order."""
+        return self._batch("caption", images, max_concurrency, **kwargs)
+
+    def batch_query(
+        self,
+        images: Iterable[Union[Image.Image, EncodedImage]],
+        question: str,
+        *,
+        max_concurrency: Optional[int] = None,
+        **kwargs,
+    ) -> List[Union[QueryOutput, Exception]]:
+        """Ask the same question about each image; see map()."""
+        return self._batch(
+            "query", images, max_concurrency, question=question, **kwargs
+        )
+
+    def batch_detect(
+        self,
+        images: Iterable[Union[Image.Image, EncodedImage]],
+        object: str,
+        *,
+        max_concurrency: Optional[int] = None,
+        **kwargs,
+    ) -> List[Union[DetectOutput, Exception]]:
+        """Detect the same object in each image; see map()."""
+        return self._batch("detect", images, max_concurrency, object=object, **kwargs)
+
+    def batch_point(
+        self,
+        images: Iterable[Union[Image.Image, EncodedImage]],
+        object: str,
+        *,
+        max_concurrency: Optional[int] = None,
+        **kwargs,
+    ) -> List[Union[PointOutput, Exception]]:
+        """Point at the same object in each image; see map()."""
+        return self._batch("point", images, max_concurrency, object=object, **kwargs)
+
+
+class AsyncVLM(ABC):
+    """Asyncio counterpart of VLM.
+
+    Each skill is a coroutine with the same arguments and outputs as the
+    matching VLM method. With stream=True the text fields (or, for segment,
+    the return value itself) are async iterators instead of generators.
+    """
+
+    # Default number of in-flight sub-requests for analyze(), as on VLM.
+    default_max_concurrency = 8
+
+    @abstractmethod
+    def encode_image(self, image: Union[Image.Image, EncodedImage]) -> EncodedImage:
+        """Encode the image for reuse across calls. See VLM.encode_image."""
+
+    @abstractmethod
+    async def caption(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        length: Literal["normal", "short"] = "normal",
+        stream: bool = False,
+        settings: Optional[SamplingSettings] = None,
+    ) -> AsyncCaptionOutput:
+        """Generate a caption for the input image. See VLM.caption."""
+
+    @abstractmethod
+    async def query(
+        self,
+        image: Optional[Union[Image.Image, EncodedImage]] = None,
+        question: Optional[str] = None,
+        stream: bool = False,
+        settings: Optional[SamplingSettings] = None,
+        reasoning: bool = False,
+    ) -> AsyncQueryOutput:
+        """Answer a question about the input image. See VLM.query."""
+
+    @abstractmethod
+    async def detect(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        object: str,
+    ) -> DetectOutput:
+        """Detect the specified object in the input image. See VLM.detect."""
+
+    @abstractmethod
+    async def point(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        object: str,
+    ) -> PointOutput:
+        """Point out instances of the given object. See VLM.point."""
+
+    @abstractmethod
+    async def segment(
+        self,
+        image: Union[Image.Image, EncodedImage],
+        object: str,
+        spatial_refs: Optional[List[SpatialRef]] = None,
+        stream: bool = False,
+        settings: Optional[SamplingSettings] = None,
+    ) -> Union[SegmentOutput, AsyncSegmentStreamOutput]:
+        """Segment an object from the image. See VLM.segment."""
@@ -0,0 +1,228 @@
+"""Run a skill over a stream of video frames, skipping near-duplicate frames.
+
+``FramePipeline`` compares a small grayscale thumbnail of each frame with the
+last frame it sent for inference. Frames that barely changed reuse that
+frame's result instead of making a call. At most ``max_in_flight`` calls run
+at once; when they are all busy, new frames are dropped rather than queued, so
+results never fall further behind the camera than one call's latency.
+"""
+
+import collections
+import concurrent.futures
+from dataclasses import dataclass
+from typing import Any, Deque, Iterable, Iterator, Optional, Union
+
+from PIL import Image, ImageChops, ImageStat
+
+from .batch import SKILLS
+from .types import VLM
+
+
+@dataclass
+class FrameResult:
+    """The result for one frame.
+
+    Attributes:
+        index: Position of the frame in the input stream.
+        frame: The frame itself.
+        result: The skill output, or the exception the call raised.
+        reused: True if the frame was close enough to an earlier one that
+            its result was reused instead of running inference.
+        source: Index of the frame whose call produced ``result``.
+        difference: Mean absolute thumbnail difference, in [0, 1], from the
+            last frame processed before this one. 1.0 for the first frame.
+    """
+
+    index: int
+    frame: Image.Image
+    result: Union[dict, Exception]
+    reused: bool
+    source: int
+    difference: float
+
+
+@dataclass
+class FrameStats:
+    """Counters for a FramePipeline. ``frames = processed + skipped + dropped``."""
+
+    frames: int = 0
+    processed: int = 0
+    skipped: int = 0
+    dropped: int = 0
+    errors: int = 0
+    in_flight: int = 0
+
+
+@dataclass
+class _Pending:
+    index: int
+    frame: Image.Image
+    future: concurrent.futures.Future
+    source: int
+    difference: float
+
+
+def _as_image(frame: Any) -> Image.Image:
+    if isinstance(frame, Image.Image):
+        return frame
+    # Arrays from OpenCV, imageio and friends.
+    return Image.fromarray(frame)
+
+
+class FramePipeline:
+    """Run ``skill`` on a frame iterator with redundant-frame skipping.
+
+    Args:
+        model (VLM): Any synchronous client.
+        skill (str): "caption", "query", "detect", "point" or "segment".
+        threshold (float): Frames whose mean absolute difference from the last
+            processed frame is below this (on a 0-1 scale, measured on a
+            ``thumbnail_size`` grayscale thumbnail) reuse its result. 0
+            disables skipping.
+        max_in_flight (Optional[int]): Calls running at once. Defaults to the
+            model's default_max_concurrency.
+        drop_stale (bool): When every call slot is busy, drop frames that need
+            inference. If False, wait for a slot instead, which lets results
+            fall behind a live source.
+        thumbnail_size (int): Side of the comparison thumbnail in pixels.
+        **params: Skill arguments, e.g. ``object="person"`` or ``question=...``.
+
+    Results come out in frame order. Dropped frames produce no result; the
+    gaps show in ``FrameResult.index`` and ``stats().dropped``.
+    """
+
+    def __init__(
+        self,
+        model: VLM,
+        skill: str,
+        *,
+        threshold: float = 0.02,
+        max_in_flight: Optional[int] = None,
+        drop_stale: bool = True,
+        thumbnail_size: int = 32,
+        **params,
+    ):
+        if skill not in SKILLS:
+            raise ValueError(f"Unknown skill {skill!r}; expected one of {SKILLS}")
+        if params.get("stream"):
+            raise ValueError("stream=True is not supported for frame pipelines")
+        if max_in_flight is None:
+            max_in_flight = model.default_max_concurrency
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        if not 0 <= threshold <= 1:
+            raise ValueError("threshold must be between 0 and 1")
+        self.model = model
+        self.skill = skill
+        self.threshold = threshold
+        self.max_in_flight = max_in_flight
+        self.drop_stale = drop_stale
+        self.thumbnail_size = thumbnail_size
+        self.params = params
+        self._stats = FrameStats()
+
+    def stats(self) -> FrameStats:
+        return FrameStats(**vars(self._stats))
+
+    def _thumbnail(self, frame: Image.Image) -> Image.Image:
+        size = (self.thumbnail_size, self.thumbnail_size)
+        if frame.mode in ("1", "P"):
+            # These modes only resize with NEAREST, which aliases badly.
+            frame = frame.convert("L")
+        # Downscale in the frame's own mode so only the thumbnail is converted.
+        return frame.resize(
+            size, Image.Resampling.BILINEAR, reducing_gap=2.0
+        ).convert("L")
+
+    def _difference(self, thumbnail: Image.Image, reference: Image.Image) -> float:
+        diff = ImageChops.difference(thumbnail, reference)
+        return ImageStat.Stat(diff).mean[0] / 255.0
+
+    def run(self, frames: Iterable[Any]) -> Iterator[FrameResult]:
+        """Yield a FrameResult per processed or skipped frame, in frame order.
+
+        Closing the generator cancels calls that have not started.
+        """
+        submit, close = self.model.batch_submitter(self.max_in_flight)
+        stats = self._stats
+        in_flight: set = set()
+        pending: Deque[_Pending] = collections.deque()
+        reference: Optional[Image.Image] = None
+        reference_index = -1
+        reference_future: Optional[concurrent.futures.Future] = None
+
+        def finished() -> None:
+            for future in [f for f in in_flight if f.done()]:
+                in_flight.remove(future)
+            stats.in_flight = len(in_flight)
+
+        def ready() -> Iterator[FrameResult]:
+            while pending and pending[0].future.done():
+                item = pending.popleft()
+                reused = item.source != item.index
+                try:
+                    result: Union[dict, Exception] = item.future.result()
+                except Exception as exc:
+                    result = exc
+                    if not reused:
+                        stats.errors += 1
+                yield FrameResult(
+                    item.index, item.frame, result, reused, item.source, item.difference
+                )
+
+        try:
+            for index, frame in enumerate(frames):
+                frame = _as_image(frame)
+                stats.frames += 1
+                thumbnail = self._thumbnail(frame)
+                difference = (
+                    1.0 if reference is None else self._difference(thumbnail, reference)
+                )
+                finished()
+                if (
+                    reference_future is not None
+                    and reference_future.done()
+                    and reference_future.exception() is not None
+                ):
+                    # Don't spread a failed call to later frames; retry on
+                    # this one instead.
+                    reference_future = None
+                if reference_future is not None and difference < self.threshold:
+                    stats.skipped += 1
+                    pending.append(
+                        _Pending(index, frame, reference_future, reference_index, difference)
+                    )
+                else:
+                    if len(in_flight) >= self.max_in_flight:
+                        if self.drop_stale:
+                            stats.dropped += 1
+                            yield from ready()
+                            continue
+                        concurrent.futures.wait(
+                            in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+                        )
+                        finished()
+                    try:
+                        future = submit(self.skill, {"image": frame, **self.params})
+                    except Exception as exc:
+                        future = concurrent.futures.Future()
+                        future.set_exception(exc)
+                    stats.processed += 1
+                    in_flight.add(future)
+                    stats.in_flight = len(in_flight)
+                    reference, reference_index, reference_future = (
+                        thumbnail,
+                        index,
+                        future,
+                    )
+                    pending.append(_Pending(index, frame, future, index, difference))
+                yield from ready()
+
+            while pending:
+                concurrent.futures.wait([pending[0].future])
+                yield from ready()
+            finished()
+        finally:
+            for future in in_flight:
+                future.cancel()
+            close()
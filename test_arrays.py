@@ -0,0 +1,112 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from moondream.arrays import DetectColumns, DetectResult, PointColumns, PointResult
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+DETECT = {
+    "objects": [
+        {"x_min": 0.1, "y_min": 0.2, "x_max": 0.3, "y_max": 0.4},
+        {"x_min": 0.5, "y_min": 0.5, "x_max": 1.0, "y_max": 1.0},
+    ]
+}
+POINT = {"points": [{"x": 0.25, "y": 0.75}]}
+
+
+class ResultTests(unittest.TestCase):
+    def test_detect_round_trip(self):
+        result = DetectResult.from_output(DETECT)
+        self.assertEqual(result.boxes.dtype, np.float32)
+        self.assertEqual(result.boxes.shape, (2, 4))
+        self.assertEqual(len(result), 2)
+        restored = result.to_output()["objects"]
+        for region, expected in zip(restored, DETECT["objects"]):
+            for key, value in expected.items():
+                self.assertAlmostEqual(region[key], value, places=6)
+        self.assertEqual(DetectResult.from_output({"objects": []}).boxes.shape, (0, 4))
+        self.assertFalse(hasattr(result, "__dict__"))
+
+    def test_point_round_trip(self):
+        result = PointResult.from_output(POINT["points"])
+        np.testing.assert_array_equal(result.points, [[0.25, 0.75]])
+        self.assertEqual(result.to_output(), POINT)
+        self.assertEqual(PointResult.from_output({"points": []}).points.shape, (0, 2))
+
+    def test_to_pixels(self):
+        result = DetectResult.from_output(DETECT)
+        pixels = result.to_pixels(200, 100)
+        np.testing.assert_allclose(pixels.boxes[0], [20, 20, 60, 40], rtol=1e-6)
+        np.testing.assert_allclose(result.boxes[0], [0.1, 0.2, 0.3, 0.4], rtol=1e-6)
+
+        boxes = result.boxes
+        self.assertIs(result.to_pixels(200, 100, inplace=True), result)
+        self.assertIs(result.boxes, boxes)
+        np.testing.assert_allclose(boxes[1], [100, 50, 200, 100])
+
+        points = PointResult.from_output(POINT).to_pixels(8, 4)
+        np.testing.assert_array_equal(points.points, [[2, 3]])
+
+
+class ColumnsTests(unittest.TestCase):
+    def test_detect_columns(self):
+        columns = DetectColumns()
+        columns.add("a.jpg", DETECT)
+        columns.add("b.jpg", {"objects": []})
+        self.assertEqual(columns.boxes.shape, (2, 4))
+        columns.add("c.jpg", DetectResult.from_output(DETECT))
+        self.assertEqual(columns.keys, ["a.jpg", "b.jpg", "c.jpg"])
+        self.assertEqual(columns.boxes.shape, (4, 4))
+        self.assertEqual(len(columns), 4)
+        np.testing.assert_array_equal(columns.image_index, [0, 0, 2, 2])
+        np.testing.assert_array_equal(columns.counts, [2, 0, 2])
+
+    def test_columns_keep_their_own_copy(self):
+        columns = DetectColumns()
+        result = DetectResult.from_output(DETECT)
+        columns.add("a.jpg", result)
+        result.to_pixels(200, 100, inplace=True)
+        np.testing.assert_allclose(columns.boxes[0], [0.1, 0.2, 0.3, 0.4], rtol=1e-6)
+
+    def test_point_columns(self):
+        columns = PointColumns()
+        self.assertEqual(columns.points.shape, (0, 2))
+        columns.add(7, POINT)
+        np.testing.assert_array_equal(columns.points, [[0.25, 0.75]])
+        np.testing.assert_array_equal(columns.image_index, [0])
+
+    def test_arrow_export_needs_pyarrow(self):
+        columns = DetectColumns()
+        columns.add("a.jpg", DETECT)
+        with mock.patch.dict(sys.modules, {"pyarrow": None}):
+            with self.assertRaisesRegex(ImportError, "pip install pyarrow"):
+                columns.to_arrow()
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_arrow_and_parquet_export(self):
+        import pyarrow.parquet as pq
+
+        columns = DetectColumns()
+        columns.add("a.jpg", DETECT)
+        columns.add("b.jpg", {"objects": []})
+        table = columns.to_arrow()
+        self.assertEqual(table.column_names, ["key", "x_min", "y_min", "x_max", "y_max"])
+        self.assertEqual(table.column("key").to_pylist(), ["a.jpg", "a.jpg"])
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "boxes.parquet")
+        columns.to_parquet(path)
+        self.assertEqual(pq.read_table(path).num_rows, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
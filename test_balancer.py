@@ -0,0 +1,109 @@
+import random
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+from moondream import balancer
+from moondream.balancer import EndpointBalancer
+
+
+def _error(code):
+    return urllib.error.HTTPError("http://a.test", code, "", {}, None)
+
+
+class EndpointBalancerTests(unittest.TestCase):
+    def setUp(self):
+        self.now = [100.0]
+        patcher = mock.patch.object(balancer.time, "monotonic", lambda: self.now[0])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_least_outstanding_spreads_requests(self):
+        lb = EndpointBalancer(["http://a", "http://b", "http://c"], strategy="least_outstanding")
+        leases = [lb.acquire() for _ in range(6)]
+        self.assertEqual([s.outstanding for s in lb.stats()], [2, 2, 2])
+        for lease in leases[:2]:
+            lease.release()
+        self.assertEqual(lb.acquire().endpoint, leases[0].endpoint)
+
+    def test_p2c_prefers_the_less_loaded_of_two(self):
+        lb = EndpointBalancer(["http://a", "http://b", "http://c"])
+        # Unlucky draws can keep skipping the least loaded endpoint for a while.
+        with mock.patch.object(balancer.random, "sample", random.Random(0).sample):
+            busy = [lb.acquire() for _ in range(3)]
+            busy.extend(lb.acquire() for _ in range(20))
+        outstanding = [s.outstanding for s in lb.stats()]
+        self.assertLessEqual(max(outstanding) - min(outstanding), 2)
+
+    def test_failures_eject_until_ejection_time_passes(self):
+        lb = EndpointBalancer(["http://a", "http://b"], max_failures=2, ejection_time=10)
+        for exc in (_error(503), urllib.error.URLError("refused")):
+            lease = lb.acquire()
+            while lease.endpoint != "http://a":
+                lease.release()
+                lease = lb.acquire()
+            lease.release(exc)
+        a, b = lb.stats()
+        self.assertTrue(a.ejected)
+        self.assertEqual((a.failures, a.ejections), (2, 1))
+        self.assertEqual({lb.acquire().endpoint for _ in range(5)}, {"http://b"})
+
+        self.now[0] += 11
+        self.assertFalse(lb.stats()[0].ejected)
+        # Client errors say nothing about the endpoint.
+        lb._release(lb._endpoints[0], _error(400))
+        self.assertFalse(lb.stats()[0].ejected)
+        # One more failure after returning ejects it again.
+        lb._release(lb._endpoints[0], _error(502))
+        self.assertTrue(lb.stats()[0].ejected)
+
+    def test_slow_endpoints_are_ejected(self):
+        lb = EndpointBalancer(["http://a", "http://b"], slow_factor=3)
+        fast, slow = lb._endpoints
+        for _ in range(5):
+            lb._record_latency(fast, 0.1)
+            lb._record_latency(slow, 0.5)
+        self.assertEqual([s.ejected for s in lb.stats()], [False, True])
+        self.assertAlmostEqual(lb.stats()[0].latency, 0.1)
+
+    def test_latency_ejection_is_opt_in(self):
+        lb = EndpointBalancer(["http://a", "http://b"])
+        fast, slow = lb._endpoints
+        for _ in range(10):
+            lb._record_latency(fast, 0.1)
+            lb._record_latency(slow, 5.0)
+        self.assertEqual([s.ejected for s in lb.stats()], [False, False])
+
+    def test_all_ejected_still_routes(self):
+        lb = EndpointBalancer(["http://a"], max_failures=1)
+        lb.acquire().release(_error(500))
+        self.assertTrue(lb.stats()[0].ejected)
+        self.assertEqual(lb.acquire().endpoint, "http://a")
+
+    def test_route_rewrites_the_request_url(self):
+        lb = EndpointBalancer(["http://a/v1/", "http://b/v1"], strategy="least_outstanding")
+        req = urllib.request.Request(
+            "http://a/v1/detect", data=b"{}", headers={"X-Test": "1"}
+        )
+        lb.route(req)
+        routed, lease = lb.route(req)
+        self.assertEqual(lease.endpoint, "http://b/v1")
+        self.assertEqual(routed.full_url, "http://b/v1/detect")
+        self.assertEqual((routed.host, routed.data), ("b", b"{}"))
+        self.assertEqual(routed.get_header("X-test"), "1")
+        # The caller's request is left alone.
+        self.assertEqual(req.full_url, "http://a/v1/detect")
+        with self.assertRaises(ValueError):
+            lb.route(urllib.request.Request("http://c/v1/detect"))
+        self.assertEqual(sum(s.outstanding for s in lb.stats()), 2)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            EndpointBalancer([])
+        with self.assertRaises(ValueError):
+            EndpointBalancer(["http://a"], strategy="random")
+
+
+if __name__ == "__main__":
+    unittest.main()
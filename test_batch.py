@@ -0,0 +1,93 @@
+import threading
+import time
+import unittest
+
+from moondream.types import VLM
+
+
+class _FakeVLM(VLM):
+    def __init__(self, fail_on=(), delays=None):
+        self.fail_on = set(fail_on)
+        self.delays = delays or {}
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def _call(self, key, output):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delays.get(key, 0.01))
+            if key in self.fail_on:
+                raise RuntimeError(f"failed {key}")
+            return output
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def encode_image(self, image):
+        return image
+
+    def caption(self, image, length="normal", stream=False, settings=None):
+        return self._call(image, {"caption": f"caption {image}"})
+
+    def query(self, image=None, question=None, stream=False, settings=None, reasoning=False):
+        return self._call(image, {"answer": f"{question} {image}"})
+
+    def detect(self, image, object, settings=None):
+        return self._call(image, {"objects": [{"label": f"{object} {image}"}]})
+
+    def point(self, image, object, settings=None):
+        return self._call(image, {"points": []})
+
+    def segment(self, image, object, spatial_refs=None, stream=False, settings=None):
+        return self._call(image, {"path": "M0 0"})
+
+
+class BatchTests(unittest.TestCase):
+    def test_batch_query_keeps_input_order(self):
+        model = _FakeVLM(delays={0: 0.05})
+        results = model.batch_query(range(5), "what?", max_concurrency=3)
+        self.assertEqual([r["answer"] for r in results], [f"what? {i}" for i in range(5)])
+
+    def test_errors_are_isolated_per_item(self):
+        model = _FakeVLM(fail_on={2})
+        results = model.batch_detect(range(4), "car")
+
+        self.assertIsInstance(results[2], RuntimeError)
+        self.assertEqual(results[3], {"objects": [{"label": "car 3"}]})
+
+    def test_map_respects_concurrency_cap(self):
+        model = _FakeVLM()
+        inputs = [{"image": i} for i in range(12)]
+        results = list(model.map("caption", inputs, max_concurrency=3))
+
+        self.assertEqual(len(results), 12)
+        self.assertLessEqual(model.max_active, 3)
+
+    def test_map_unordered_yields_as_completed(self):
+        model = _FakeVLM(delays={0: 0.2})
+        inputs = [{"image": i, "object": "x"} for i in range(3)]
+        indices = [i for i, _ in model.map("point", inputs, ordered=False)]
+
+        self.assertEqual(sorted(indices), [0, 1, 2])
+        self.assertEqual(indices[-1], 0)
+
+    def test_map_rejects_unknown_skill(self):
+        model = _FakeVLM()
+        with self.assertRaises(ValueError):
+            list(model.map("describe", [{"image": 0}]))
+
+    def test_streaming_items_fail_alone(self):
+        model = _FakeVLM()
+        inputs = [{"image": 0}, {"image": 1, "stream": True}, {"image": 2}]
+        results = list(model.map("caption", inputs))
+        self.assertEqual([i for i, _ in results], [0, 1, 2])
+        self.assertIsInstance(results[1][1], ValueError)
+        self.assertNotIsInstance(results[0][1], Exception)
+        self.assertNotIsInstance(results[2][1], Exception)
+
+
+if __name__ == "__main__":
+    unittest.main()
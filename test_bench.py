@@ -0,0 +1,60 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from moondream import bench
+
+
+class BenchTests(unittest.TestCase):
+    def setUp(self):
+        # Keep proxy settings from the environment out of the way.
+        patcher = mock.patch("urllib.request.getproxies", return_value={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_every_scenario_runs_against_the_mock_server(self):
+        report = bench.run(requests=4, concurrency=2, warmup=1, image_size=32)
+        results = {result["scenario"]: result for result in report["results"]}
+        self.assertEqual(list(results), list(bench.SCENARIOS))
+        for result in results.values():
+            self.assertEqual(result["errors"], 0, result["scenario"])
+            self.assertGreater(result["throughput"], 0)
+            latency = result["latency"]
+            self.assertLessEqual(latency["p50"], latency["p95"])
+            self.assertLessEqual(latency["p95"], latency["p99"])
+        self.assertEqual(report["config"]["server"]["chunks"], 16)
+
+    def test_streams_and_multipart_uploads(self):
+        config = bench.MockConfig(chunks=3, chunk_bytes=2)
+        with bench.MockServer(config) as server:
+            client = bench.CloudVL(endpoint=server.endpoint, upload="multipart")
+            image = bench.Image.new("RGB", (8, 8))
+            chunks = list(client.caption(image, stream=True)["caption"])
+            updates = list(client.segment(image, "car", stream=True))
+        self.assertEqual(chunks, ["mo"] * 3)
+        self.assertEqual(updates[0], {"bbox": bench._box(0)})
+        self.assertTrue(updates[-1]["completed"])
+
+    def test_cli_writes_json_report(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "bench.json")
+        bench.main(["detect", "--requests", "2", "--warmup", "0", "--output", path])
+        with open(path) as f:
+            report = json.load(f)
+        self.assertEqual([r["scenario"] for r in report["results"]], ["detect"])
+
+        with self.assertRaises(SystemExit):
+            bench.main(["teleport"])
+
+    def test_percentile_uses_nearest_rank(self):
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual(bench._percentile(values, 0.5), 50.0)
+        self.assertEqual(bench._percentile(values, 0.99), 99.0)
+        self.assertEqual(bench._percentile([], 0.5), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
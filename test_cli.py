@@ -0,0 +1,191 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from moondream import cli
+from moondream.types import VLM, BytesEncodedImage
+
+
+class _RecordingVLM(VLM):
+    default_max_concurrency = 4
+
+    def __init__(self):
+        self.seen = []
+        self.lock = threading.Lock()
+
+    def encode_image(self, image):
+        return image
+
+    def detect(self, image, object, settings=None):
+        with self.lock:
+            self.seen.append(image)
+        if isinstance(image, Image.Image) and image.size == (3, 3):
+            raise RuntimeError("bad image")
+        return {"objects": [], "object": object}
+
+    def caption(self, image, length="normal", stream=False, settings=None):
+        return {"caption": length}
+
+    def query(self, image=None, question=None, stream=False, settings=None, reasoning=False):
+        return {"answer": question}
+
+    def point(self, image, object, settings=None):
+        return {"points": []}
+
+    def segment(self, image, object, spatial_refs=None, stream=False, settings=None):
+        return {"path": ""}
+
+
+def _read_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class BatchCLITests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.images = os.path.join(self.root, "images")
+        os.makedirs(os.path.join(self.images, "nested"))
+        for name in ("a.png", "b.jpg", "nested/c.png"):
+            Image.new("RGB", (8, 8)).save(os.path.join(self.images, name))
+        Image.new("RGB", (3, 3)).save(os.path.join(self.images, "d.bmp"))
+        with open(os.path.join(self.images, "notes.txt"), "w") as f:
+            f.write("not an image")
+        self.output = os.path.join(self.root, "out.jsonl")
+
+    def _run(self, model, source=None, **kwargs):
+        return cli.run_batch_job(
+            model, "detect", {"object": "car"}, source or self.images, self.output, **kwargs
+        )
+
+    def test_directory_run_writes_one_line_per_image(self):
+        model = _RecordingVLM()
+        progress = io.StringIO()
+        job = self._run(model, progress=progress)
+
+        lines = {os.path.relpath(r["input"], self.images): r for r in _read_lines(self.output)}
+        self.assertEqual(set(lines), {"a.png", "b.jpg", "d.bmp", os.path.join("nested", "c.png")})
+        self.assertEqual(lines["a.png"]["result"], {"objects": [], "object": "car"})
+        self.assertEqual(lines["d.bmp"]["error"], "RuntimeError: bad image")
+        self.assertEqual((job.total, job.done, job.errors), (4, 4, 1))
+        self.assertIn("4/4 done, 1 errors", progress.getvalue())
+        # Formats the API accepts are passed through as file bytes.
+        self.assertEqual(
+            sum(isinstance(image, BytesEncodedImage) for image in model.seen), 3
+        )
+        with open(f"{self.output}.job") as f:
+            self.assertTrue(json.load(f)["finished"])
+
+    def test_resume_skips_finished_images(self):
+        self._run(_RecordingVLM())
+        lines = _read_lines(self.output)
+        # Simulate a crash: lose the last two results, one of them half written.
+        with open(self.output, "w") as f:
+            for record in lines[:2]:
+                f.write(json.dumps(record) + "\n")
+            f.write('{"input": "trunc')
+
+        model = _RecordingVLM()
+        job = self._run(model)
+        self.assertEqual(len(model.seen), 2)
+        self.assertEqual(job.done, 4)
+        self.assertEqual(
+            sorted(r["input"] for r in _read_lines(self.output)),
+            sorted(r["input"] for r in lines),
+        )
+
+        # Failed images rerun only when asked.
+        model = _RecordingVLM()
+        self._run(model)
+        self.assertEqual(model.seen, [])
+        self._run(model, retry_errors=True)
+        self.assertEqual(len(model.seen), 1)
+
+    def test_changed_settings_need_restart(self):
+        self._run(_RecordingVLM())
+        with self.assertRaisesRegex(ValueError, "--restart"):
+            cli.run_batch_job(
+                _RecordingVLM(), "detect", {"object": "bus"}, self.images, self.output
+            )
+        model = _RecordingVLM()
+        cli.run_batch_job(
+            model, "detect", {"object": "bus"}, self.images, self.output, restart=True
+        )
+        self.assertEqual(len(model.seen), 4)
+        self.assertEqual(len(_read_lines(self.output)), 4)
+
+    def test_changed_backend_needs_restart(self):
+        cloud = {"local": False, "model": "moondream3-preview"}
+        self._run(_RecordingVLM(), backend=cloud)
+        with self.assertRaisesRegex(ValueError, "different settings"):
+            self._run(_RecordingVLM(), backend={**cloud, "model": "moondream2"})
+        with self.assertRaisesRegex(ValueError, "different settings"):
+            self._run(_RecordingVLM(), backend={"local": True})
+        model = _RecordingVLM()
+        self._run(model, backend=dict(cloud))
+        self.assertEqual(model.seen, [])
+
+        argv = [
+            "batch", "--skill", "detect", "--object", "car", "--input", self.images,
+            "--output", self.output, "--quiet",
+        ]
+        with mock.patch("moondream.vl", return_value=_RecordingVLM()):
+            self.assertEqual(cli.main(argv + ["--restart", "--endpoint", "http://a/v1"]), 1)
+            with mock.patch("sys.stderr", io.StringIO()):
+                with self.assertRaises(SystemExit):
+                    cli.main(argv + ["--endpoint", "http://b/v1"])
+                with self.assertRaises(SystemExit):
+                    cli.main(argv + ["--endpoint", "http://a/v1", "--max-image-side", "512"])
+            self.assertEqual(cli.main(argv + ["--endpoint", "http://a/v1"]), 1)
+
+    def test_existing_output_without_job_is_kept(self):
+        with open(self.output, "w") as f:
+            f.write("keep me\n")
+        with self.assertRaisesRegex(ValueError, "--restart"):
+            self._run(_RecordingVLM())
+        with open(self.output) as f:
+            self.assertEqual(f.read(), "keep me\n")
+        self._run(_RecordingVLM(), restart=True)
+        self.assertEqual(len(_read_lines(self.output)), 4)
+
+    def test_manifest_entries_and_unreadable_files(self):
+        manifest = os.path.join(self.root, "manifest.txt")
+        with open(manifest, "w") as f:
+            f.write("# cars\nimages/a.png\n\nimages/missing.png\n")
+        job = self._run(_RecordingVLM(), source=manifest)
+        records = {os.path.basename(r["input"]): r for r in _read_lines(self.output)}
+        self.assertIn("result", records["a.png"])
+        self.assertTrue(records["missing.png"]["error"].startswith("FileNotFoundError"))
+        self.assertEqual((job.done, job.errors), (2, 1))
+
+    def test_main_builds_client_and_validates_arguments(self):
+        with mock.patch("moondream.vl", return_value=_RecordingVLM()) as vl:
+            code = cli.main(
+                [
+                    "batch", "--skill", "caption", "--length", "short",
+                    "--input", os.path.join(self.images, "nested"),
+                    "--output", self.output, "--endpoint", "http://localhost:2020/v1",
+                    "--quiet",
+                ]
+            )
+        self.assertEqual(code, 0)
+        vl.assert_called_once_with(
+            api_key=mock.ANY, local=False, endpoint="http://localhost:2020/v1"
+        )
+        self.assertEqual(_read_lines(self.output)[0]["result"], {"caption": "short"})
+
+        with mock.patch("sys.stderr", io.StringIO()):
+            with self.assertRaises(SystemExit):
+                cli.main(["batch", "--skill", "detect", "--input", "x", "--output", "y"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,12 +10,16 @@ import moondream as md
 from PIL import Image
 
 from moondream.finetune import Finetune, ft
+from moondream.transport import TransferStats
 from moondream.types import EncodedImage, RLGroup, SFTGroup
 
 
 class _FakeResponse:
+    status = 200
+
     def __init__(self, payload):
         self._payload = json.dumps(payload).encode("utf-8")
+        self.transfer = TransferStats(url="https://example.test")
 
     def read(self):
         return self._payload
@@ -422,7 +426,7 @@ class FinetuneTests(unittest.TestCase):
                 raise urllib.error.URLError(socket.timeout("timed out"))
             return _FakeResponse({"ok": True})
 
-        with mock.patch("urllib.request.urlopen", side_effect=urlopen):
+        with mock.patch.object(self.client.pool, "urlopen", side_effect=urlopen):
             with mock.patch("time.sleep"):
                 result = self.client._request_json("GET", "/health")
 
@@ -431,8 +435,9 @@ class FinetuneTests(unittest.TestCase):
 
     def test_request_json_does_not_retry_bad_api_key(self):
         error = _http_error(401, {"error": "invalid api key"})
-        with mock.patch(
-            "urllib.request.urlopen",
+        with mock.patch.object(
+            self.client.pool,
+            "urlopen",
             side_effect=error,
         ) as mocked:
             with self.assertRaises(urllib.error.HTTPError):
@@ -441,8 +446,9 @@ class FinetuneTests(unittest.TestCase):
         self.assertEqual(mocked.call_count, 1)
 
     def test_request_json_retries_524_then_succeeds(self):
-        with mock.patch(
-            "urllib.request.urlopen",
+        with mock.patch.object(
+            self.client.pool,
+            "urlopen",
             side_effect=[
                 _http_error(524, "error code: 524"),
                 _http_error(524, "error code: 524"),
@@ -454,6 +460,28 @@ class FinetuneTests(unittest.TestCase):
 
         self.assertEqual(result, {"ok": True})
 
+    def test_request_json_reports_timing(self):
+        timings = []
+        self.client.on_request_complete = timings.append
+        with mock.patch.object(
+            self.client.pool,
+            "urlopen",
+            side_effect=[_http_error(524, "error code: 524"), _FakeResponse({"ok": True})],
+        ):
+            with mock.patch("time.sleep"):
+                self.client._request_json("POST", "/rollouts", payload={"x": 1})
+        with mock.patch.object(
+            self.client.pool, "urlopen", side_effect=_http_error(401, {})
+        ):
+            with self.assertRaises(urllib.error.HTTPError):
+                self.client._request_json("GET", "/finetunes/ft_123")
+
+        ok, failed = timings
+        self.assertEqual((ok.call, ok.attempts, ok.status), ("POST /rollouts", 2, 200))
+        self.assertEqual(ok.payload_bytes, len(b'{"x": 1}'))
+        self.assertIsNone(ok.error)
+        self.assertEqual((failed.call, failed.attempts, failed.status), ("GET /finetunes/ft_123", 1, 401))
+
     def test_rollout_stream_respects_concurrency_cap(self):
         active = {"count": 0, "max": 0}
         lock = threading.Lock()
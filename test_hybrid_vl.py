@@ -0,0 +1,128 @@
+import concurrent.futures
+import threading
+import time
+import unittest
+
+from PIL import Image
+
+from moondream.arrays import DetectResult, PointResult
+from moondream.hybrid_vl import HybridVL
+from moondream.types import VLM
+
+
+class _FakeVLM(VLM):
+    def __init__(self, name, default_max_concurrency=2):
+        self.name = name
+        self.default_max_concurrency = default_max_concurrency
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        self.error = None
+
+    def encode_image(self, image):
+        return image
+
+    def _call(self, output):
+        self.calls += 1
+        self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return output
+
+    def caption(self, image, length="normal", stream=False, settings=None):
+        if stream:
+            self._call(None)
+            return {"caption": iter([self.name, " cat"])}
+        return self._call({"caption": self.name})
+
+    def query(self, image=None, question=None, stream=False, settings=None, reasoning=False):
+        return self._call({"answer": self.name})
+
+    def detect(self, image, object, settings=None, timeout=None, as_arrays=False):
+        output = self._call({"objects": [], "backend": self.name})
+        return DetectResult.from_output(output) if as_arrays else output
+
+    def point(self, image, object, settings=None, as_arrays=False):
+        output = self._call({"points": [], "backend": self.name})
+        return PointResult.from_output(output) if as_arrays else output
+
+    def segment(self, image, object, spatial_refs=None, stream=False, settings=None):
+        return self._call({"path": "M0 0"})
+
+
+class HybridVLTests(unittest.TestCase):
+    def setUp(self):
+        self.local = _FakeVLM("local")
+        self.cloud = _FakeVLM("cloud", default_max_concurrency=8)
+        self.records = []
+        self.model = HybridVL(self.local, self.cloud, on_route=self.records.append)
+        self.image = Image.new("RGB", (4, 4))
+
+    def test_overflows_to_cloud_when_local_is_saturated(self):
+        self.local.gate.clear()
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            busy = [executor.submit(self.model.detect, self.image, "car") for _ in range(2)]
+            deadline = time.monotonic() + 5
+            while self.model.stats().local.in_flight < 2:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.005)
+            self.assertEqual(self.model.detect(self.image, "car")["backend"], "cloud")
+            self.local.gate.set()
+            self.assertEqual([f.result()["backend"] for f in busy], ["local", "local"])
+
+        self.assertEqual(self.model.detect(self.image, "car", timeout=5)["backend"], "local")
+        stats = self.model.stats()
+        self.assertEqual((stats.local.calls, stats.cloud.calls, stats.overflow), (3, 1, 1))
+        self.assertEqual((stats.local.in_flight, stats.cloud.in_flight), (0, 0))
+        self.assertIsNotNone(stats.cloud.latency)
+        self.assertEqual(self.model.default_max_concurrency, 10)
+
+    def test_fails_over_on_local_errors(self):
+        self.local.error = RuntimeError("engine died")
+        self.assertEqual(self.model.point(self.image, "car")["backend"], "cloud")
+        local, cloud = self.records
+        self.assertEqual((local.backend, local.reason), ("local", "local"))
+        self.assertIsInstance(local.error, RuntimeError)
+        self.assertEqual((cloud.backend, cloud.reason, cloud.error), ("cloud", "failover", None))
+        self.assertEqual(self.model.stats().failover, 1)
+        self.assertEqual(self.model.stats().local.errors, 1)
+
+        self.local.error = ValueError("bad argument")
+        with self.assertRaises(ValueError):
+            self.model.point(self.image, "car")
+        self.model.failover = False
+        self.local.error = RuntimeError("engine died")
+        with self.assertRaises(RuntimeError):
+            self.model.point(self.image, "car")
+        self.assertEqual(self.cloud.calls, 1)
+
+    def test_array_results_on_the_local_route(self):
+        self.assertIsInstance(self.model.detect(self.image, "car", as_arrays=True), DetectResult)
+        self.assertIsInstance(self.model.point(self.image, "car", as_arrays=True), PointResult)
+        self.assertEqual([r.backend for r in self.records], ["local", "local"])
+        self.assertEqual([r.error for r in self.records], [None, None])
+        self.assertEqual(self.cloud.calls, 0)
+
+    def test_streams_hold_their_slot_until_closed(self):
+        self.model.max_local_in_flight = 1
+        chunks = self.model.caption(self.image, stream=True)["caption"]
+        self.assertEqual(self.model.stats().local.in_flight, 1)
+        self.assertEqual(self.model.caption(self.image)["caption"], "cloud")
+        self.assertEqual(next(chunks), "local")
+        chunks.close()
+        self.assertEqual(self.model.stats().local.in_flight, 0)
+
+        chunks = self.model.caption(self.image, stream=True)["caption"]
+        self.assertEqual("".join(chunks), "local cat")
+        self.assertEqual(self.model.stats().local.in_flight, 0)
+        self.assertEqual([r.backend for r in self.records], ["cloud", "local", "local"])
+
+    def test_streams_release_their_slot_on_with_exit(self):
+        with self.model.caption(self.image, stream=True)["caption"] as chunks:
+            self.assertEqual(next(chunks), "local")
+            self.assertEqual(self.model.stats().local.in_flight, 1)
+        self.assertEqual(self.model.stats().local.in_flight, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,249 @@
+import base64
+import os
+import tempfile
+import unittest
+from io import BytesIO
+
+from PIL import Image
+
+from moondream.cloud_vl import CloudVL
+from moondream.image import EncodeCache, EncodeOptions, image_bytes, to_base64
+from moondream.types import Base64EncodedImage, BytesEncodedImage
+
+ASSET = os.path.join(
+    os.path.dirname(__file__),
+    "moondream",
+    "assets",
+    "how-to-be-a-people-person-1662995088.jpg",
+)
+
+
+def _png_bytes():
+    buf = BytesIO()
+    Image.new("RGB", (8, 8), color="red").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class ImageEncodingTests(unittest.TestCase):
+    def setUp(self):
+        with open(ASSET, "rb") as f:
+            self.jpeg = f.read()
+
+    def test_opened_jpeg_passes_through_untouched(self):
+        with Image.open(ASSET) as image:
+            data, mime_type = image_bytes(image)
+        self.assertEqual(mime_type, "image/jpeg")
+        self.assertEqual(data, self.jpeg)
+
+    def test_loaded_or_modified_images_are_reencoded(self):
+        with Image.open(ASSET) as image:
+            image.load()
+            data, mime_type = image_bytes(image)
+        self.assertEqual(mime_type, "image/jpeg")
+        self.assertNotEqual(data, self.jpeg)
+
+        rgba = Image.new("RGBA", (4, 4))
+        self.assertEqual(image_bytes(rgba)[1], "image/jpeg")
+
+    def test_rotated_exif_is_reencoded(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        buf = BytesIO()
+        Image.new("RGB", (8, 4)).save(buf, format="JPEG", exif=exif.tobytes())
+        rotated = buf.getvalue()
+        with Image.open(BytesIO(rotated)) as image:
+            self.assertNotEqual(image_bytes(image)[0], rotated)
+
+    def test_bytes_encoded_image_from_bytes_and_file(self):
+        png = _png_bytes()
+        self.assertEqual(BytesEncodedImage.from_bytes(png).mime_type, "image/png")
+        with self.assertRaises(ValueError):
+            BytesEncodedImage.from_bytes(b"not an image")
+
+        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+            f.write(self.jpeg)
+        self.addCleanup(os.unlink, f.name)
+        encoded = BytesEncodedImage.from_file(f.name)
+        self.assertEqual(image_bytes(encoded), (self.jpeg, "image/jpeg"))
+
+    def test_to_base64_keeps_mime_type(self):
+        encoded = to_base64(BytesEncodedImage.from_bytes(_png_bytes()))
+        self.assertTrue(encoded.image_url.startswith("data:image/png;base64,"))
+        self.assertEqual(image_bytes(encoded)[0], _png_bytes())
+
+        existing = Base64EncodedImage(image_url="data:image/jpeg;base64,abc=")
+        self.assertIs(to_base64(existing), existing)
+
+    def test_cloud_encode_image_accepts_file_bytes(self):
+        encoded = CloudVL().encode_image(BytesEncodedImage.from_bytes(self.jpeg))
+        payload = encoded.image_url.split(",", 1)[1]
+        self.assertEqual(base64.b64decode(payload), self.jpeg)
+
+
+class ResolutionCapTests(unittest.TestCase):
+    def _decoded_size(self, data):
+        with Image.open(BytesIO(data)) as image:
+            return image.size
+
+    def test_target_size_respects_both_limits(self):
+        options = EncodeOptions(max_side=500, max_pixels=50_000)
+        self.assertEqual(options.target_size((1000, 250)), (447, 111))
+        self.assertEqual(EncodeOptions(max_side=500).target_size((1000, 250)), (500, 125))
+        self.assertIsNone(EncodeOptions(max_side=2000).target_size((1000, 250)))
+
+    def test_opened_jpeg_is_downscaled_without_touching_caller_image(self):
+        with Image.open(ASSET) as image:
+            data, mime_type = image_bytes(image, EncodeOptions(max_side=240))
+            self.assertEqual(image.size, (960, 504))
+            self.assertIsNone(image.im)
+        self.assertEqual(mime_type, "image/jpeg")
+        self.assertEqual(self._decoded_size(data), (240, 126))
+
+    def test_images_within_limits_still_pass_through(self):
+        with open(ASSET, "rb") as f:
+            jpeg = f.read()
+        options = EncodeOptions(max_side=4096)
+        with Image.open(ASSET) as image:
+            self.assertEqual(image_bytes(image, options)[0], jpeg)
+        encoded = BytesEncodedImage.from_bytes(jpeg)
+        self.assertEqual(image_bytes(encoded, options)[0], jpeg)
+
+    def test_bytes_and_in_memory_images_are_capped(self):
+        big = Image.new("RGBA", (2000, 1000))
+        data, _ = image_bytes(big, EncodeOptions(max_pixels=20_000))
+        self.assertEqual(self._decoded_size(data), (200, 100))
+
+        with open(ASSET, "rb") as f:
+            encoded = BytesEncodedImage.from_bytes(f.read())
+        data, _ = image_bytes(encoded, EncodeOptions(max_side=480))
+        self.assertEqual(self._decoded_size(data), (480, 252))
+
+    def test_cloud_client_applies_cap(self):
+        client = CloudVL(max_image_side=100)
+        encoded = client.encode_image(Image.new("RGB", (400, 200)))
+        data = base64.b64decode(encoded.image_url.split(",", 1)[1])
+        self.assertEqual(self._decoded_size(data), (100, 50))
+
+
+class CodecTests(unittest.TestCase):
+    def setUp(self):
+        with open(ASSET, "rb") as f:
+            self.jpeg = f.read()
+
+    def test_format_and_quality_are_applied(self):
+        image = Image.new("RGB", (64, 32), color="green")
+        data, mime_type = image_bytes(image, EncodeOptions(format="WEBP", quality=60))
+        self.assertEqual(mime_type, "image/webp")
+        self.assertTrue(data.startswith(b"RIFF"))
+        data, mime_type = image_bytes(image, EncodeOptions(format="PNG"))
+        self.assertEqual(mime_type, "image/png")
+        self.assertEqual(self._decoded(data).getpixel((0, 0)), (0, 128, 0))
+
+    def test_invalid_options_are_rejected(self):
+        with self.assertRaises(ValueError):
+            EncodeOptions(format="GIF")
+        with self.assertRaises(ValueError):
+            EncodeOptions(quality=0)
+        with self.assertRaises(ValueError):
+            EncodeOptions(target_bytes=0)
+
+    def test_non_default_codec_reencodes_compressed_inputs(self):
+        options = EncodeOptions(format="WEBP")
+        with Image.open(ASSET) as image:
+            self.assertEqual(image_bytes(image, options)[1], "image/webp")
+        encoded = BytesEncodedImage.from_bytes(self.jpeg)
+        data, mime_type = image_bytes(encoded, options)
+        self.assertEqual(mime_type, "image/webp")
+        self.assertEqual(self._decoded(data).size, (960, 504))
+
+    def test_target_bytes_picks_highest_quality_that_fits(self):
+        with Image.open(ASSET) as image:
+            image.load()
+            sizes = {
+                q: len(image_bytes(image, EncodeOptions(quality=q))[0])
+                for q in (70, 71)
+            }
+            budget = sizes[70]
+            data, _ = image_bytes(image, EncodeOptions(target_bytes=budget))
+        self.assertLess(budget, sizes[71])
+        self.assertEqual(len(data), budget)
+
+    def test_target_bytes_falls_back_to_lowest_quality(self):
+        with Image.open(ASSET) as image:
+            data, _ = image_bytes(image, EncodeOptions(target_bytes=1))
+            lowest, _ = image_bytes(image, EncodeOptions(quality=10))
+        self.assertEqual(data, lowest)
+
+    def test_source_within_budget_passes_through(self):
+        encoded = BytesEncodedImage.from_bytes(self.jpeg)
+        options = EncodeOptions(target_bytes=len(self.jpeg))
+        self.assertEqual(image_bytes(encoded, options)[0], self.jpeg)
+        options = EncodeOptions(target_bytes=len(self.jpeg) - 1)
+        self.assertLessEqual(len(image_bytes(encoded, options)[0]), len(self.jpeg) - 1)
+
+    def test_client_merges_encode_options_with_shortcuts(self):
+        client = CloudVL(
+            encode_options=EncodeOptions(format="PNG", max_side=50), max_image_side=100
+        )
+        self.assertEqual(client.encode_options, EncodeOptions(format="PNG", max_side=100))
+        encoded = client.encode_image(Image.new("RGB", (400, 200)))
+        self.assertTrue(encoded.image_url.startswith("data:image/png;base64,"))
+
+    def _decoded(self, data):
+        image = Image.open(BytesIO(data))
+        image.load()
+        return image
+
+
+class EncodeCacheTests(unittest.TestCase):
+    def test_repeated_encodes_hit_the_cache(self):
+        cache = EncodeCache()
+        client = CloudVL(image_cache=cache)
+        image = Image.new("RGB", (32, 32), color="blue")
+
+        first = client.encode_image(image)
+        second = client.encode_image(image)
+        copy = client.encode_image(image.copy())
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, copy)
+        stats = cache.stats()
+        self.assertEqual((stats.hits, stats.misses, stats.entries), (2, 1, 1))
+
+    def test_content_key_tracks_pixels_and_options(self):
+        cache = EncodeCache()
+        image = Image.new("RGB", (32, 32), color="blue")
+        cache.image_bytes(image)
+        image.putpixel((0, 0), (255, 0, 0))
+        cache.image_bytes(image)
+        cache.image_bytes(image, EncodeOptions(max_side=8))
+        self.assertEqual(cache.stats().misses, 3)
+
+    def test_unloaded_files_are_hashed_without_decoding(self):
+        cache = EncodeCache()
+        with Image.open(ASSET) as image:
+            cache.image_bytes(image)
+            cache.image_bytes(image)
+            self.assertIsNone(image.im)
+        self.assertEqual(cache.stats().hits, 1)
+
+    def test_identity_key_and_byte_eviction(self):
+        cache = EncodeCache(key="identity")
+        image = Image.new("RGB", (16, 16))
+        cache.image_bytes(image)
+        cache.image_bytes(image)
+        cache.image_bytes(image.copy())
+        self.assertEqual((cache.stats().hits, cache.stats().misses), (1, 2))
+
+        images = [Image.new("RGB", (16, 16), color=c) for c in ("red", "green", "blue")]
+        sizes = [len(image_bytes(i)[0]) for i in images]
+        cache = EncodeCache(max_bytes=sizes[1] + sizes[2])
+        for i in images:
+            cache.image_bytes(i)
+        stats = cache.stats()
+        self.assertEqual((stats.entries, stats.evictions), (2, 1))
+        self.assertEqual(stats.bytes, sizes[1] + sizes[2])
+
+
+if __name__ == "__main__":
+    unittest.main()
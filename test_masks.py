@@ -0,0 +1,159 @@
+import unittest
+
+import numpy as np
+
+from moondream import masks
+
+
+class ParsePathTest(unittest.TestCase):
+    def test_polylines_and_subpaths(self):
+        path = masks.parse_path("M0 0 L1 0 1 1 Z m0.5 0.5 h.25v.25H.5z")
+        self.assertEqual(path.starts.tolist(), [0, 4])
+        first, second = path.polygons()
+        np.testing.assert_allclose(first, [[0, 0], [1, 0], [1, 1], [0, 0]])
+        np.testing.assert_allclose(
+            second, [[0.5, 0.5], [0.75, 0.5], [0.75, 0.75], [0.5, 0.75], [0.5, 0.5]]
+        )
+
+    def test_packed_numbers(self):
+        path = masks.parse_path("M.5.5L1e-1-2E-1")
+        np.testing.assert_allclose(path.vertices, [[0.5, 0.5], [0.1, -0.2]])
+
+    def test_curves_are_flattened_through_their_endpoints(self):
+        path = masks.parse_path("M0 0 C0 1 1 1 1 0 S2 -1 2 0 Q2.5 1 3 0 T4 0", 4)
+        self.assertEqual(len(path.vertices), 1 + 4 * 4)
+        np.testing.assert_allclose(path.vertices[[4, 8, 12, 16]], [[1, 0], [2, 0], [3, 0], [4, 0]])
+        # The cubic's midpoint is at y = 0.75.
+        np.testing.assert_allclose(path.vertices[2], [0.5, 0.75])
+        # S reflects the previous control point (1, 1) to (1, -1).
+        self.assertLess(path.vertices[6, 1], 0)
+        # T reflects (2.5, 1) about (3, 0), bulging downwards.
+        self.assertLess(path.vertices[14, 1], 0)
+
+    def test_relative_curves(self):
+        absolute = masks.parse_path("M1 1 C1 2 2 2 2 1 C2 0 3 0 3 1")
+        relative = masks.parse_path("M1 1 c0 1 1 1 1 0 0 -1 1 -1 1 0")
+        np.testing.assert_allclose(absolute.vertices, relative.vertices)
+
+    def test_arc_with_packed_flags(self):
+        path = masks.parse_path("M0 0.5 A.5 .5 0 1 1 1 .5 a.5.5 0 11-1 0", 16)
+        np.testing.assert_allclose(path.vertices[-1], [0, 0.5], atol=1e-12)
+        radii = np.linalg.norm(path.vertices - [0.5, 0.5], axis=1)
+        np.testing.assert_allclose(radii, 0.5)
+
+    def test_bounds(self):
+        self.assertEqual(masks.parse_path("M.25 .5 L.75 .1").bounds(), (0.25, 0.1, 0.75, 0.5))
+        self.assertIsNone(masks.parse_path("").bounds())
+
+
+class PathParserTest(unittest.TestCase):
+    PATH = (
+        "M0 0 L.5 0 .5 .5 C.5 1 1 1 1 .5 S1.5 0 2 0 q.5 .5 1 0 t1 0"
+        " A.5 .5 0 1 1 4 1 z m1 1 h1v1H5Z"
+    )
+
+    def test_any_split_matches_parse_path(self):
+        expected = masks.parse_path(self.PATH)
+        for size in (1, 3, 7, len(self.PATH)):
+            parser = masks.PathParser()
+            pieces = []
+            for i in range(0, len(self.PATH), size):
+                pieces.extend(parser.feed(self.PATH[i : i + size]))
+            pieces.extend(parser.close())
+            path = masks._assemble(pieces)
+            np.testing.assert_allclose(path.vertices, expected.vertices)
+            self.assertEqual(path.starts.tolist(), expected.starts.tolist())
+
+    def test_complete_groups_come_out_before_the_next_command(self):
+        parser = masks.PathParser()
+        (move,) = parser.feed("M0 0 1")
+        self.assertEqual((move.command, move.points.tolist()), ("M", [[0, 0]]))
+        (line,) = parser.feed(" 2 3")
+        self.assertEqual((line.command, line.points.tolist()), ("L", [[1, 2]]))
+        # "4" could still become "4.5".
+        self.assertEqual(parser.feed(".5 4"), [])
+        (line,) = parser.close()
+        self.assertEqual(line.points.tolist(), [[3.5, 4]])
+
+
+class RasterizeTest(unittest.TestCase):
+    def test_square(self):
+        mask = masks.rasterize("M.25 .25 H.75 V.75 H.25 Z", 8, 4)
+        expected = np.zeros((4, 8), dtype=bool)
+        expected[1:3, 2:6] = True
+        np.testing.assert_array_equal(mask, expected)
+
+    def test_region(self):
+        region = {"x_min": 0.5, "y_min": 0.0, "x_max": 1.0, "y_max": 0.5}
+        mask = masks.rasterize("M0 0 H1 V1 H0 Z", 4, 4, region=region)
+        expected = np.zeros((4, 4), dtype=bool)
+        expected[:2, 2:] = True
+        np.testing.assert_array_equal(mask, expected)
+
+    def test_fill_rules(self):
+        # The inner square winds the same way as the outer one.
+        path = "M0 0 H1 V1 H0 Z M.25 .25 H.75 V.75 H.25 Z"
+        nonzero = masks.rasterize(path, 8, 8)
+        evenodd = masks.rasterize(path, 8, 8, fill_rule="evenodd")
+        self.assertEqual(nonzero.sum(), 64)
+        self.assertEqual(evenodd.sum(), 64 - 16)
+        with self.assertRaises(ValueError):
+            masks.rasterize(path, 8, 8, fill_rule="odd")
+
+    def test_circle_area_at_any_resolution(self):
+        path = masks.parse_path("M0 .5 A.5 .5 0 1 1 1 .5 A.5 .5 0 1 1 0 .5", 64)
+        for size in (64, 500):
+            area = masks.rasterize(path, size, size).sum()
+            self.assertAlmostEqual(area / size**2, np.pi / 4, delta=0.02)
+
+    def test_clipped_to_the_image(self):
+        mask = masks.rasterize("M-1 -1 H.5 V2 H-1 Z", 4, 2)
+        np.testing.assert_array_equal(mask, [[1, 1, 0, 0], [1, 1, 0, 0]])
+
+    def test_degenerate(self):
+        self.assertFalse(masks.rasterize("", 3, 3).any())
+        self.assertFalse(masks.rasterize("M0 .5 H1", 3, 3).any())
+
+
+class RLETest(unittest.TestCase):
+    def test_counts_are_column_major_and_start_with_zeros(self):
+        mask = np.array([[1, 0], [1, 1]], dtype=bool)
+        rle = masks.encode_rle(mask, compress=False)
+        self.assertEqual(rle, {"size": [2, 2], "counts": [0, 2, 1, 1]})
+        rle = masks.encode_rle(~mask, compress=False)
+        self.assertEqual(rle["counts"], [2, 1, 1])
+
+    def test_round_trip(self):
+        rng = np.random.default_rng(0)
+        for shape in [(1, 1), (7, 13), (64, 48)]:
+            mask = rng.random(shape) < 0.3
+            for compress in (True, False):
+                rle = masks.encode_rle(mask, compress)
+                np.testing.assert_array_equal(masks.decode_rle(rle), mask)
+                self.assertEqual(masks.rle_area(rle), mask.sum())
+
+    def test_compressed_strings(self):
+        # Worked by hand from the rleToString algorithm in maskApi.c.
+        self.assertEqual(masks._counts_to_string([2, 3]), "23")
+        self.assertEqual(masks._counts_to_string([0, 100]), "0T3")
+        counts = [5, 40, 3, 2, 1000, 7]
+        text = masks._counts_to_string(counts)
+        self.assertEqual(masks._string_to_counts(text), counts)
+
+    def test_iou(self):
+        a = np.zeros((10, 10), dtype=bool)
+        b = np.zeros((10, 10), dtype=bool)
+        a[2:6, 2:6] = True
+        b[4:8, 3:9] = True
+        expected = (a & b).sum() / (a | b).sum()
+        rle_a, rle_b = masks.encode_rle(a), masks.encode_rle(b, compress=False)
+        self.assertAlmostEqual(masks.rle_iou(rle_a, rle_b), expected)
+        self.assertEqual(masks.rle_iou(rle_a, rle_a), 1.0)
+        empty = masks.encode_rle(np.zeros((10, 10), dtype=bool))
+        self.assertEqual(masks.rle_iou(empty, empty), 0.0)
+        with self.assertRaises(ValueError):
+            masks.rle_iou(rle_a, masks.encode_rle(np.zeros((5, 5), dtype=bool)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import threading
+import time
+import unittest
+import urllib.error
+from unittest import mock
+
+from moondream import ratelimit
+from moondream.cloud_vl import CloudVL
+from moondream.ratelimit import RateLimit, RateLimiter, shared_limiter
+
+
+def _throttled():
+    return urllib.error.HTTPError("https://example.test", 429, "Too Many", {}, None)
+
+
+class RateLimiterTests(unittest.TestCase):
+    def test_token_bucket_paces_requests(self):
+        limiter = RateLimiter(RateLimit(requests_per_second=50))
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire().release()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_in_flight_cap_blocks_until_release(self):
+        limiter = RateLimiter(RateLimit(max_in_flight=2))
+        first, second = limiter.acquire(), limiter.acquire()
+        admitted = threading.Event()
+
+        def worker():
+            with limiter.acquire():
+                admitted.set()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        self.assertFalse(admitted.wait(0.05))
+        first.release()
+        self.assertTrue(admitted.wait(1))
+        thread.join()
+        second.release()
+        second.release()
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_rate_backs_off_on_429_and_ramps_up(self):
+        now = [1000.0]
+        with mock.patch.object(ratelimit.time, "monotonic", lambda: now[0]):
+            limiter = RateLimiter(RateLimit(requests_per_second=100, burst=10))
+            early, late = limiter.acquire(), limiter.acquire()
+            early.release(_throttled())
+            self.assertEqual(limiter.rate, 50)
+            # Requests sent before the backoff don't halve the rate again.
+            late.release(_throttled())
+            self.assertEqual(limiter.rate, 50)
+
+            now[0] += 1
+            limiter.acquire().release(_throttled())
+            self.assertAlmostEqual(limiter.rate, 27.5)
+
+            now[0] += 10
+            self.assertAlmostEqual(limiter.rate, 77.5)
+            limiter.acquire().release(urllib.error.HTTPError("u", 503, "", {}, None))
+            self.assertAlmostEqual(limiter.rate, 77.5)
+            now[0] += 60
+            self.assertEqual(limiter.rate, 100)
+
+    def test_clients_share_a_limiter_per_api_key(self):
+        limit = RateLimit(requests_per_second=5, max_in_flight=4)
+        a = CloudVL(api_key="key-a", rate_limit=limit)
+        b = CloudVL(api_key="key-a", rate_limit=RateLimit(requests_per_second=5, max_in_flight=4))
+        c = CloudVL(api_key="key-c", rate_limit=limit)
+        self.assertIs(a.rate_limiter, b.rate_limiter)
+        self.assertIsNot(a.rate_limiter, c.rate_limiter)
+        self.assertIs(shared_limiter("key-a", limit), a.rate_limiter)
+        with self.assertRaises(ValueError):
+            CloudVL(api_key="key-a", rate_limit=RateLimit(requests_per_second=1))
+        self.assertIsNone(CloudVL(api_key="key-a").rate_limiter)
+
+    def test_invalid_limits(self):
+        for kwargs in (
+            {"requests_per_second": 0},
+            {"max_in_flight": 0},
+            {"burst": 0.5},
+            {"backoff": 1.0},
+            {"ramp_up": 0},
+        ):
+            with self.assertRaises(ValueError):
+                RateLimit(**kwargs)
+
+
+if __name__ == "__main__":
+    unittest.main()
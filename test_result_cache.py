@@ -0,0 +1,146 @@
+import os
+import tempfile
+import time
+import unittest
+from io import BytesIO
+from unittest import mock
+
+from PIL import Image
+
+from moondream import result_cache
+from moondream.result_cache import CachedVL, ResultCache
+from moondream.types import VLM, BytesEncodedImage
+
+
+class _CountingVLM(VLM):
+    endpoint = "https://example.test/v1"
+    model = "moondream3-preview"
+
+    def __init__(self):
+        self.calls = 0
+
+    def _call(self, output):
+        self.calls += 1
+        return output
+
+    def encode_image(self, image):
+        return image
+
+    def caption(self, image, length="normal", stream=False, settings=None):
+        if stream:
+            return {"caption": iter(["a ", "cat"])}
+        return self._call({"caption": f"caption {self.calls}"})
+
+    def query(self, image=None, question=None, stream=False, settings=None, reasoning=False):
+        return self._call({"answer": f"{question} {self.calls}"})
+
+    def detect(self, image, object, settings=None):
+        return self._call({"objects": [{"x_min": 0.1, "y_min": 0.2, "x_max": 0.3, "y_max": 0.4}]})
+
+    def point(self, image, object, settings=None):
+        return self._call({"points": [{"x": 0.5, "y": 0.5}]})
+
+    def segment(self, image, object, spatial_refs=None, stream=False, settings=None):
+        return self._call({"path": "M0 0"})
+
+
+class ResultCacheTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "results.sqlite")
+        self.cache = ResultCache(self.path)
+        self.addCleanup(self.cache.close)
+        self.backend = _CountingVLM()
+        self.model = CachedVL(self.backend, self.cache)
+        self.image = Image.new("RGB", (16, 16), color="red")
+
+    def test_deterministic_calls_hit_the_cache(self):
+        first = self.model.detect(self.image, "car")
+        second = self.model.detect(self.image.copy(), "car")
+        self.assertEqual(first, second)
+        self.assertEqual(self.backend.calls, 1)
+
+        self.model.detect(self.image, "bus")
+        self.model.point(self.image, "car")
+        self.model.detect(Image.new("RGB", (16, 16), color="blue"), "car")
+        self.assertEqual(self.backend.calls, 4)
+        stats = self.cache.stats()
+        self.assertEqual((stats.hits, stats.misses, stats.entries), (1, 4, 4))
+
+    def test_sampled_and_streamed_calls_bypass_the_cache(self):
+        greedy = {"temperature": 0.0}
+        self.model.query(self.image, "what?", settings=greedy)
+        self.model.query(self.image, "what?", settings=greedy)
+        self.assertEqual(self.backend.calls, 1)
+
+        self.model.query(self.image, "what?")
+        self.model.query(self.image, "what?", settings={"temperature": 0.5})
+        self.model.detect(self.image, "car", settings={"temperature": 0.5})
+        self.assertEqual(self.backend.calls, 4)
+
+        chunks = self.model.caption(self.image, stream=True, settings=greedy)["caption"]
+        self.assertEqual("".join(chunks), "a cat")
+        self.assertEqual(self.cache.stats().entries, 1)
+
+    def test_settings_and_arguments_are_part_of_the_key(self):
+        self.model.query(self.image, "what?", settings={"temperature": 0, "max_tokens": 5})
+        self.model.query(self.image, "what?", settings={"temperature": 0, "max_tokens": 9})
+        self.model.query(self.image, "what?", settings={"temperature": 0}, reasoning=True)
+        self.model.segment(self.image, "car", spatial_refs=[[0.5, 0.5]])
+        self.model.segment(self.image, "car")
+        self.assertEqual(self.backend.calls, 5)
+
+    def test_entries_are_shared_across_connections(self):
+        self.model.detect(self.image, "car")
+        with ResultCache(self.path) as other:
+            backend = _CountingVLM()
+            CachedVL(backend, other).detect(self.image, "car")
+        self.assertEqual(backend.calls, 0)
+
+    def test_keys_depend_on_backend_and_content(self):
+        other = _CountingVLM()
+        other.model = "moondream3-preview/ft_abc@10"
+        key = self.model.cache_key("detect", self.image, object="car", settings=None)
+        self.assertNotEqual(
+            key, CachedVL(other, self.cache).cache_key("detect", self.image, object="car", settings=None)
+        )
+        image = BytesEncodedImage.from_bytes(_jpeg(self.image))
+        self.assertEqual(
+            self.model.cache_key("point", image, object="car"),
+            self.model.cache_key("point", BytesEncodedImage(image.data, image.mime_type), object="car"),
+        )
+
+    def test_ttl_expires_entries(self):
+        cache = ResultCache(self.path, ttl=10)
+        self.addCleanup(cache.close)
+        cache.set("key", {"answer": "yes"})
+        self.assertEqual(cache.get("key"), {"answer": "yes"})
+        with mock.patch.object(result_cache.time, "time", return_value=time.time() + 11):
+            self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.stats().entries, 0)
+
+    def test_size_eviction_drops_least_recently_used(self):
+        value = {"answer": "x" * 100}
+        cache = ResultCache(":memory:", max_bytes=350)
+        self.addCleanup(cache.close)
+        for key in ("a", "b", "c", "d"):
+            cache.set(key, value)
+        stats = cache.stats()
+        self.assertEqual((stats.entries, stats.evictions), (3, 1))
+        self.assertLessEqual(stats.bytes, 350)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("d"), value)
+
+        cache.clear()
+        self.assertEqual((cache.stats().entries, cache.stats().bytes), (0, 0))
+
+
+def _jpeg(image):
+    buf = BytesIO()
+    image.save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+if __name__ == "__main__":
+    unittest.main()
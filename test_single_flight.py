@@ -0,0 +1,120 @@
+import concurrent.futures
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from PIL import Image
+
+from moondream.result_cache import CachedVL, ResultCache
+from moondream.single_flight import SingleFlightVL
+from moondream.types import VLM
+
+
+class _BlockingVLM(VLM):
+    endpoint = "https://example.test/v1"
+    model = "moondream3-preview"
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.error = None
+
+    def encode_image(self, image):
+        return image
+
+    def _call(self, output):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return output
+
+    def caption(self, image, length="normal", stream=False, settings=None):
+        if stream:
+            return {"caption": iter(["a ", "cat"])}
+        return self._call({"caption": "a cat"})
+
+    def query(self, image=None, question=None, stream=False, settings=None, reasoning=False):
+        return self._call({"answer": question})
+
+    def detect(self, image, object, settings=None):
+        return self._call({"objects": [{"x_min": 0.1, "y_min": 0.2, "x_max": 0.3, "y_max": 0.4}]})
+
+    def point(self, image, object, settings=None):
+        return self._call({"points": []})
+
+    def segment(self, image, object, spatial_refs=None, stream=False, settings=None):
+        return self._call({"path": "M0 0"})
+
+
+class SingleFlightTests(unittest.TestCase):
+    def setUp(self):
+        self.backend = _BlockingVLM()
+        self.model = SingleFlightVL(self.backend)
+        self.image = Image.new("RGB", (16, 16), color="red")
+        self.executor = concurrent.futures.ThreadPoolExecutor(8)
+        self.addCleanup(self.executor.shutdown)
+
+    def _wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.005)
+
+    def test_identical_calls_share_one_request(self):
+        futures = [
+            self.executor.submit(self.model.detect, self.image.copy(), "person")
+            for _ in range(4)
+        ]
+        other = self.executor.submit(self.model.detect, self.image, "car")
+        self._wait_for(lambda: self.model.stats().deduplicated == 3)
+        self.assertEqual(self.model.stats().in_flight, 2)
+        self.backend.release.set()
+
+        results = [future.result() for future in futures]
+        self.assertEqual(results, [results[0]] * 4)
+        self.assertEqual(len({id(result) for result in results}), 4)
+        other.result()
+        self.assertEqual(self.backend.calls, 2)
+        stats = self.model.stats()
+        self.assertEqual((stats.calls, stats.deduplicated, stats.in_flight), (5, 3, 0))
+
+        # Once the call finishes, the next identical call goes upstream again.
+        self.model.detect(self.image, "person")
+        self.assertEqual(self.backend.calls, 3)
+
+    def test_errors_reach_every_waiter(self):
+        self.backend.error = RuntimeError("boom")
+        futures = [
+            self.executor.submit(self.model.point, self.image, "person") for _ in range(3)
+        ]
+        self._wait_for(lambda: self.model.stats().deduplicated == 2)
+        self.backend.release.set()
+        for future in futures:
+            with self.assertRaisesRegex(RuntimeError, "boom"):
+                future.result()
+        self.assertEqual(self.backend.calls, 1)
+
+    def test_sampled_and_streamed_calls_are_not_coalesced(self):
+        self.backend.release.set()
+        self.model.query(self.image, "what?")
+        self.model.query(self.image, "what?", settings={"temperature": 0.5})
+        chunks = self.model.caption(self.image, stream=True)["caption"]
+        self.assertEqual("".join(chunks), "a cat")
+        self.assertEqual(self.model.stats().calls, 0)
+
+    def test_result_cache_keys_ignore_the_wrapper(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with ResultCache(os.path.join(directory.name, "results.sqlite")) as cache:
+            wrapped = CachedVL(self.model, cache)
+            self.assertEqual(
+                wrapped.cache_key("detect", self.image, object="car"),
+                CachedVL(self.backend, cache).cache_key("detect", self.image, object="car"),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from moondream.streaming import stop_early
+
+
+class _Chunks:
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class StopEarlyTests(unittest.TestCase):
+    def test_stop_string_split_across_chunks(self):
+        source = _Chunks(["The cat", " sat.\nThe", " end"])
+        self.assertEqual("".join(stop_early(source, stop="\nThe")), "The cat sat.")
+        self.assertTrue(source.closed)
+
+    def test_held_back_text_is_flushed_at_the_end(self):
+        chunks = list(stop_early(iter(["ab", "c"]), stop=["cd", "xyz"]))
+        self.assertEqual("".join(chunks), "abc")
+
+    def test_earliest_stop_string_wins(self):
+        chunks = stop_early(iter(["one, two. three"]), stop=[".", ","])
+        self.assertEqual(list(chunks), ["one"])
+
+    def test_stop_when_keeps_the_matching_chunk(self):
+        source = _Chunks(["first", " line\n", "second"])
+        chunks = list(stop_early(source, stop_when=lambda text: "\n" in text))
+        self.assertEqual(chunks, ["first", " line\n"])
+        self.assertTrue(source.closed)
+
+    def test_closing_early_closes_the_source(self):
+        source = _Chunks(["a", "b", "c"])
+        chunks = stop_early(source, stop="z")
+        next(chunks)
+        chunks.close()
+        self.assertTrue(source.closed)
+
+    def test_no_stop_returns_source_unchanged(self):
+        source = _Chunks(["a"])
+        self.assertIs(stop_early(source), source)
+        with self.assertRaises(ValueError):
+            stop_early(source, stop="")
+
+
+if __name__ == "__main__":
+    unittest.main()
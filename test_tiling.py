@@ -0,0 +1,123 @@
+import unittest
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from moondream import tiling
+from moondream.types import VLM
+
+
+class _ColorVLM(VLM):
+    """Finds every non-white color in an image; one box or point per color."""
+
+    def __init__(self):
+        self.sizes = []
+
+    def encode_image(self, image):
+        return image
+
+    def _regions(self, image):
+        self.sizes.append(image.size)
+        pixels = np.asarray(image.convert("RGB")).astype(np.int32)
+        keys = (pixels[..., 0] << 16) | (pixels[..., 1] << 8) | pixels[..., 2]
+        width, height = image.size
+        for color in np.unique(keys):
+            if color == 0xFFFFFF:
+                continue
+            ys, xs = np.nonzero(keys == color)
+            yield (
+                xs.min() / width,
+                ys.min() / height,
+                (xs.max() + 1) / width,
+                (ys.max() + 1) / height,
+            )
+
+    def detect(self, image, object, settings=None):
+        return {
+            "objects": [
+                {"x_min": x0, "y_min": y0, "x_max": x1, "y_max": y1}
+                for x0, y0, x1, y1 in self._regions(image)
+            ]
+        }
+
+    def point(self, image, object, settings=None):
+        return {
+            "points": [
+                {"x": (x0 + x1) / 2, "y": (y0 + y1) / 2}
+                for x0, y0, x1, y1 in self._regions(image)
+            ]
+        }
+
+    def caption(self, image, length="normal", stream=False, settings=None):
+        return {"caption": ""}
+
+    def query(self, image=None, question=None, stream=False, settings=None, reasoning=False):
+        return {"answer": ""}
+
+    def segment(self, image, object, spatial_refs=None, stream=False, settings=None):
+        return {"path": ""}
+
+
+class TilingTests(unittest.TestCase):
+    def setUp(self):
+        self.image = Image.new("RGB", (1000, 600), "white")
+        draw = ImageDraw.Draw(self.image)
+        # One square inside a single tile, one straddling the first tile seam.
+        draw.rectangle((20, 20, 59, 59), fill=(255, 0, 0))
+        draw.rectangle((380, 100, 419, 139), fill=(0, 0, 255))
+
+    def test_tile_grid_covers_the_image_with_overlap(self):
+        grid = tiling.tile_grid(1000, 600, tile=400, overlap=100)
+        self.assertEqual(grid[:3], [(0, 0, 400, 400), (300, 0, 700, 400), (600, 0, 1000, 400)])
+        self.assertEqual(grid[-1], (600, 200, 1000, 600))
+        self.assertEqual(len(grid), 6)
+        self.assertEqual(tiling.tile_grid(300, 200, tile=400), [(0, 0, 300, 200)])
+        with self.assertRaises(ValueError):
+            tiling.tile_grid(100, 100, tile=64, overlap=64)
+
+    def test_detect_tiled_merges_duplicates_into_global_boxes(self):
+        model = _ColorVLM()
+        result = tiling.detect_tiled(model, self.image, "square", tile=400, overlap=100)
+        self.assertEqual(len(model.sizes), 6)
+        self.assertTrue(all(size[0] <= 400 and size[1] <= 400 for size in model.sizes))
+        boxes = sorted(
+            (round(b["x_min"] * 1000), round(b["y_min"] * 600), round(b["x_max"] * 1000), round(b["y_max"] * 600))
+            for b in result["objects"]
+        )
+        self.assertEqual(boxes, [(20, 20, 60, 60), (380, 100, 420, 140)])
+
+    def test_point_tiled_clusters_points(self):
+        result = tiling.point_tiled(_ColorVLM(), self.image, "square", tile=400, overlap=100)
+        points = sorted((round(p["x"] * 1000), round(p["y"] * 600)) for p in result["points"])
+        # The straddling square's partial halves give off-center points
+        # within the cluster radius of the whole square's center.
+        self.assertEqual(len(points), 2)
+        self.assertEqual(points[0], (40, 40))
+        self.assertLess(abs(points[1][0] - 400), 20)
+
+    def test_nms_and_clustering_are_vectorized_over_many_boxes(self):
+        rng = np.random.default_rng(0)
+        corners = rng.uniform(0, 10000, size=(3000, 2))
+        boxes = np.hstack([corners, corners + 20])
+        jittered = boxes + rng.uniform(-1, 1, size=boxes.shape)
+        keep = tiling.nms(np.vstack([boxes, jittered]), threshold=0.5)
+        self.assertLessEqual(len(keep), 3000)
+        self.assertGreater(len(keep), 2900)
+
+        points = np.array([[0, 0], [3, 4], [100, 100]], dtype=float)
+        np.testing.assert_allclose(tiling.cluster_points(points, 5.0), [[1.5, 2], [100, 100]])
+        self.assertEqual(tiling.cluster_points(np.empty((0, 2)), 5.0).shape, (0, 2))
+
+    def test_unsupported_images_are_rejected(self):
+        with self.assertRaises(ValueError):
+            tiling.detect_tiled(_ColorVLM(), "scan.tif", "car")
+
+    def test_box_iou_metrics(self):
+        boxes = np.array([[0, 0, 10, 10], [5, 5, 15, 15], [2, 2, 4, 4]], dtype=float)
+        box = np.array([0, 0, 10, 10], dtype=float)
+        np.testing.assert_allclose(tiling.box_iou(boxes, box), [1.0, 25 / 175, 0.04])
+        np.testing.assert_allclose(tiling.box_iou(boxes, box, "ios"), [1.0, 0.25, 1.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,655 @@
+import asyncio
+import email.parser
+import email.policy
+import gzip
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+import zlib
+from io import BytesIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from PIL import Image
+
+import moondream as md
+from moondream.arrays import DetectResult, PointResult
+from moondream.async_cloud_vl import AsyncCloudVL
+from moondream.balancer import EndpointBalancer
+from moondream import cloud_vl
+from moondream.cloud_vl import CloudVL
+from moondream.ratelimit import RateLimit
+from moondream.result_cache import ResultCache
+from moondream.types import BytesEncodedImage
+from moondream.transport import (
+    AsyncConnectionPool,
+    Compression,
+    ConnectionPool,
+    PooledResponse,
+    RetryBudget,
+    RetryPolicy,
+    with_retries,
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        self.server.request_encoding = self.headers.get("Content-Encoding")
+        if self.server.request_encoding:
+            raw = zlib.decompress(raw, 32 + zlib.MAX_WBITS)
+        self._gzip = False
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("multipart/"):
+            if not self.server.multipart:
+                self.server.uploads.append("rejected")
+                self._send(415, {"error": "unsupported media type"})
+                return
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + raw
+            )
+            parts = {
+                part.get_param("name", header="content-disposition"): part
+                for part in message.iter_parts()
+            }
+            image = parts["image"]
+            self.server.uploads.append(
+                (image.get_content_type(), image.get_payload(decode=True))
+            )
+            body = json.loads(parts["payload"].get_payload(decode=True))
+        else:
+            body = json.loads(raw or b"{}")
+            self.server.uploads.append(body.get("image_url"))
+        self._gzip = "gzip" in (self.headers.get("Accept-Encoding") or "")
+        if self.path.endswith("/fail"):
+            self._send(503, {"error": "busy"})
+            return
+        if self.path.endswith("/detect") and self.server.throttle > 0:
+            self.server.throttle -= 1
+            self._send(429, {"error": "slow down"}, {"Retry-After": "0"})
+            return
+        if self.path.endswith("/big"):
+            self._send(200, {"text": "moondream " * 1000})
+            return
+        if body.get("stream") and self.path.endswith("/segment"):
+            box = {"x_min": 0.1, "y_min": 0.1, "x_max": 0.9, "y_max": 0.9}
+            # Chunks split numbers and commands anywhere.
+            coarse = ["M0.1 0.", "1 L0.9 0.1 0", ".9 0.9", " Z"]
+            final = {"path": "M0 0 H1 V1 Z", "bbox": box, "completed": True}
+            self._send_events(
+                [{"type": "bbox", "bbox": box}]
+                + [{"type": "path_delta", "chunk": c} for c in coarse]
+                + [{"type": "final", **final}]
+            )
+            return
+        if body.get("stream"):
+            self._send_events(
+                [{"chunk": "a "}, {"chunk": "cat"}, {"completed": True}]
+            )
+            return
+        self._send(
+            200,
+            {
+                "objects": [],
+                "points": [],
+                "caption": "a cat",
+                "answer": "a cat",
+                "echo": body.get("object"),
+            },
+        )
+
+    def _send_events(self, events):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        if self._gzip:
+            self.send_header("Content-Encoding", "gzip")
+            compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        self.end_headers()
+        for event in events:
+            data = f"data: {json.dumps(event)}\n\n".encode("utf-8")
+            if self._gzip:
+                data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        if self._gzip:
+            tail = compressor.flush()
+            self.wfile.write(f"{len(tail):x}\r\n".encode() + tail + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if self._gzip:
+            data = gzip.compress(data)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _ServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.throttle = 0
+        self.server.multipart = True
+        self.server.uploads = []
+        threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        ).start()
+        self.endpoint = f"http://127.0.0.1:{self.server.server_port}/v1"
+        self.pool = ConnectionPool()
+        # Keep proxy settings from the environment out of the way.
+        patcher = mock.patch("urllib.request.getproxies", return_value={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.pool.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TransportTests(_ServerTestCase):
+    def _post(self, path, payload):
+        req = urllib.request.Request(
+            f"{self.endpoint}/{path}",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with self.pool.urlopen(req, timeout=5) as response:
+            return json.loads(response.read())
+
+    def test_connections_are_reused(self):
+        for _ in range(3):
+            self.assertEqual(self._post("detect", {"object": "cat"})["echo"], "cat")
+
+        stats = self.pool.stats()
+        self.assertEqual(stats.misses, 1)
+        self.assertEqual(stats.hits, 2)
+        self.assertEqual(stats.idle, 1)
+
+    def test_http_errors_raise_and_keep_connection(self):
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            self._post("fail", {})
+        self.assertEqual(ctx.exception.code, 503)
+        self.assertEqual(json.loads(ctx.exception.read()), {"error": "busy"})
+
+        self._post("detect", {"object": "dog"})
+        self.assertEqual(self.pool.stats().hits, 1)
+
+    def test_idle_connections_are_evicted(self):
+        pool = ConnectionPool(idle_timeout=0.0)
+        self.pool = pool
+        self._post("detect", {"object": "cat"})
+        self._post("detect", {"object": "cat"})
+
+        stats = pool.stats()
+        self.assertEqual(stats.misses, 2)
+        self.assertEqual(stats.evictions, 1)
+
+    def test_max_size_caps_idle_connections(self):
+        self.pool = ConnectionPool(max_size=0)
+        self._post("detect", {"object": "cat"})
+        self.assertEqual(self.pool.stats().idle, 0)
+
+    def test_segment_stream_geometry(self):
+        client = CloudVL(endpoint=self.endpoint, pool=self.pool)
+        image = Image.new("RGB", (4, 4), color="white")
+        updates = list(client.segment(image, "cat", stream=True, geometry=True))
+        self.assertEqual(updates[0]["bbox"]["x_min"], 0.1)
+        commands = [
+            (piece.command, piece.points.tolist())
+            for update in updates[1:-1]
+            for piece in update.get("commands", [])
+        ]
+        self.assertEqual(
+            commands,
+            [("M", [[0.1, 0.1]]), ("L", [[0.9, 0.1]]), ("L", [[0.9, 0.9]])],
+        )
+        self.assertEqual(updates[1]["chunk"], "M0.1 0.")
+        final = updates[-1]
+        self.assertTrue(final["completed"])
+        self.assertEqual(
+            final["geometry"].vertices.tolist(), [[0, 0], [1, 0], [1, 1], [0, 0]]
+        )
+        with self.assertRaises(ValueError):
+            client.segment(image, "cat", geometry=True)
+
+    def test_as_arrays(self):
+        client = CloudVL(endpoint=self.endpoint, pool=self.pool)
+        image = Image.new("RGB", (4, 4), color="white")
+        boxes = client.detect(image, "cat", as_arrays=True).boxes
+        points = client.point(image, "cat", as_arrays=True).points
+        self.assertEqual((boxes.shape, points.shape), ((0, 4), (0, 2)))
+
+    def test_cloud_vl_uses_pool(self):
+        client = CloudVL(endpoint=self.endpoint, pool=self.pool)
+        image = Image.new("RGB", (4, 4), color="white")
+        client.detect(image, "cat")
+        client.detect(image, "cat")
+        self.assertEqual(self.pool.stats().hits, 1)
+
+    def test_cloud_vl_streams_chunked_events(self):
+        client = CloudVL(endpoint=self.endpoint, pool=self.pool)
+        image = Image.new("RGB", (4, 4), color="white")
+        chunks = list(client.caption(image, stream=True)["caption"])
+        self.assertEqual(chunks, ["a ", "cat"])
+
+    def test_cloud_vl_stops_streams_early(self):
+        client = CloudVL(endpoint=self.endpoint, pool=self.pool)
+        image = Image.new("RGB", (4, 4), color="white")
+        self.assertEqual(client.caption(image, stop="t")["caption"], "a ca")
+        answer = client.query(image, "what?", stop_when=lambda text: "a" in text)
+        self.assertEqual(answer["answer"], "a ")
+
+        with mock.patch.object(
+            PooledResponse, "close", autospec=True, side_effect=PooledResponse.close
+        ) as close:
+            chunks = client.query(image, "what?", stream=True)["answer"]
+            self.assertEqual(next(chunks), "a ")
+            close.assert_not_called()
+            chunks.close()
+            close.assert_called_once()
+
+    def test_cloud_vl_compresses_large_bodies(self):
+        transfers = []
+        client = CloudVL(
+            endpoint=self.endpoint,
+            pool=self.pool,
+            compression=Compression(min_size=1024),
+            on_transfer=transfers.append,
+        )
+        image = Image.new("RGB", (256, 256), color="white")
+        self.assertEqual(client.detect(image, "cat")["objects"], [])
+        self.assertEqual(self.server.request_encoding, "gzip")
+        chunks = client.caption(image, stream=True)["caption"]
+        self.assertEqual(list(chunks), ["a ", "cat"])
+        client.query(None, "tiny?")
+        self.assertIsNone(self.server.request_encoding)
+        big = client._request_json(client._request("big", {}))
+        self.assertEqual(big["text"], "moondream " * 1000)
+
+        detect, stream, query, response = transfers
+        self.assertLess(detect.request_wire_bytes, detect.request_bytes)
+        self.assertEqual(query.request_wire_bytes, query.request_bytes)
+        self.assertGreater(stream.response_wire_bytes, 0)
+        self.assertGreater(stream.response_bytes, 0)
+        self.assertLess(response.response_wire_bytes * 10, response.response_bytes)
+        # Decoded bodies still release their connection; only the stream,
+        # which stops at its "completed" event, closes one.
+        self.assertEqual(self.pool.stats().hits, 2)
+
+    def test_cloud_vl_uploads_raw_image_bytes(self):
+        client = CloudVL(endpoint=self.endpoint, pool=self.pool, upload="multipart")
+        image = BytesEncodedImage.from_bytes(_jpeg(Image.new("RGB", (8, 8))))
+        req = client._request("detect", {"object": "cat"}, image)
+        self.assertEqual(client._request_json(req)["echo"], "cat")
+        chunks = client.caption(image, stream=True)["caption"]
+        self.assertEqual(list(chunks), ["a ", "cat"])
+        client.query(None, "text only?")
+        self.assertEqual(
+            self.server.uploads,
+            [("image/jpeg", image.data), ("image/jpeg", image.data), None],
+        )
+
+    def test_cloud_vl_falls_back_to_json_uploads(self):
+        self.server.multipart = False
+        client = CloudVL(endpoint=self.endpoint, pool=self.pool, upload="multipart")
+        image = Image.new("RGB", (4, 4), color="white")
+        self.assertEqual(client.detect(image, "cat")["objects"], [])
+        chunks = client.caption(image, stream=True)["caption"]
+        self.assertEqual(list(chunks), ["a ", "cat"])
+        rejected, first, second = self.server.uploads
+        self.assertEqual(rejected, "rejected")
+        self.assertTrue(first.startswith("data:image/jpeg;base64,"))
+        self.assertEqual(first, second)
+
+        with self.assertRaises(ValueError):
+            CloudVL(endpoint=self.endpoint, upload="binary")
+
+    def test_cloud_vl_retries_throttled_requests(self):
+        self.server.throttle = 2
+        client = CloudVL(endpoint=self.endpoint, pool=self.pool)
+        image = Image.new("RGB", (4, 4), color="white")
+        with mock.patch("time.sleep") as sleep:
+            self.assertEqual(client.detect(image, "cat")["objects"], [])
+        self.assertEqual(sleep.call_args_list, [mock.call(0.0), mock.call(0.0)])
+
+        self.server.throttle = 5
+        client.retry = RetryPolicy(max_retries=1)
+        with mock.patch("time.sleep"):
+            with self.assertRaises(urllib.error.HTTPError) as ctx:
+                client.detect(image, "cat")
+        self.assertEqual(ctx.exception.code, 429)
+
+
+    def test_cloud_vl_rate_limit_backs_off_and_releases_slots(self):
+        self.server.throttle = 2
+        client = CloudVL(
+            endpoint=self.endpoint,
+            api_key="rate-limit-test",
+            pool=self.pool,
+            rate_limit=RateLimit(requests_per_second=1000, max_in_flight=1, burst=10),
+        )
+        image = Image.new("RGB", (4, 4), color="white")
+        with mock.patch("time.sleep"):
+            self.assertEqual(client.detect(image, "cat")["objects"], [])
+        self.assertLess(client.rate_limiter.rate, 1000)
+
+        chunks = client.caption(image, stream=True)["caption"]
+        self.assertEqual(next(chunks), "a ")
+        self.assertEqual(client.rate_limiter.in_flight, 1)
+        chunks.close()
+        self.assertEqual(client.rate_limiter.in_flight, 0)
+        self.assertEqual(client.query(image, "what?")["answer"], "a cat")
+
+
+    def test_cloud_vl_balances_and_ejects_dead_endpoints(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            dead = f"http://127.0.0.1:{sock.getsockname()[1]}/v1"
+        client = CloudVL(
+            endpoint=EndpointBalancer([dead, self.endpoint], max_failures=2),
+            pool=self.pool,
+        )
+        image = Image.new("RGB", (4, 4), color="white")
+        with mock.patch("time.sleep"):
+            for _ in range(3):
+                self.assertEqual(client.detect(image, "cat")["objects"], [])
+            chunks = client.caption(image, stream=True)["caption"]
+            self.assertEqual(list(chunks), ["a ", "cat"])
+
+        down, up = client.balancer.stats()
+        self.assertTrue(down.ejected)
+        self.assertEqual((down.failures, down.outstanding), (2, 0))
+        self.assertEqual((up.requests, up.failures, up.outstanding), (4, 0, 0))
+        self.assertIsNotNone(up.latency)
+
+    def test_cloud_vl_reports_request_timings(self):
+        self.server.throttle = 1
+        self.server.multipart = False
+        timings = []
+        client = CloudVL(
+            endpoint=self.endpoint,
+            pool=self.pool,
+            upload="multipart",
+            on_request_complete=timings.append,
+        )
+        image = Image.new("RGB", (64, 64), color="white")
+        with mock.patch("time.sleep"):
+            client.detect(image, "cat")
+        chunks = client.caption(image, stream=True)["caption"]
+        self.assertEqual(list(chunks), ["a ", "cat"])
+        with self.assertRaises(urllib.error.HTTPError):
+            client._request_json(client._request("fail", {}))
+
+        detect, caption, failed = timings
+        # The rejected multipart upload, a 429, then the JSON upload.
+        self.assertEqual((detect.call, detect.attempts, detect.retries), ("detect", 3, 2))
+        self.assertEqual(detect.status, 200)
+        self.assertGreater(detect.encode_seconds, 0)
+        self.assertEqual(detect.payload_bytes, detect.transfer.request_bytes)
+        self.assertIsNotNone(detect.upload_seconds)
+        self.assertIsNotNone(detect.ttfb_seconds)
+        self.assertIsNone(detect.ttft_seconds)
+        self.assertLessEqual(detect.ttfb_seconds, detect.total_seconds)
+
+        self.assertEqual((caption.call, caption.chunks, caption.attempts), ("caption", 2, 1))
+        self.assertEqual(caption.connect_seconds, 0.0)
+        self.assertLessEqual(caption.ttft_seconds, caption.total_seconds)
+        self.assertIsNotNone(caption.chunks_per_second)
+        self.assertIsNone(caption.error)
+
+        self.assertEqual(failed.status, 503)
+        self.assertIsInstance(failed.error, urllib.error.HTTPError)
+
+    def test_cloud_vl_analyze_encodes_once_and_fans_out(self):
+        client = CloudVL(endpoint=self.endpoint, pool=self.pool, upload="multipart")
+        image = Image.new("RGB", (32, 32), color="white")
+        with mock.patch(
+            "moondream.cloud_vl.image_bytes", side_effect=cloud_vl.image_bytes
+        ) as encode:
+            result = client.analyze(
+                image,
+                queries=["what?", "where?"],
+                detect=["cat", "dog"],
+                point=["cat"],
+                caption="short",
+            )
+        # Only the first call encodes; sub-requests pass the bytes through.
+        encoded = [c.args[0] for c in encode.call_args_list if c.args[0] is image]
+        self.assertEqual(len(encoded), 1)
+        self.assertEqual(result["caption"], "a cat")
+        self.assertEqual(result["answers"], {"what?": "a cat", "where?": "a cat"})
+        self.assertEqual(result["objects"], {"cat": [], "dog": []})
+        self.assertEqual(result["points"], {"cat": []})
+        self.assertEqual(result["errors"], {})
+        self.assertEqual(len(self.server.uploads), 6)
+        self.assertEqual(len(set(self.server.uploads)), 1)
+
+        with mock.patch.object(client, "point", side_effect=RuntimeError("boom")):
+            result = client.analyze(image, detect=["cat"], point=["cat"])
+        self.assertEqual(result["objects"], {"cat": []})
+        self.assertEqual(list(result["errors"]), ["point:cat"])
+        self.assertEqual(client.analyze(image)["answers"], {})
+
+    def test_as_arrays_through_the_cache_and_single_flight(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = ResultCache(os.path.join(directory.name, "results.sqlite"))
+        self.addCleanup(cache.close)
+        client = md.vl(
+            endpoint=self.endpoint, pool=self.pool, result_cache=cache, single_flight=True
+        )
+        image = Image.new("RGB", (32, 32), color="white")
+
+        miss = client.detect(image, "cat", as_arrays=True)
+        hit = client.detect(image, "cat", as_arrays=True)
+        self.assertIsInstance(miss, DetectResult)
+        self.assertIsInstance(hit, DetectResult)
+        # as_arrays only changes the return type, so the plain call is a hit too.
+        self.assertEqual(client.detect(image, "cat"), {"objects": []})
+        self.assertIsInstance(client.point(image, "cat", as_arrays=True), PointResult)
+        self.assertEqual(len(self.server.uploads), 2)
+        self.assertEqual(cache.stats().hits, 2)
+
+
+class RetryTests(unittest.TestCase):
+    def _http_error(self, code, headers=None):
+        return urllib.error.HTTPError("https://x", code, "error", headers or {}, None)
+
+    def test_delay_honors_retry_after_up_to_cap(self):
+        policy = RetryPolicy(max_retry_after=5.0)
+        self.assertEqual(policy.delay(0, self._http_error(429, {"Retry-After": "3"})), 3.0)
+        self.assertEqual(policy.delay(0, self._http_error(503, {"Retry-After": "90"})), 5.0)
+        self.assertLessEqual(policy.delay(2, self._http_error(503)), 2.0)
+
+    def test_only_transient_errors_are_retryable(self):
+        policy = RetryPolicy()
+        self.assertTrue(policy.is_retryable(self._http_error(503)))
+        self.assertTrue(policy.is_retryable(urllib.error.URLError("refused")))
+        self.assertTrue(policy.is_retryable(TimeoutError()))
+        self.assertFalse(policy.is_retryable(self._http_error(401)))
+        self.assertFalse(policy.is_retryable(ValueError()))
+
+    def test_budget_stops_retries_under_sustained_failure(self):
+        budget = RetryBudget(max_tokens=4.0, token_ratio=1.0)
+        calls = []
+
+        def failing():
+            calls.append(1)
+            raise TimeoutError()
+
+        with mock.patch("time.sleep"):
+            with self.assertRaises(TimeoutError):
+                with_retries(failing, RetryPolicy(max_retries=10), budget)
+        # Tokens 4 -> 3 (retry) -> 2 (no retry: not above half).
+        self.assertEqual(len(calls), 2)
+
+        budget.record_success()
+        budget.record_success()
+        self.assertEqual(budget.tokens, 4.0)
+
+
+class AsyncTransportTests(_ServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.async_pool = AsyncConnectionPool()
+        self.client = AsyncCloudVL(
+            endpoint=self.endpoint,
+            pool=self.async_pool,
+            retry=RetryPolicy(max_retries=0),
+        )
+        self.image = Image.new("RGB", (4, 4), color="white")
+
+    def test_async_calls_reuse_connections(self):
+        async def run():
+            for _ in range(3):
+                result = await self.client.detect(self.image, "cat")
+                self.assertEqual(result, {"objects": []})
+
+        asyncio.run(run())
+        stats = self.async_pool.stats()
+        self.assertEqual((stats.misses, stats.hits), (1, 2))
+
+    def test_async_concurrent_calls(self):
+        async def run():
+            return await asyncio.gather(
+                *(self.client.caption(self.image) for _ in range(8))
+            )
+
+        results = asyncio.run(run())
+        self.assertEqual([r["caption"] for r in results], ["a cat"] * 8)
+
+    def test_async_streaming_and_errors(self):
+        async def run():
+            output = await self.client.caption(self.image, stream=True)
+            chunks = [chunk async for chunk in output["caption"]]
+            with self.assertRaises(urllib.error.HTTPError):
+                await self.client._request_json(self.client._request("fail", {}))
+            return chunks
+
+        self.assertEqual(asyncio.run(run()), ["a ", "cat"])
+
+    def test_async_segment_stream_geometry(self):
+        async def run():
+            updates = await self.client.segment(
+                self.image, "cat", stream=True, geometry=True
+            )
+            return [update async for update in updates]
+
+        updates = asyncio.run(run())
+        commands = [piece.command for u in updates for piece in u.get("commands", [])]
+        self.assertEqual(commands, ["M", "L", "L"])
+        self.assertEqual(len(updates[-1]["geometry"].vertices), 4)
+
+    def test_async_encoding_runs_off_the_event_loop(self):
+        threads = []
+        encode = self.client.encode_image
+
+        def recording(image):
+            threads.append(threading.current_thread())
+            return encode(image)
+
+        self.client.encode_image = recording
+        asyncio.run(self.client.detect(self.image, "cat"))
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    def test_async_analyze_bounds_concurrency(self):
+        active = [0, 0]
+
+        async def detect(image, object, **kwargs):
+            active[0] += 1
+            active[1] = max(active)
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+            return {"objects": []}
+
+        self.client.detect = detect
+        result = asyncio.run(
+            self.client.analyze(self.image, detect=list("abcdef"), max_concurrency=2)
+        )
+        self.assertEqual(active[1], 2)
+        self.assertEqual(len(result["objects"]), 6)
+
+    def test_async_compression(self):
+        self.client.compression = Compression(min_size=0)
+        transfers = []
+        self.client.on_transfer = transfers.append
+
+        async def run():
+            output = await self.client.query(self.image, "what?", stream=True)
+            chunks = [chunk async for chunk in output["answer"]]
+            result = await self.client.detect(self.image, "cat")
+            return chunks, result
+
+        self.assertEqual(asyncio.run(run()), (["a ", "cat"], {"objects": []}))
+        self.assertEqual(self.server.request_encoding, "gzip")
+        stream, detect = transfers
+        self.assertGreater(detect.response_bytes, 0)
+        self.assertNotEqual(detect.response_wire_bytes, detect.response_bytes)
+        self.assertLess(detect.request_wire_bytes, detect.request_bytes)
+
+    def test_async_multipart_uploads(self):
+        self.client._init_upload("multipart")
+
+        async def run():
+            await self.client.detect(self.image, "cat")
+            self.server.multipart = False
+            await self.client.point(self.image, "cat")
+            await self.client.point(self.image, "cat")
+
+        asyncio.run(run())
+        (mime_type, data), rejected, first, second = self.server.uploads
+        self.assertEqual(mime_type, "image/jpeg")
+        self.assertEqual(data[:2], b"\xff\xd8")
+        self.assertEqual(rejected, "rejected")
+        self.assertEqual(first, second)
+
+    def test_async_streams_stop_early(self):
+        async def run():
+            output = await self.client.query(self.image, "what?", stream=True, stop="c")
+            chunks = [chunk async for chunk in output["answer"]]
+            caption = await self.client.caption(self.image, stop_when=bool)
+            return chunks, caption["caption"]
+
+        self.assertEqual(asyncio.run(run()), (["a "], "a "))
+
+    def test_async_analyze(self):
+        async def run():
+            return await self.client.analyze(
+                self.image, queries=["what?"], detect=["cat"], caption="normal"
+            )
+
+        result = asyncio.run(run())
+        self.assertEqual(result["answers"], {"what?": "a cat"})
+        self.assertEqual(result["objects"], {"cat": []})
+        self.assertEqual(result["caption"], "a cat")
+        self.assertEqual(len(set(self.server.uploads)), 1)
+
+
+
+def _jpeg(image):
+    buf = BytesIO()
+    image.save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from moondream.video import FramePipeline
+from moondream.types import VLM
+
+
+class _FrameVLM(VLM):
+    default_max_concurrency = 2
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def encode_image(self, image):
+        return image
+
+    def detect(self, image, object, settings=None):
+        time.sleep(self.delay)
+        color = image.getpixel((0, 0))
+        with self.lock:
+            self.calls.append(color)
+        if color == (0, 0, 255):
+            raise RuntimeError("blue")
+        return {"objects": [], "color": color}
+
+    def caption(self, image, length="normal", stream=False, settings=None):
+        return {"caption": "frame"}
+
+    def query(self, image=None, question=None, stream=False, settings=None, reasoning=False):
+        return {"answer": question}
+
+    def point(self, image, object, settings=None):
+        return {"points": []}
+
+    def segment(self, image, object, spatial_refs=None, stream=False, settings=None):
+        return {"path": ""}
+
+
+def _frame(color, noise=0):
+    frame = Image.new("RGB", (64, 48), color)
+    if noise:
+        frame.putpixel((63, 47), (255, 255, 255))
+    return frame
+
+
+class FramePipelineTests(unittest.TestCase):
+    def test_similar_frames_reuse_the_last_result(self):
+        model = _FrameVLM()
+        pipeline = FramePipeline(model, "detect", object="car", max_in_flight=1, drop_stale=False)
+        red, green = (255, 0, 0), (0, 255, 0)
+        frames = [_frame(red), _frame(red, noise=1), _frame(green), _frame(green)]
+        results = list(pipeline.run(frames))
+
+        self.assertEqual([r.index for r in results], [0, 1, 2, 3])
+        self.assertEqual([r.reused for r in results], [False, True, False, True])
+        self.assertEqual([r.source for r in results], [0, 0, 2, 2])
+        self.assertEqual(results[1].result, results[0].result)
+        self.assertEqual(results[3].result["color"], green)
+        self.assertEqual(results[0].difference, 1.0)
+        self.assertLess(results[1].difference, 0.02)
+        self.assertEqual(model.calls, [red, green])
+        stats = pipeline.stats()
+        self.assertEqual((stats.frames, stats.processed, stats.skipped, stats.dropped), (4, 2, 2, 0))
+
+    def test_busy_backend_drops_frames_instead_of_queueing(self):
+        model = _FrameVLM(delay=0.2)
+        pipeline = FramePipeline(model, "detect", object="car", max_in_flight=1)
+        colors = [(i * 40, 0, 0) for i in range(5)]
+        results = list(pipeline.run(_frame(color) for color in colors))
+
+        self.assertEqual([r.index for r in results], [0])
+        self.assertEqual(model.calls, [colors[0]])
+        stats = pipeline.stats()
+        self.assertEqual((stats.processed, stats.dropped, stats.in_flight), (1, 4, 0))
+
+    def test_errors_and_threshold_zero(self):
+        model = _FrameVLM()
+        pipeline = FramePipeline(model, "detect", object="car", threshold=0, drop_stale=False)
+        blue = _frame((0, 0, 255))
+        results = list(pipeline.run([blue, blue]))
+        self.assertEqual([r.reused for r in results], [False, False])
+        self.assertIsInstance(results[0].result, RuntimeError)
+        self.assertEqual(pipeline.stats().errors, 2)
+
+    def test_failed_reference_is_retried_instead_of_reused(self):
+        model = _FrameVLM()
+        detect = model.detect
+        failures = [RuntimeError("transient")]
+
+        def flaky(image, object, settings=None):
+            if failures:
+                raise failures.pop()
+            return detect(image, object, settings)
+
+        model.detect = flaky
+        red = (255, 0, 0)
+
+        def frames():
+            for _ in range(3):
+                yield _frame(red)
+                # Let the call for this frame finish before the next arrives.
+                time.sleep(0.05)
+
+        pipeline = FramePipeline(model, "detect", object="car", drop_stale=False)
+        results = list(pipeline.run(frames()))
+        self.assertIsInstance(results[0].result, RuntimeError)
+        self.assertEqual([r.reused for r in results], [False, False, True])
+        self.assertEqual(results[2].result["color"], red)
+        self.assertEqual(pipeline.stats().errors, 1)
+
+    def test_frames_are_downscaled_before_conversion(self):
+        pipeline = FramePipeline(_FrameVLM(), "detect", object="car")
+        convert = Image.Image.convert
+        converted = []
+
+        def spy(image, *args, **kwargs):
+            converted.append((image.mode, image.size))
+            return convert(image, *args, **kwargs)
+
+        frame = Image.new("RGB", (640, 480), (200, 100, 50))
+        with mock.patch.object(Image.Image, "convert", spy):
+            thumbnail = pipeline._thumbnail(frame)
+        self.assertEqual((thumbnail.mode, thumbnail.size), ("L", (32, 32)))
+        self.assertEqual(converted, [("RGB", (32, 32))])
+        expected = frame.convert("L").getpixel((0, 0))
+        self.assertLessEqual(abs(thumbnail.getpixel((0, 0)) - expected), 1)
+        for mode in ("RGBA", "L", "P", "CMYK"):
+            self.assertEqual(pipeline._thumbnail(frame.convert(mode)).size, (32, 32))
+
+    def test_invalid_arguments(self):
+        model = _FrameVLM()
+        with self.assertRaises(ValueError):
+            FramePipeline(model, "describe")
+        with self.assertRaises(ValueError):
+            FramePipeline(model, "caption", stream=True)
+        with self.assertRaises(ValueError):
+            FramePipeline(model, "caption", threshold=2)
+
+
+if __name__ == "__main__":
+    unittest.main()